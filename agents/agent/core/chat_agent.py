@@ -1,15 +1,26 @@
+import copy
 import json
+import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import AsyncIterator
 
 from agents.agent.core.abstract_agent import AbstractAgent
 from agents.agent.entity.inner.node_data import NodeMessage
 from agents.agent.llm.openai import openai
-from agents.agent.memory.memory import MemoryObject
+from agents.agent.memory.memory import MemoryManager, MemoryObject
 from agents.agent.memory.redis_memory import RedisMemory
+from agents.agent.memory.tiered_memory import tiered_memory
 from agents.agent.prompts.tool_prompts import tool_prompt
 from agents.agent.swarms.async_agent import AsyncAgent
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
 from agents.models.models import App
+from agents.protocol.schemas import AgentMode
+from agents.utils.stop_words import StopWordFilter
+
+logger = logging.getLogger(__name__)
 
 
 class ChatAgent(AbstractAgent):
@@ -17,7 +28,7 @@ class ChatAgent(AbstractAgent):
 
     agent: AsyncAgent = None
 
-    redis_memory: RedisMemory = RedisMemory()
+    redis_memory: MemoryManager = tiered_memory if SETTINGS.MEMORY_L1_ENABLED else RedisMemory()
 
     def __init__(self, app: App):
         """"
@@ -33,14 +44,18 @@ class ChatAgent(AbstractAgent):
                     return True
             return False
 
+        function_calling = app.mode == AgentMode.CALL.value
         self.agent = AsyncAgent(
             agent_name=app.name,
             llm=openai.get_model(),
-            tool_system_prompt=app.tool_prompt if app.tool_prompt else tool_prompt(),
+            # Native tool calling needs no instructions on the tool call format
+            tool_system_prompt=app.tool_prompt if app.tool_prompt or function_calling else tool_prompt(),
+            function_calling=function_calling,
             max_loops=app.max_loops if app.max_loops else 5,
             output_type="list",
             should_send_node=True,
             stopping_condition=stopping_condition,
+            stop_words=self.stop_condition,
             system_prompt=app.description,
         )
 
@@ -60,6 +75,7 @@ class ChatAgent(AbstractAgent):
         try:
             is_finalized = False
             final_response: list = []
+            stop_filter = StopWordFilter(self.stop_condition)
             async for output in self.agent.acompletion(query):
                 if isinstance(output, NodeMessage):
                     yield self.send_message("status", output.to_dict())
@@ -70,15 +86,19 @@ class ChatAgent(AbstractAgent):
                 elif not isinstance(output, str):
                     continue
 
-                for stop_word in self.stop_condition:
-                    if output and stop_word in output:
-                        output = output.replace(stop_word, "")
+                # Stop words may be split across chunks
+                output = stop_filter.feed(output)
 
                 response_buffer += output
                 is_finalized = True
                 if output:
                     yield self.send_message("message", {"text": output})
 
+            output = stop_filter.flush()
+            if output:
+                response_buffer += output
+                yield self.send_message("message", {"text": output})
+
             # Handle the case where no final response was generated
             if not is_finalized:
                 if final_response:
@@ -90,13 +110,13 @@ class ChatAgent(AbstractAgent):
             raise e
         finally:
             memory_object = MemoryObject(input=query, output=response_buffer)
-            self.redis_memory.save_memory(conversation_id, memory_object)
+            await self.redis_memory.asave_memory(conversation_id, memory_object)
 
     async def add_memory(self, conversation_id: str):
         """
         Add memory to the agent based on the conversation ID.
         """
-        memory_list = self.redis_memory.get_memory_by_conversation_id(conversation_id)
+        memory_list = await self.redis_memory.aget_memory_by_conversation_id(conversation_id)
 
         # Add system time to short-term memory
         current_time = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')
@@ -112,3 +132,99 @@ class ChatAgent(AbstractAgent):
         """
         return f'event: {event}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n'
 
+    def clone(self) -> "ChatAgent":
+        """
+        Create a ChatAgent for a new request from this one, used as a template.
+        """
+        clone = copy.copy(self)
+        clone.agent = self.agent.clone()
+        return clone
+
+
+class ChatAgentTemplates:
+    """
+    Cache of fully built ChatAgents, one per app version, used as templates.
+
+    Building a ChatAgent runs the whole swarms Agent setup (tool schema, prompts, tokenizer).
+    Templates are keyed by app id and update time, so an updated app gets a new template, and
+    every request gets a cheap clone of its app's template.
+    """
+
+    def __init__(self, max_size: int = 128):
+        """
+        Initialize ChatAgentTemplates
+
+        Args:
+            max_size (int): Maximum number of cached templates
+        """
+        self.max_size = max_size
+        self._templates: OrderedDict[tuple, ChatAgent] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, app: App) -> ChatAgent:
+        """
+        Get a ChatAgent for a request, cloned from the app's template
+
+        Args:
+            app (App): The application configuration object
+
+        Returns:
+            ChatAgent: An agent ready to run
+        """
+        key = (app.id, app.update_time)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+        if template is None:
+            metrics.incr("chat_agent_templates.miss")
+            template = ChatAgent(app)
+            # Count the tokens of the system and tool prompts once, clones reuse them
+            template.agent.prompt_buffer.token_count(template.agent.short_memory.conversation_history)
+            with self._lock:
+                # Older versions of the app are not needed anymore
+                for stale in [k for k in self._templates if k[0] == app.id and k != key]:
+                    del self._templates[stale]
+                self._templates[key] = template
+                while len(self._templates) > self.max_size:
+                    self._templates.popitem(last=False)
+        else:
+            metrics.incr("chat_agent_templates.hit")
+        return template.clone()
+
+    def invalidate(self, app_id: int) -> None:
+        """
+        Drop the templates of an app, e.g. after its agent or tools changed
+
+        Args:
+            app_id (int): The app ID
+        """
+        with self._lock:
+            for key in [k for k in self._templates if k[0] == app_id]:
+                del self._templates[key]
+        logger.info(f"Invalidated chat agent templates of app {app_id}")
+
+
+chat_agent_templates = ChatAgentTemplates(max_size=SETTINGS.CHAT_AGENT_TEMPLATE_CACHE_SIZE)
+
+
+if __name__ == '__main__':
+    import time
+
+    app = App(id=1, name="Bench Agent", description="You are a helpful assistant.", max_loops=5,
+              update_time=datetime.now())
+    runs = 50
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        ChatAgent(app)
+    build_time = (time.perf_counter() - start) / runs
+
+    chat_agent_templates.get(app)
+    start = time.perf_counter()
+    for _ in range(runs):
+        chat_agent_templates.get(app)
+    clone_time = (time.perf_counter() - start) / runs
+
+    print(f"ChatAgent construction: {build_time * 1000:.2f} ms, clone from template: {clone_time * 1000:.3f} ms")
+
@@ -1,5 +1,7 @@
+import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timezone
 from typing import AsyncIterator
 
@@ -7,21 +9,32 @@ from agents.agent.core.abstract_agent import AbstractAgent
 from agents.agent.entity.inner.node_data import NodeMessage
 from agents.agent.entity.inner.tool_output import ToolOutput
 from agents.agent.llm.openai import openai
-from agents.agent.memory.memory import MemoryObject
+from agents.agent.memory.memory import MemoryManager, MemoryObject
 from agents.agent.memory.redis_memory import RedisMemory
+from agents.agent.memory.tiered_memory import tiered_memory
 from agents.agent.prompts.tool_prompts import tool_prompt
 from agents.agent.swarms.async_agent import AsyncAgent
 from agents.agent.tools import coin_tools, ai_search_tool
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
+from agents.protocol.schemas import AgentMode
+from agents.utils.stop_words import StopWordFilter
 
 logger = logging.getLogger(__name__)
 
 
 class CoinAgent(AbstractAgent):
 
-    redis_memory: RedisMemory = RedisMemory()
+    redis_memory: MemoryManager = tiered_memory if SETTINGS.MEMORY_L1_ENABLED else RedisMemory()
     need_now_time: bool = True
 
-    def __init__(self):
+    def __init__(self, mode: AgentMode = AgentMode(SETTINGS.COIN_AGENT_MODE)):
+        """
+        Initialize the CoinAgent
+
+        Args:
+            mode (AgentMode): Whether tools are called with fenced JSON (ReAct) or natively (call)
+        """
         def stopping_condition(response: str):
             for stop_word in self.stop_condition:
                 if stop_word in response:
@@ -31,7 +44,7 @@ class CoinAgent(AbstractAgent):
         self.agent: AsyncAgent = AsyncAgent(
             agent_name="Pulse Agent",
             llm=openai.get_model(),
-            tool_system_prompt=tool_prompt(),
+            tool_system_prompt=tool_prompt() if mode == AgentMode.REACT else None,
             tools=[
                 coin_tools.query_price_by_ids,
                 coin_tools.query_historical_data_by_ids,
@@ -42,12 +55,24 @@ class CoinAgent(AbstractAgent):
             async_tools=[
                 ai_search_tool.ai_search
             ],
+            tool_coroutines=coin_tools.async_query_tools,
             max_loops=6,
             output_type="list",
             should_send_node=True,
+            function_calling=mode == AgentMode.CALL,
             stopping_condition=stopping_condition,
+            stop_words=self.stop_condition,
             system_prompt="You are an Pulse Agent.Your can provide you with cryptocurrency information and transaction data, as well as assist in generating professional research reports on the crypto market. You can solve problems directly or utilize specialized tools to perform detailed tasks and deliver precise solutions.",
         )
+        # Count the tokens of the system and tool prompts once, every reset keeps them
+        self.agent.prompt_buffer.token_count(self.agent.short_memory.conversation_history)
+        self.agent.snapshot()
+
+    def reset(self) -> None:
+        """
+        Restore the agent to its state right after init, so it can serve another request.
+        """
+        self.agent.reset()
 
     async def arun(self, query: str, conversation_id: str) -> AsyncIterator[str]:
         """
@@ -57,7 +82,7 @@ class CoinAgent(AbstractAgent):
         :param conversation_id: The conversation ID used to fetch and save memory.
         :return: An asynchronous iterator of response strings.
         """
-        memory_list = self.redis_memory.get_memory_by_conversation_id(conversation_id)
+        memory_list = await self.redis_memory.aget_memory_by_conversation_id(conversation_id)
         response_buffer = ""
         try:
             # Add system time to short-term memory
@@ -70,6 +95,7 @@ class CoinAgent(AbstractAgent):
 
             # Process the query and yield responses
             is_finalized = False
+            stop_filter = StopWordFilter(self.stop_condition)
             async for output in self.agent.acompletion(query):
                 if isinstance(output, NodeMessage):
                     yield self.seed_node_message(output)
@@ -82,15 +108,19 @@ class CoinAgent(AbstractAgent):
                 if not isinstance(output, str):
                     continue
 
-                for stop_word in self.stop_condition:
-                    if output and stop_word in output:
-                        output = output.replace(stop_word, "")
+                # Stop words may be split across chunks
+                output = stop_filter.feed(output)
 
                 response_buffer += output
                 is_finalized = True
                 if output:
                     yield self.send_message(output)
 
+            output = stop_filter.flush()
+            if output:
+                response_buffer += output
+                yield self.send_message(output)
+
             # Handle the case where no final response was generated
             if not is_finalized:
                 yield self.send_message(self.default_final_answer)
@@ -100,10 +130,139 @@ class CoinAgent(AbstractAgent):
         finally:
             # Save conversation memory
             memory_object = MemoryObject(input=query, output=response_buffer)
-            self.redis_memory.save_memory(conversation_id, memory_object)
+            await self.redis_memory.asave_memory(conversation_id, memory_object)
 
     def send_message(self, message: str) -> str:
         return f'event: message\ndata: {json.dumps({"text": message}, ensure_ascii=False)}\n\n'
 
     def seed_node_message(self, node_message: NodeMessage):
         return f'event: status\ndata: {json.dumps(node_message.to_dict(), ensure_ascii=False)}\n\n'
+
+
+class CoinAgentPool:
+    """
+    Bounded pool of pre-built CoinAgents.
+
+    Building a CoinAgent sets up the swarms Agent, the OpenAI tool schema of every tool and the
+    system prompts. Pooled agents are built once and reset after each run, which restores their
+    short-term memory to the post-init snapshot. When every agent is busy, a request waits a
+    short time for one to be returned, then gets a new agent that is not kept in the pool.
+    """
+
+    def __init__(self, max_size: int = 8, wait_timeout: float = 1):
+        """
+        Initialize CoinAgentPool
+
+        Args:
+            max_size (int): Maximum number of pooled agents
+            wait_timeout (float): Seconds to wait for a pooled agent before building a new one
+        """
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.size = 0
+        self._idle: asyncio.Queue[CoinAgent] = asyncio.Queue()
+
+    def warm(self, count: int = None) -> None:
+        """
+        Build pooled agents ahead of the first requests
+
+        Args:
+            count (int): Number of agents to have in the pool, defaults to the maximum size
+        """
+        count = min(self.max_size if count is None else count, self.max_size)
+        while self.size < count:
+            self.size += 1
+            self._idle.put_nowait(CoinAgent())
+        self._record_size()
+
+    async def arun(self, query: str, conversation_id: str) -> AsyncIterator[str]:
+        """
+        Run a query on a pooled agent, returning the agent to the pool once the run ends
+
+        Args:
+            query (str): The input query string
+            conversation_id (str): The conversation ID used to fetch and save memory
+
+        Returns:
+            AsyncIterator[str]: The responses of `CoinAgent.arun`
+        """
+        agent, pooled = await self.checkout()
+        stream = agent.arun(query, conversation_id)
+        try:
+            async for response in stream:
+                yield response
+        finally:
+            await stream.aclose()
+            if pooled:
+                self.checkin(agent)
+
+    async def checkout(self) -> tuple[CoinAgent, bool]:
+        """
+        Take an agent from the pool
+
+        Returns:
+            tuple[CoinAgent, bool]: The agent and whether it must be returned with `checkin`
+        """
+        started_at = time.monotonic()
+        try:
+            agent = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            if self.size < self.max_size:
+                self.size += 1
+                agent = CoinAgent()
+            else:
+                try:
+                    agent = await asyncio.wait_for(self._idle.get(), self.wait_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Coin agent pool exhausted after {self.wait_timeout}s, building an extra agent")
+                    metrics.incr("coin_agent_pool.overflow")
+                    return CoinAgent(), False
+        metrics.observe("coin_agent_pool.wait_seconds", time.monotonic() - started_at)
+        self._record_size()
+        return agent, True
+
+    def checkin(self, agent: CoinAgent) -> None:
+        """
+        Reset an agent and return it to the pool
+
+        Args:
+            agent (CoinAgent): An agent taken with `checkout`
+        """
+        try:
+            agent.reset()
+        except Exception as error:
+            # A broken agent is dropped, the next checkout builds a new one
+            logger.error("Error resetting coin agent: %s", error, exc_info=True)
+            self.size -= 1
+        else:
+            self._idle.put_nowait(agent)
+        self._record_size()
+
+    def _record_size(self) -> None:
+        metrics.set_gauge("coin_agent_pool.size", self.size)
+        metrics.set_gauge("coin_agent_pool.in_use", self.size - self._idle.qsize())
+
+
+coin_agent_pool = CoinAgentPool(max_size=SETTINGS.COIN_AGENT_POOL_SIZE, wait_timeout=SETTINGS.COIN_AGENT_POOL_WAIT_TIMEOUT)
+
+
+if __name__ == '__main__':
+    async def main():
+        runs = 50
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            CoinAgent()
+        build_time = (time.perf_counter() - start) / runs
+
+        coin_agent_pool.warm(1)
+        start = time.perf_counter()
+        for _ in range(runs):
+            agent, pooled = await coin_agent_pool.checkout()
+            coin_agent_pool.checkin(agent)
+        pool_time = (time.perf_counter() - start) / runs
+
+        print(f"CoinAgent construction: {build_time * 1000:.2f} ms, pool checkout + reset: {pool_time * 1000:.3f} ms")
+        print(metrics.snapshot())
+
+    asyncio.run(main())
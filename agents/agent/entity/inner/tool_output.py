@@ -1,9 +1,11 @@
 
 class ToolOutput:
     data: str = None
+    tool_name: str = None
 
-    def __init__(self, data: str):
+    def __init__(self, data: str, tool_name: str = None):
         self.data = data
+        self.tool_name = tool_name
 
 
     def get_output(self) -> str:
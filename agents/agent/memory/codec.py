@@ -0,0 +1,175 @@
+import json
+import zlib
+from typing import Optional, Union
+
+import msgpack
+import orjson
+
+from agents.common.config import SETTINGS
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Format tag of a record: serializer in the high nibble, compression in the low one. Records
+# written before the tag, plain JSON objects, start with "{" (0x7B) which is no valid tag.
+SERIALIZERS = {"msgpack": 1, "orjson": 2}
+COMPRESSIONS = {None: 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+
+class UnsupportedRecordError(ValueError):
+    """A memory record in a format this worker cannot read, as opposed to a corrupt one."""
+
+
+class MemoryCodec:
+    """
+    Encodes memory records for Redis: msgpack or orjson, compressed above a size threshold.
+
+    Every record starts with a one byte format tag, so records of any codec, and the JSON text
+    stored before, can be read whatever the codec writes. The "json" serializer writes that
+    JSON text again, e.g. while older workers still read the same Redis.
+    """
+
+    def __init__(self, serializer: str = "msgpack", compression: Optional[str] = "zlib",
+                 compress_threshold: int = 1024, level: int = 3) -> None:
+        """
+        Initialize MemoryCodec
+
+        Args:
+            serializer (str): "msgpack", "orjson" or "json"
+            compression (str): "zlib", "zstd", "lz4" or None, zstd and lz4 need their package on every worker
+            compress_threshold (int): Serialized size in bytes from which records are compressed
+            level (int): Compression level of zstd and zlib
+        """
+        if serializer != "json" and serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown memory serializer: {serializer}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown memory compression: {compression}")
+        if compression == "zstd" and zstandard is None or compression == "lz4" and lz4 is None:
+            # No silent fallback: workers must agree on what they can read
+            raise ValueError(f"Memory compression {compression} is not installed")
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.level = level
+
+    def encode(self, record: dict) -> Union[bytes, str]:
+        """
+        Encode a record
+
+        Args:
+            record (dict): The record, e.g. `MemoryObject.to_dict()`
+
+        Returns:
+            Union[bytes, str]: The tagged record, or JSON text with the "json" serializer
+        """
+        if self.serializer == "json":
+            return json.dumps(record)
+        if self.serializer == "msgpack":
+            data = msgpack.packb(record, use_bin_type=True)
+        else:
+            data = orjson.dumps(record)
+
+        compression = self.compression if len(data) >= self.compress_threshold else None
+        if compression == "zstd":
+            data = zstandard.ZstdCompressor(level=self.level).compress(data)
+        elif compression == "lz4":
+            # Its default fast mode, higher levels are slower than zstd
+            data = lz4.frame.compress(data)
+        elif compression == "zlib":
+            data = zlib.compress(data, self.level)
+        return bytes([SERIALIZERS[self.serializer] << 4 | COMPRESSIONS[compression]]) + data
+
+    def decode(self, data: Union[bytes, str]) -> dict:
+        """
+        Decode a record of any codec
+
+        Args:
+            data (Union[bytes, str]): The record as stored
+
+        Returns:
+            dict: The record
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        if data[:1] == b"{":
+            return json.loads(data)
+
+        serializer, compression, data = data[0] >> 4, data[0] & 0x0F, data[1:]
+        if compression == COMPRESSIONS["zstd"]:
+            if zstandard is None:
+                raise UnsupportedRecordError("Memory record compressed with zstd, which is not installed")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        elif compression == COMPRESSIONS["lz4"]:
+            if lz4 is None:
+                raise UnsupportedRecordError("Memory record compressed with lz4, which is not installed")
+            data = lz4.frame.decompress(data)
+        elif compression == COMPRESSIONS["zlib"]:
+            data = zlib.decompress(data)
+        elif compression:
+            raise UnsupportedRecordError(f"Unknown memory record compression: {compression}")
+
+        if serializer == SERIALIZERS["msgpack"]:
+            return msgpack.unpackb(data, raw=False)
+        if serializer == SERIALIZERS["orjson"]:
+            return orjson.loads(data)
+        raise UnsupportedRecordError(f"Unknown memory record format: {serializer}")
+
+
+memory_codec = MemoryCodec(
+    serializer=SETTINGS.MEMORY_CODEC,
+    compression=SETTINGS.MEMORY_COMPRESSION or None,
+    compress_threshold=SETTINGS.MEMORY_COMPRESS_THRESHOLD,
+)
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    from agents.agent.memory.memory import MemoryObject
+
+    # Memory of 1M conversations of 10 turns, estimated from a sample: report-style answers
+    # with tables and figures, as ai_search writes them, and short chat answers
+    CONVERSATIONS = 1_000_000
+    SAMPLE = 200
+    rng = random.Random(7)
+    words = ["bitcoin", "ethereum", "price", "volume", "market", "liquidity", "support", "resistance",
+             "trend", "analysis", "the", "of", "and", "in", "is", "a", "to", "with", "年", "市场"]
+
+    def answer() -> str:
+        if rng.random() < 0.5:
+            return " ".join(rng.choice(words) for _ in range(rng.randint(20, 80)))
+        rows = "\n".join(f"| {rng.choice(words)} | {rng.random() * 1e5:.2f} | {rng.random() * 100:+.2f}% |"
+                         for _ in range(rng.randint(20, 60)))
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(1000, 3000)))
+        return f"## Report\n\n| Asset | Price | Change |\n|---|---|---|\n{rows}\n\n{text}"
+
+    records = [MemoryObject(input=f"question {i}", output=answer()).to_dict() for i in range(SAMPLE * 10)]
+    codecs = [("json (stored before)", MemoryCodec("json"))]
+    for serializer in SERIALIZERS:
+        codecs.append((serializer, MemoryCodec(serializer, None)))
+        for compression in ("zlib", "zstd", "lz4"):
+            if compression == "zstd" and zstandard is None or compression == "lz4" and lz4 is None:
+                continue
+            codecs.append((f"{serializer} + {compression}", MemoryCodec(serializer, compression)))
+
+    print(f"{'codec':<22}{'GB at 1M conversations':>24}{'encode µs':>12}{'decode µs':>12}")
+    for name, codec in codecs:
+        start = time.perf_counter()
+        encoded = [codec.encode(record) for record in records]
+        encode_time = (time.perf_counter() - start) / len(records)
+        start = time.perf_counter()
+        decoded = [codec.decode(data) for data in encoded]
+        decode_time = (time.perf_counter() - start) / len(records)
+        assert decoded == records
+
+        size = sum(len(data.encode() if isinstance(data, str) else data) for data in encoded)
+        print(f"{name:<22}{size / SAMPLE * CONVERSATIONS / 1e9:>24.2f}"
+              f"{encode_time * 1e6:>12.1f}{decode_time * 1e6:>12.1f}")
@@ -1,21 +1,229 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
 from agents.agent.memory.memory import MemoryManager, MemoryObject
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
+
+
+class _Conversation:
+    __slots__ = ("memories", "sizes", "bytes", "accessed_at", "version")
+
+    def __init__(self, memory_size: int):
+        self.memories: deque[MemoryObject] = deque(maxlen=memory_size)
+        self.sizes: deque[int] = deque(maxlen=memory_size)
+        self.bytes = 0
+        self.accessed_at = time.monotonic()
+        self.version: Optional[int] = None
 
 
 class LocalMemory(MemoryManager):
-    memory: dict[str, list[MemoryObject]] = {}
+    """
+    In-process conversation memory, bounded in conversations, idle time and optionally bytes.
 
-    def __init__(self, memory_size: int = 10) -> None:
+    Conversations are kept in LRU order: the least recently used one is evicted when there are
+    more than `max_conversations`, or more than `max_bytes` of memories, and conversations idle
+    for `ttl` seconds expire. Each conversation keeps its last `memory_size` memories in a ring
+    buffer. Also usable as an L1 cache in front of RedisMemory, see `set_memory`: conversations
+    then carry the version they were loaded at, counting one more for every save.
+    """
+
+    def __init__(self, memory_size: int = 10, max_conversations: int = 10000, ttl: Optional[float] = 3600,
+                 max_bytes: Optional[int] = None, name: str = "local_memory") -> None:
+        """
+        Initialize LocalMemory
+
+        Args:
+            memory_size (int): Memories kept per conversation
+            max_conversations (int): Conversations kept
+            ttl (float): Seconds a conversation is kept without being read or saved, None to keep it
+            max_bytes (int): Total size of the memories kept, None for no limit
+            name (str): Metric prefix
+        """
         super().__init__(memory_size=memory_size)
+        self.max_conversations = max_conversations
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.name = name
+        self.memory: OrderedDict[str, _Conversation] = OrderedDict()
+        self.bytes = 0
+        self._lock = threading.Lock()
 
     def get_memory_by_conversation_id(self, conversation_id: str) -> list[MemoryObject]:
-        return self.memory.get(conversation_id, [])
+        with self._lock:
+            conversation = self._get(conversation_id)
+            return list(conversation.memories) if conversation is not None else []
+
+    def get_memory_with_version(self, conversation_id: str) -> Optional[tuple[list[MemoryObject], Optional[int]]]:
+        """
+        Get the memories of a conversation with their version
+
+        Args:
+            conversation_id (str): The conversation ID
+
+        Returns:
+            Optional[tuple[list[MemoryObject], Optional[int]]]: The memories and version, or None if not kept
+        """
+        with self._lock:
+            conversation = self._get(conversation_id)
+            if conversation is None:
+                return None
+            return list(conversation.memories), conversation.version
+
+    def has_memory(self, conversation_id: str) -> bool:
+        """
+        Whether the conversation is kept, e.g. to tell a cached empty conversation from a miss
+
+        Args:
+            conversation_id (str): The conversation ID
+        """
+        with self._lock:
+            return self._get(conversation_id) is not None
 
     def save_memory(self, conversation_id: str, memory: MemoryObject):
-        if conversation_id not in self.memory:
-            self.memory[conversation_id] = []
-        if len(self.memory[conversation_id]) >= self.memory_size:
-            del self.memory[conversation_id][0]
-        self.memory[conversation_id].append(memory)
+        with self._lock:
+            conversation = self._get(conversation_id) or self._add(conversation_id)
+            self._append(conversation, memory)
+            self._evict()
+
+    def append_memory(self, conversation_id: str, memory: MemoryObject) -> bool:
+        """
+        Save a memory only if the conversation is kept, e.g. to keep an L1 cache up to date
+
+        Args:
+            conversation_id (str): The conversation ID
+            memory (MemoryObject): The memory
+
+        Returns:
+            bool: Whether the conversation was kept
+        """
+        with self._lock:
+            conversation = self._get(conversation_id)
+            if conversation is None:
+                return False
+            self._append(conversation, memory)
+            self._evict()
+            return True
+
+    def set_memory(self, conversation_id: str, memories: list[MemoryObject], version: Optional[int] = None):
+        """
+        Replace the memories of a conversation, e.g. with what was loaded from Redis
+
+        Args:
+            conversation_id (str): The conversation ID
+            memories (list[MemoryObject]): The memories, oldest first
+            version (int): Version of the memories, e.g. the number of saves in Redis
+        """
+        with self._lock:
+            self._remove(conversation_id)
+            conversation = self._add(conversation_id)
+            for memory in memories[-self.memory_size:]:
+                self._append(conversation, memory)
+            conversation.version = version
+            self._evict()
+
+    def delete_memory(self, conversation_id: str):
+        """
+        Forget a conversation
+
+        Args:
+            conversation_id (str): The conversation ID
+        """
+        with self._lock:
+            self._remove(conversation_id)
+            self._record_size()
+
+    def clear(self):
+        """
+        Forget every conversation
+        """
+        with self._lock:
+            self.memory.clear()
+            self.bytes = 0
+            self._record_size()
+
+    def _get(self, conversation_id: str) -> Optional[_Conversation]:
+        conversation = self.memory.get(conversation_id)
+        if conversation is None:
+            return None
+        now = time.monotonic()
+        if self.ttl is not None and now - conversation.accessed_at > self.ttl:
+            self._remove(conversation_id)
+            metrics.incr(f"{self.name}.expired")
+            self._record_size()
+            return None
+        conversation.accessed_at = now
+        self.memory.move_to_end(conversation_id)
+        return conversation
+
+    def _add(self, conversation_id: str) -> _Conversation:
+        conversation = self.memory[conversation_id] = _Conversation(self.memory_size)
+        return conversation
+
+    def _append(self, conversation: _Conversation, memory: MemoryObject) -> None:
+        if len(conversation.memories) == conversation.memories.maxlen:
+            # The ring buffer drops the oldest memory
+            conversation.bytes -= conversation.sizes[0]
+            self.bytes -= conversation.sizes[0]
+        size = _memory_bytes(memory) if self.max_bytes else 0
+        conversation.memories.append(memory)
+        conversation.sizes.append(size)
+        if conversation.version is not None:
+            conversation.version += 1
+        conversation.bytes += size
+        self.bytes += size
+
+    def _remove(self, conversation_id: str) -> None:
+        conversation = self.memory.pop(conversation_id, None)
+        if conversation is not None:
+            self.bytes -= conversation.bytes
+
+    def _evict(self) -> None:
+        # Least recently used first, so expired conversations are at the front
+        if self.ttl is not None:
+            deadline = time.monotonic() - self.ttl
+            while self.memory and next(iter(self.memory.values())).accessed_at < deadline:
+                self._remove(next(iter(self.memory)))
+                metrics.incr(f"{self.name}.expired")
+        while len(self.memory) > self.max_conversations:
+            self._remove(next(iter(self.memory)))
+            metrics.incr(f"{self.name}.evicted.capacity")
+        while self.max_bytes and self.bytes > self.max_bytes and len(self.memory) > 1:
+            self._remove(next(iter(self.memory)))
+            metrics.incr(f"{self.name}.evicted.bytes")
+        self._record_size()
+
+    def _record_size(self) -> None:
+        metrics.set_gauge(f"{self.name}.conversations", len(self.memory))
+        if self.max_bytes:
+            metrics.set_gauge(f"{self.name}.bytes", self.bytes)
+
+
+def _memory_bytes(memory: MemoryObject) -> int:
+    # Size of the text kept, as stored in Redis
+    return len((memory.input or "").encode()) + len(memory.get_output_to_string().encode())
+
+
+local_memory = LocalMemory(
+    max_conversations=SETTINGS.LOCAL_MEMORY_MAX_CONVERSATIONS,
+    ttl=SETTINGS.LOCAL_MEMORY_TTL or None,
+    max_bytes=SETTINGS.LOCAL_MEMORY_MAX_BYTES or None,
+)
+
 
+if __name__ == '__main__':
+    # A worker seeing many short conversations: the store stays bounded
+    store = LocalMemory(memory_size=10, max_conversations=1000, ttl=3600, max_bytes=2 * 1024 * 1024,
+                        name="bench_memory")
+    start = time.perf_counter()
+    for i in range(50000):
+        conversation_id = f"conversation-{i // 5}"
+        store.save_memory(conversation_id, MemoryObject(input=f"question {i}", output="answer " * 50))
+        assert store.get_memory_by_conversation_id(conversation_id)[-1].input == f"question {i}"
+    elapsed = time.perf_counter() - start
 
-local_memory = LocalMemory()
\ No newline at end of file
+    print(f"50000 saves and reads over 10000 conversations in {elapsed * 1000:.0f} ms: "
+          f"{len(store.memory)} conversations, {store.bytes} bytes kept")
+    print(metrics.snapshot())
@@ -4,6 +4,8 @@ from typing import Union
 
 
 class MemoryObject:
+    __slots__ = ("input", "output")
+
     input: str
     output: Union[str, dict]
 
@@ -44,4 +46,12 @@ class MemoryManager(ABC):
         pass
 
     def save_memory(self, conversation_id: str, memory: MemoryObject):
-        pass
\ No newline at end of file
+        pass
+
+    async def aget_memory_by_conversation_id(self, conversation_id: str) -> list[MemoryObject]:
+        """Async counterpart of `get_memory_by_conversation_id`, for memories that do I/O."""
+        return self.get_memory_by_conversation_id(conversation_id)
+
+    async def asave_memory(self, conversation_id: str, memory: MemoryObject):
+        """Async counterpart of `save_memory`, for memories that do I/O."""
+        self.save_memory(conversation_id, memory)
\ No newline at end of file
@@ -1,5 +1,13 @@
+import logging
+from typing import Callable, Optional
+
+from agents.agent.memory.codec import MemoryCodec, UnsupportedRecordError, memory_codec
 from agents.agent.memory.memory import MemoryManager, MemoryObject
-from agents.common.redis_utils import redis_utils
+from agents.agent.memory.write_behind import memory_writer
+from agents.common.config import SETTINGS
+from agents.common.redis_utils import redis_utils, async_redis_utils
+
+logger = logging.getLogger(__name__)
 
 
 class RedisMemory(MemoryManager):
@@ -7,17 +15,55 @@ class RedisMemory(MemoryManager):
     prefix: str = "pulse.memory"
     max_ttl: int = 5 * 24 * 60 * 60
 
-    def __init__(self, memory_size: int = 10) -> None:
+    def __init__(self, memory_size: int = 10, write_behind: bool = SETTINGS.MEMORY_WRITE_BEHIND_ENABLED,
+                 on_push: Optional[Callable] = None, codec: MemoryCodec = memory_codec) -> None:
         super().__init__(memory_size=memory_size)
+        self.write_behind = write_behind
+        # Adds commands to the pipeline of async saves, see `AsyncRedisUtils.push_to_lists`
+        self.on_push = on_push
+        self.codec = codec
 
     def get_memory_by_conversation_id(self, conversation_id: str) -> list[MemoryObject]:
         redis_key = self._get_redis_key(conversation_id)
-        dict_list = redis_utils.get_list(redis_key)
-        return [MemoryObject.from_dict(d) for d in dict_list]
+        return self._decode(redis_utils.get_raw_list(redis_key))
 
     def save_memory(self, conversation_id: str, memory: MemoryObject):
         redis_key = self._get_redis_key(conversation_id)
-        redis_utils.push_to_list(redis_key, memory.to_dict(), self.memory_size, self.max_ttl)
+        redis_utils.push_to_list(redis_key, self.codec.encode(memory.to_dict()), self.memory_size, self.max_ttl,
+                                 raw=True)
+
+    async def aget_memory_by_conversation_id(self, conversation_id: str) -> list[MemoryObject]:
+        redis_key = self._get_redis_key(conversation_id)
+        if self.write_behind:
+            # Saves still queued are read too
+            records = await memory_writer.read(redis_key, lambda: async_redis_utils.get_raw_list(redis_key))
+            records = records[-self.memory_size:]
+        else:
+            records = await async_redis_utils.get_raw_list(redis_key)
+        return self._decode(records)
+
+    async def asave_memory(self, conversation_id: str, memory: MemoryObject):
+        redis_key = self._get_redis_key(conversation_id)
+        record = self.codec.encode(memory.to_dict())
+        # Whether the save was queued or written, so callers caching memories can tell
+        if self.write_behind:
+            return await memory_writer.put(redis_key, record, self.memory_size, self.max_ttl, self.on_push,
+                                           raw=True)
+        return await async_redis_utils.push_to_lists({redis_key: [record]}, self.memory_size, self.max_ttl,
+                                                     self.on_push, raw=True)
+
+    def _decode(self, records: list) -> list[MemoryObject]:
+        memories = []
+        for record in records:
+            try:
+                memories.append(MemoryObject.from_dict(self.codec.decode(record)))
+            except UnsupportedRecordError:
+                # Written by a worker with another codec installed: fail rather than lose history
+                raise
+            except Exception as e:
+                # One unreadable record should not lose the rest of the conversation
+                logger.error(f"Error decoding memory record: {e}")
+        return memories
 
     def _get_redis_key(self, conversation_id: str):
-        return f"{self.prefix}.{conversation_id}"
\ No newline at end of file
+        return f"{self.prefix}.{conversation_id}"
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Optional
+
+import redis
+
+from agents.agent.memory.local_memory import LocalMemory
+from agents.agent.memory.memory import MemoryManager, MemoryObject
+from agents.agent.memory.redis_memory import RedisMemory
+from agents.agent.memory.write_behind import memory_writer
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
+from agents.common.redis_utils import redis_utils, async_redis_utils
+
+logger = logging.getLogger(__name__)
+
+VERSION_SUFFIX = ".version"
+
+
+class TieredMemory(MemoryManager):
+    """
+    Conversation memory with an in-process L1 cache in front of RedisMemory.
+
+    Redis keeps a version per conversation, incremented by every save in the same pipeline as
+    the save, which also publishes the conversation on the invalidation channel. Each worker
+    drops its L1 copy of a conversation when another worker saved it.
+
+    An L1 copy carries the version it was loaded at plus the saves of this worker since, so a
+    stale copy is detected by comparing it with the version in Redis. Copies are checked on
+    every read while the channel is not subscribed (at start, after a lost connection), or
+    always with `verify`; otherwise an L1 hit needs no Redis round trip at all.
+    """
+
+    def __init__(self, memory_size: int = 10, max_conversations: int = 10000, ttl: Optional[float] = 300,
+                 verify: bool = False, channel: str = "pulse.memory.invalidate") -> None:
+        """
+        Initialize TieredMemory
+
+        Args:
+            memory_size (int): Memories kept per conversation
+            max_conversations (int): Conversations kept in L1
+            ttl (float): Seconds a conversation is kept in L1 without being read or saved
+            verify (bool): Check the version of L1 copies on every read, even while subscribed
+            channel (str): Pub/sub channel of the invalidations
+        """
+        super().__init__(memory_size=memory_size)
+        self.verify = verify
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex
+        self.l1 = LocalMemory(memory_size, max_conversations, ttl, name="tiered_memory.l1")
+        self.l2 = RedisMemory(memory_size, on_push=self._on_push)
+        self.hits = 0
+        self.misses = 0
+        self._subscribed = False
+        # Loads in progress, flagged when their conversation is invalidated meanwhile
+        self._loading: dict[str, bool] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def get_memory_by_conversation_id(self, conversation_id: str) -> list[MemoryObject]:
+        return self.l2.get_memory_by_conversation_id(conversation_id)
+
+    def save_memory(self, conversation_id: str, memory: MemoryObject):
+        self.l1.delete_memory(conversation_id)
+        self.l2.save_memory(conversation_id, memory)
+        try:
+            with redis_utils.client.pipeline(transaction=False) as pipe:
+                self._on_push(pipe, self.l2._get_redis_key(conversation_id), 1)
+                pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Error publishing the memory version of {conversation_id}: {e}")
+
+    async def aget_memory_by_conversation_id(self, conversation_id: str) -> list[MemoryObject]:
+        self._start()
+        started_at = time.monotonic()
+        cached = self.l1.get_memory_with_version(conversation_id)
+        if cached is not None:
+            memories, version = cached
+            if self._subscribed and not self.verify:
+                return self._hit(memories, started_at)
+            if version is not None and await self._stored_version(conversation_id) == version:
+                return self._hit(memories, started_at)
+            metrics.incr("tiered_memory.l1.stale")
+
+        # Read the version first: if a save lands in between, the copy looks older than it is and
+        # is reloaded, never the other way around
+        loading = conversation_id not in self._loading
+        self._loading.setdefault(conversation_id, False)
+        try:
+            version = await self._stored_version(conversation_id)
+            memories = await self.l2.aget_memory_by_conversation_id(conversation_id)
+            if loading and not self._loading[conversation_id]:
+                self.l1.set_memory(conversation_id, memories, version)
+        finally:
+            if loading:
+                del self._loading[conversation_id]
+        self.misses += 1
+        metrics.incr("tiered_memory.l1.miss")
+        metrics.observe("tiered_memory.l2.read_seconds", time.monotonic() - started_at)
+        self._record_hit_rate()
+        return memories
+
+    async def asave_memory(self, conversation_id: str, memory: MemoryObject):
+        self._start()
+        # Only conversations already in L1, a partial copy could not be told from a full one
+        self.l1.append_memory(conversation_id, memory)
+        if not await self.l2.asave_memory(conversation_id, memory):
+            # Dropped or failed, the copy would hold a memory Redis does not
+            self.l1.delete_memory(conversation_id)
+
+    async def close(self) -> None:
+        """
+        Stop listening for invalidations, e.g. on shutdown
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self._subscribed = False
+
+    async def _stored_version(self, conversation_id: str) -> int:
+        # Version once the saves of this worker still queued are written too
+        redis_key = self.l2._get_redis_key(conversation_id)
+        stored = await async_redis_utils.get_value(redis_key + VERSION_SUFFIX)
+        queued = memory_writer.queued(redis_key) if self.l2.write_behind else 0
+        return int(stored or 0) + queued
+
+    def _on_push(self, pipe, key: str, count: int) -> None:
+        pipe.incrby(key + VERSION_SUFFIX, count)
+        pipe.expire(key + VERSION_SUFFIX, self.l2.max_ttl)
+        conversation_id = key[len(self.l2.prefix) + 1:]
+        pipe.publish(self.channel, json.dumps({"conversation_id": conversation_id, "worker": self.worker_id}))
+
+    def _hit(self, memories: list[MemoryObject], started_at: float) -> list[MemoryObject]:
+        self.hits += 1
+        metrics.incr("tiered_memory.l1.hit")
+        metrics.observe("tiered_memory.l1.read_seconds", time.monotonic() - started_at)
+        self._record_hit_rate()
+        return memories
+
+    def _record_hit_rate(self) -> None:
+        metrics.set_gauge("tiered_memory.l1.hit_rate", self.hits / (self.hits + self.misses))
+
+    def _start(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    def _on_subscribe(self) -> None:
+        # Invalidations may have been missed while not subscribed
+        self.l1.clear()
+        for conversation_id in self._loading:
+            self._loading[conversation_id] = True
+        self._subscribed = True
+        logger.info(f"Listening for memory invalidations on {self.channel}")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async for data in async_redis_utils.listen(self.channel, self._on_subscribe):
+                    message = json.loads(data)
+                    if message["worker"] != self.worker_id:
+                        self.l1.delete_memory(message["conversation_id"])
+                        if message["conversation_id"] in self._loading:
+                            self._loading[message["conversation_id"]] = True
+                        metrics.incr("tiered_memory.l1.invalidations")
+            except (redis.RedisError, ValueError, KeyError) as e:
+                logger.warning(f"Memory invalidations interrupted, checking versions until resubscribed: {e}")
+            finally:
+                self._subscribed = False
+            await asyncio.sleep(1)
+
+
+tiered_memory = TieredMemory(
+    max_conversations=SETTINGS.MEMORY_L1_MAX_CONVERSATIONS,
+    ttl=SETTINGS.MEMORY_L1_TTL or None,
+    verify=SETTINGS.MEMORY_L1_VERIFY,
+    channel=SETTINGS.MEMORY_INVALIDATION_CHANNEL,
+)
+
+
+if __name__ == '__main__':
+    # Two workers serving the same conversations against the configured Redis, turn by turn
+    TURNS = 200
+
+    async def main():
+        workers = [TieredMemory(channel="pulse.memory.bench"), TieredMemory(channel="pulse.memory.bench")]
+        for worker in workers:
+            worker._start()
+        while not all(worker._subscribed for worker in workers):
+            await asyncio.sleep(0.01)
+
+        conversation_ids = [f"bench-{uuid.uuid4().hex}" for _ in range(20)]
+        for i in range(TURNS):
+            conversation_id = conversation_ids[i % len(conversation_ids)]
+            # Mostly the same worker serves a conversation, sometimes the other one
+            worker = workers[1 if i % 7 == 0 else 0]
+            memories = await worker.aget_memory_by_conversation_id(conversation_id)
+            assert [m.input for m in memories] == [f"turn {j}" for j in range(i % 20, i, 20)][-10:], memories
+            await worker.asave_memory(conversation_id, MemoryObject(input=f"turn {i}", output="answer"))
+            # The next turn of a conversation comes after a response, give the flush and message time
+            await asyncio.sleep(0.005)
+
+        for worker in workers:
+            await worker.close()
+        await memory_writer.close()
+        for worker in workers:
+            print(f"worker {worker.worker_id[:8]}: {worker.hits} L1 hits, {worker.misses} misses")
+        print(metrics.snapshot())
+
+    asyncio.run(main())
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
+from agents.common.redis_utils import AsyncRedisUtils, async_redis_utils
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryWriteBehind:
+    """
+    Write-behind queue for conversation memory saved to Redis lists.
+
+    Saves from every conversation are queued in process and flushed together, in one Redis
+    pipeline per flush, every `flush_interval` seconds or as soon as `batch_size` saves are
+    queued. Saves wait up to `put_timeout` seconds when `max_pending` are queued (backpressure),
+    then are dropped, and `close` flushes what is left on shutdown.
+
+    Reads through `read` see the queued and in-flight saves, so a conversation reads its own
+    writes before they reach Redis. A failed flush is retried with exponential backoff, up to
+    `max_backoff` seconds; meanwhile saves are dropped right away once `max_pending` are queued,
+    so the end of a request never waits on a Redis outage.
+    """
+
+    def __init__(self, flush_interval: float = 0.05, batch_size: int = 200, max_pending: int = 10000,
+                 put_timeout: float = 1, max_backoff: float = 5, redis: AsyncRedisUtils = async_redis_utils):
+        """
+        Initialize MemoryWriteBehind
+
+        Args:
+            flush_interval (float): Seconds between flushes
+            batch_size (int): Number of queued saves that triggers a flush right away
+            max_pending (int): Number of queued saves above which `put` waits for a flush
+            put_timeout (float): Seconds `put` waits for a flush before dropping the save
+            max_backoff (float): Maximum seconds between flushes while they fail
+            redis (AsyncRedisUtils): Redis client
+        """
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_backoff = max_backoff
+        self.redis = redis
+        # Flushes failed in a row
+        self.failures = 0
+        # Queued saves keyed by (max_length, ttl, on_push, raw), then by list key, in save order
+        self._pending: dict[tuple, dict[str, list]] = {}
+        self._size = 0
+        self._generation = 0
+        self._in_flight: Optional[dict[tuple, dict[str, list]]] = None
+        self._flushed: Optional[asyncio.Future] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def put(self, key: str, value: Any, max_length: Optional[int] = None, ttl: Optional[int] = None,
+                  on_push: Optional[Callable] = None, raw: bool = False) -> bool:
+        """
+        Queue a value to push to a Redis list, like `AsyncRedisUtils.push_to_list`
+
+        Args:
+            key (str): List key
+            value (Any): JSON-serializable value, or the serialized value with `raw`
+            max_length (int): Maximum length of the list
+            ttl (int): Time to live of the list in seconds
+            on_push (Callable): Adds commands to the flush pipeline, see `AsyncRedisUtils.push_to_lists`
+            raw (bool): Push the value as it is, already serialized to str or bytes
+
+        Returns:
+            bool: Whether the value was queued, False if it was dropped
+        """
+        self._start()
+        if self._size >= self.max_pending:
+            if self.failures or not await self._wait_for_space():
+                metrics.incr("memory_write_behind.dropped")
+                logger.warning(f"Memory write-behind queue is full, dropped a save of {key}")
+                return False
+
+        self._pending.setdefault((max_length, ttl, on_push, raw), {}).setdefault(key, []).append(value)
+        self._size += 1
+        metrics.set_gauge("memory_write_behind.pending", self._size)
+        if self._size >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def _wait_for_space(self) -> bool:
+        metrics.incr("memory_write_behind.backpressure")
+        started_at = time.monotonic()
+        self._wake.set()
+        try:
+            async with self._space:
+                await asyncio.wait_for(self._space.wait_for(lambda: self._size < self.max_pending),
+                                       self.put_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            metrics.observe("memory_write_behind.backpressure_seconds", time.monotonic() - started_at)
+
+    def queued(self, key: str) -> int:
+        """
+        Number of values queued or being written for a list
+
+        Args:
+            key (str): List key
+        """
+        return sum(len(lists.get(key, ())) for batch in (self._pending, self._in_flight or {})
+                   for lists in batch.values())
+
+    async def read(self, key: str, load: Callable[[], Awaitable[list]]) -> list:
+        """
+        Read a list with the values queued for it, each value exactly once
+
+        Args:
+            key (str): List key
+            load (Callable[[], Awaitable[list]]): Reads the list from Redis
+
+        Returns:
+            list: The stored values followed by the queued ones, in save order
+        """
+        while True:
+            if self._in_flight is not None and any(key in lists for lists in self._in_flight.values()):
+                # Being written: wait, so they are read from Redis
+                await asyncio.shield(self._flushed)
+                continue
+            generation = self._generation
+            queued = [value for lists in self._pending.values() for value in lists.get(key, ())]
+            stored = await load()
+            # A flush started during the load may have written the queued values too
+            if not queued or generation == self._generation:
+                return stored + queued
+
+    async def flush(self) -> None:
+        """
+        Write every queued save to Redis now
+        """
+        while self._in_flight is not None:
+            await asyncio.shield(self._flushed)
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        size, self._size = self._size, 0
+        self._in_flight = batch
+        self._generation += 1
+        self._flushed = asyncio.get_running_loop().create_future()
+        started_at = time.monotonic()
+        written = set()
+        try:
+            for group, lists in batch.items():
+                if await self.redis.push_to_lists(lists, *group):
+                    written.add(group)
+        finally:
+            # Failed or cancelled writes are retried with the next flush, before the saves queued since
+            failed = {group: lists for group, lists in batch.items() if group not in written}
+            if failed:
+                self.failures += 1
+                metrics.incr("memory_write_behind.errors")
+                for group, lists in self._pending.items():
+                    for key, values in lists.items():
+                        failed.setdefault(group, {}).setdefault(key, []).extend(values)
+                self._pending = failed
+                self._size = sum(len(values) for lists in failed.values() for values in lists.values())
+                logger.warning(f"Memory flush failed {self.failures} times in a row, {self._size} saves queued")
+            else:
+                self.failures = 0
+                metrics.observe("memory_write_behind.batch_size", size)
+                metrics.observe("memory_write_behind.flush_seconds", time.monotonic() - started_at)
+            self._in_flight = None
+            self._flushed.set_result(None)
+            metrics.set_gauge("memory_write_behind.pending", self._size)
+        async with self._space:
+            self._space.notify_all()
+
+    async def close(self) -> None:
+        """
+        Stop flushing in the background and flush what is left, e.g. on shutdown
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._space is not None:
+            await self.flush()
+        if self._size:
+            logger.error(f"{self._size} memory saves could not be written on shutdown")
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            if self._space is None:
+                self._wake = asyncio.Event()
+                self._space = asyncio.Condition()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if self.failures:
+                # Redis is failing: back off instead of retrying as fast as saves are queued
+                await asyncio.sleep(min(self.flush_interval * 2 ** min(self.failures, 16), self.max_backoff))
+            elif self._size < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing memory: {e}", exc_info=True)
+
+
+memory_writer = MemoryWriteBehind(
+    flush_interval=SETTINGS.MEMORY_FLUSH_INTERVAL,
+    batch_size=SETTINGS.MEMORY_FLUSH_BATCH_SIZE,
+    max_pending=SETTINGS.MEMORY_MAX_PENDING,
+    put_timeout=SETTINGS.MEMORY_PUT_TIMEOUT,
+    max_backoff=SETTINGS.MEMORY_FLUSH_MAX_BACKOFF,
+)
+
+
+if __name__ == '__main__':
+    # Redis round trips per conversation turn, with a stand-in client answering after a delay
+    LATENCY = 0.002
+    TURNS = 1000
+
+    class CountingRedis:
+        def __init__(self):
+            self.lists: dict[str, list] = {}
+            self.round_trips = 0
+
+        async def push_to_list(self, key: str, value: Any, max_length: Optional[int] = None, ttl: int = None):
+            await self.push_to_lists({key: [value]}, max_length, ttl)
+
+        async def push_to_lists(self, values: dict, max_length: Optional[int] = None, ttl: int = None,
+                                on_push: Optional[Callable] = None, raw: bool = False) -> bool:
+            self.round_trips += 1
+            await asyncio.sleep(LATENCY)
+            for key, items in values.items():
+                self.lists[key] = (self.lists.get(key, []) + items)[-max_length:]
+            return True
+
+        async def get_list(self, key: str) -> list:
+            self.round_trips += 1
+            await asyncio.sleep(LATENCY)
+            return list(self.lists.get(key, []))
+
+    async def main():
+        direct = CountingRedis()
+        start = time.perf_counter()
+        await asyncio.gather(*(direct.push_to_list(f"pulse.memory.{i % 100}", {"turn": i}, 10, 3600)
+                               for i in range(TURNS)))
+        direct_time = time.perf_counter() - start
+
+        redis = CountingRedis()
+        writer = MemoryWriteBehind(redis=redis)
+        start = time.perf_counter()
+        await asyncio.gather(*(writer.put(f"pulse.memory.{i % 100}", {"turn": i}, 10, 3600) for i in range(TURNS)))
+        queue_time = time.perf_counter() - start
+
+        # Read-your-writes before and after the flush
+        key = "pulse.memory.7"
+        before = await writer.read(key, lambda: redis.get_list(key))
+        await writer.close()
+        after = await redis.get_list(key)
+        assert before[-10:] == after == direct.lists[key], (before, after)
+
+        print(f"{TURNS} saves: direct {direct.round_trips} round trips in {direct_time * 1000:.0f} ms, "
+              f"write-behind {redis.round_trips - 2} round trips, saves returned in {queue_time * 1000:.1f} ms")
+
+    asyncio.run(main())
@@ -1,6 +1,7 @@
+import asyncio
+import copy
 import logging
-import time
-from typing import Optional, AsyncIterator, List, Callable
+from typing import Optional, AsyncIterator, List, Callable, Dict
 
 import yaml
 from langchain_core.messages import BaseMessageChunk
@@ -11,7 +12,15 @@ from swarms.structs.concat import concat_strings
 from agents.agent.entity.inner.node_data import NodeMessage
 from agents.agent.entity.inner.tool_output import ToolOutput
 from agents.agent.memory.memory import MemoryObject
-from agents.agent.tools.tool_executor import async_execute
+from agents.agent.swarms.context_manager import ContextManager
+from agents.agent.swarms.prompt_buffer import PromptBuffer
+from agents.agent.tools.function_schema import functions_to_schemas
+from agents.agent.tools.tool_executor import async_execute, async_execute_sync, parse_function_calls, Prefetch, \
+    ToolCallAccumulator
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
+from agents.utils.fenced_block import FencedBlockDetector, FENCE
+from agents.utils.stop_words import StopWordMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +30,17 @@ class AsyncAgent(Agent):
             self,
             tools: Optional[List[Callable]] = None,
             async_tools: Optional[List[Callable]] = None,
+            tool_coroutines: Optional[Dict[str, Callable]] = None,
             should_send_node: Optional[bool] = False,
+            max_tool_concurrency: Optional[int] = None,
+            tool_timeout: Optional[float] = None,
+            tool_timeouts: Optional[Dict[str, float]] = None,
+            tool_output_ordered: Optional[bool] = None,
+            stop_words: Optional[List[str]] = None,
+            speculative_tool_dispatch: Optional[bool] = None,
+            stop_after_tool_call: Optional[bool] = None,
+            function_calling: Optional[bool] = False,
+            context_token_budget: Optional[int] = None,
             *args,
             **kwargs,
     ):
@@ -31,7 +50,27 @@ class AsyncAgent(Agent):
         Args:
             tools: List of synchronous tool functions
             async_tools: List of asynchronous tool functions
+            tool_coroutines: Non-blocking implementations of the synchronous tools, keyed by tool name.
+                Synchronous tools without one are run on the tool runner's thread pools.
             should_send_node: Whether to send node information to the agent. Defaults to True.
+            max_tool_concurrency: Maximum number of tool calls of one response run at the same time.
+                Defaults to SETTINGS.TOOL_MAX_CONCURRENCY.
+            tool_timeout: Seconds a tool call may run for. Defaults to SETTINGS.TOOL_TIMEOUT.
+            tool_timeouts: Per-tool timeouts keyed by tool name, overriding tool_timeout.
+            tool_output_ordered: Whether the output of concurrent async tool calls is kept together in
+                call order rather than interleaved. Defaults to SETTINGS.TOOL_OUTPUT_ORDERED.
+            stop_words: Words that end the reasoning part of a streamed answer. When given, the stream
+                is matched incrementally instead of calling stopping_condition on the whole response
+                for every chunk.
+            speculative_tool_dispatch: Whether to start the tools as soon as a ```json block closes in the
+                stream instead of after the whole response. Defaults to SETTINGS.TOOL_SPECULATIVE_DISPATCH.
+            stop_after_tool_call: Whether to stop generating once the tool call is complete, for tool
+                prompts that allow nothing after the JSON. Defaults to SETTINGS.TOOL_CALL_STOP_GENERATION.
+            function_calling: Whether to call the tools with the model's native tool calling (AgentMode.CALL)
+                instead of fenced JSON in the text (AgentMode.REACT). The tool schemas are sent with the
+                request instead of being added to the prompt, and the text of the response is the answer.
+            context_token_budget: Prompt size above which older turns and tool outputs are compacted, 0 to
+                never compact. Defaults to SETTINGS.CONTEXT_TOKEN_BUDGET.
             *args: Additional positional arguments for parent class
             **kwargs: Additional keyword arguments for parent class
         """
@@ -39,8 +78,30 @@ class AsyncAgent(Agent):
 
         self.tools = tools or []
         self.async_tools = async_tools or []
+        self.tool_coroutines = tool_coroutines or {}
+        self.max_tool_concurrency = max_tool_concurrency or SETTINGS.TOOL_MAX_CONCURRENCY
+        self.tool_timeout = tool_timeout or SETTINGS.TOOL_TIMEOUT
+        self.tool_timeouts = tool_timeouts or {}
+        self.tool_output_ordered = (SETTINGS.TOOL_OUTPUT_ORDERED if tool_output_ordered is None
+                                    else tool_output_ordered)
+        self.stop_words = stop_words or []
+        self.speculative_tool_dispatch = (SETTINGS.TOOL_SPECULATIVE_DISPATCH if speculative_tool_dispatch is None
+                                          else speculative_tool_dispatch)
+        self.stop_after_tool_call = (SETTINGS.TOOL_CALL_STOP_GENERATION if stop_after_tool_call is None
+                                     else stop_after_tool_call)
+        self.function_calling = function_calling
+        self.tool_schemas = []
+        self.prompt_buffer = PromptBuffer()
         self._initialize_tools()
         self.should_send_node = should_send_node
+        self.context_manager = ContextManager(
+            budget=SETTINGS.CONTEXT_TOKEN_BUDGET if context_token_budget is None else context_token_budget,
+            keep_recent=SETTINGS.CONTEXT_KEEP_RECENT,
+            digest_tokens=SETTINGS.CONTEXT_DIGEST_TOKENS,
+            summarize=self._summarize if SETTINGS.CONTEXT_SUMMARY_ENABLED else None,
+        )
+        # System prompts and tool schema: never compacted, so their render stays cached
+        self.context_manager.prefix_length = len(self.short_memory.conversation_history)
 
     def _initialize_tools(self) -> None:
         """Initialize tool structure and function mappings."""
@@ -55,7 +116,17 @@ class AsyncAgent(Agent):
             tool_system_prompt=self.tool_system_prompt,
         )
 
-        if all_tools:
+        if all_tools and self.function_calling:
+            logger.info("Tools provided: Accessing %d tools with native tool calling.", len(all_tools))
+
+            # The schemas are sent with each request, the prompt only keeps custom instructions
+            if self.tool_system_prompt:
+                self.short_memory.add(role="system", content=self.tool_system_prompt)
+
+            self.tool_schemas = functions_to_schemas(all_tools)
+            self.function_map = {tool.__name__: tool for tool in all_tools}
+
+        elif all_tools:
             logger.info(
                 "Tools provided: Accessing %d tools. Ensure functions have documentation and type hints.",
                 len(all_tools)
@@ -94,6 +165,8 @@ class AsyncAgent(Agent):
             agent(task="What is the capital of France?", img="path/to/image.jpg")
             agent(task="What is the capital of France?", img="path/to/image.jpg", is_last=True)
         """
+        loop_count = 0
+        speculation = None
         try:
             async for data in self.send_node_message("task understanding"): yield data
 
@@ -103,14 +176,13 @@ class AsyncAgent(Agent):
 
             # Add task to memory
             self.short_memory.add(role=self.user_name, content=task)
+            self.context_manager.pin(len(self.short_memory.conversation_history) - 1)
 
             # Plan
             if self.plan_enabled is True:
                 async for data in self.send_node_message("task plan"): yield data
                 self.plan(task)
 
-            # Set the loop count
-            loop_count = 0
             # Clear the short memory
             response = None
             all_responses = []
@@ -136,15 +208,19 @@ class AsyncAgent(Agent):
                 if self.dynamic_temperature_enabled is True:
                     self.dynamic_temperature()
 
-                # Task prompt
-                task_prompt = (
-                    self.short_memory.return_history_as_string()
+                # Keep the prompt within the token budget
+                self.context_manager.compact(self.short_memory.conversation_history, self.prompt_buffer)
+
+                # Task prompt, rendering only the messages added since the last loop
+                task_prompt = self.prompt_buffer.render(
+                    self.short_memory.conversation_history
                 )
 
                 # Parameters
                 attempt = 0
                 success = False
                 should_stop = False
+                speculation = None
                 while attempt < self.retry_attempts and not success:
                     try:
                         if (
@@ -163,40 +239,85 @@ class AsyncAgent(Agent):
                             else (task_prompt, img, *args)
                         )
                         response = ""
-                        whole_data = ""
+                        whole_data = []
+                        tool_calls = ToolCallAccumulator() if self.function_calling else None
+                        answering = False
+                        stop_matcher = (
+                            StopWordMatcher(self.stop_words)
+                            if self.stop_words and tool_calls is None
+                            else None
+                        )
+                        tool_detector = (
+                            FencedBlockDetector()
+                            if self.speculative_tool_dispatch and (self.tools or self.async_tools)
+                            and tool_calls is None
+                            else None
+                        )
                         logger.info(
                             f"Generating response with LLM... :{response_args}"
                         )
-                        async for data in self.call_llm_in_stream(
-                            *response_args, **kwargs
-                        ):
-                            if isinstance(data, str):
-                                whole_data += data
-                                response += data
-                            else:
-                                logger.error(
-                                    f"Unexpected response format: {type(data)}"
-                                )
-                                raise ValueError(
-                                    f"Unexpected response format: {type(data)}"
-                                )
-
-                            if (self.stopping_condition is not None
-                                    and self._check_stopping_condition(response)):
-                                async for data in self.send_node_message("generate response"): yield data
-
-                            if should_stop or (
-                                    self.stopping_condition is not None
-                                    and self._check_stopping_condition(response)
-                            ):
-                                logger.info("Stopping condition met.")
-                                should_stop = True
-                                yield response
-                                response = ""
+                        stream = self.call_llm_in_stream(*response_args, tool_calls=tool_calls, **kwargs)
+                        try:
+                            async for data in stream:
+                                if isinstance(data, str):
+                                    whole_data.append(data)
+                                    response += data
+                                else:
+                                    logger.error(
+                                        f"Unexpected response format: {type(data)}"
+                                    )
+                                    raise ValueError(
+                                        f"Unexpected response format: {type(data)}"
+                                    )
+
+                                if tool_calls is not None:
+                                    # Native tool calls arrive apart from the text, which is the answer itself
+                                    if data:
+                                        if not answering:
+                                            async for node in self.send_node_message("generate response"): yield node
+                                            answering = True
+                                        yield data
+                                    continue
+
+                                if not should_stop and self._stream_stopped(stop_matcher, data, response):
+                                    async for node in self.send_node_message("generate response"): yield node
+                                    logger.info("Stopping condition met.")
+                                    should_stop = True
 
-                        response = whole_data
+                                if should_stop:
+                                    yield response
+                                    response = ""
+                                elif tool_detector is not None:
+                                    # Start the tools as soon as their JSON block is complete
+                                    block = tool_detector.feed(data)
+                                    if block is not None and speculation is None:
+                                        speculation = _SpeculativeToolCall.start(
+                                            self, block, block[len(tool_detector.opening):-len(FENCE)]
+                                        )
+                                        if speculation is not None and self.stop_after_tool_call:
+                                            logger.info("Tool call complete, stopping generation.")
+                                            break
+                        finally:
+                            await stream.aclose()
+
+                        if speculation is not None and (should_stop or tool_detector.blocks > 1):
+                            # The final response is not the single tool call that was started
+                            await speculation.cancel()
+                            speculation = None
+
+                        response = "".join(whole_data)
                         logger.info(f"Response generated successfully. {response}")
 
+                        tool_input, parse_md = response, True
+                        if tool_calls is not None:
+                            # Without tool calls the response was the answer, already streamed
+                            should_stop = not tool_calls
+                            if tool_calls:
+                                tool_input, parse_md = tool_calls.to_json(), False
+                                logger.info(f"Tool calls: {tool_input}")
+                                # Keep the calls in the memory, as the fenced JSON is in ReAct mode
+                                response = response or tool_input
+
                         # Convert to a str if the response is not a str
                         response = self.llm_output_parser(response)
 
@@ -220,16 +341,24 @@ class AsyncAgent(Agent):
                         if not should_stop:
                             is_finished = False
                             if self.async_tools is not None:
-                                async for resp in self.async_parse_and_execute_tools(response, direct_output=True):
-                                    yield ToolOutput(resp)
+                                tool_outputs = (
+                                    speculation.async_outputs() if speculation is not None
+                                    else self.async_parse_and_execute_tools(
+                                        tool_input, direct_output=True, parse_md=parse_md
+                                    )
+                                )
+                                async for resp in tool_outputs:
+                                    yield resp
                                     is_finished = True
                                 if is_finished:
                                     should_stop = True
                                     success = True
                                     break
                             try:
-                                if self.tools is not None:
-                                    self.parse_and_execute_tools(response)
+                                if speculation is not None:
+                                    self._add_tool_output(await speculation.sync_output())
+                                elif self.tools is not None:
+                                    await self.async_parse_and_execute_sync_tools(tool_input, parse_md=parse_md)
                             except Exception as e:
                                 logger.error(
                                     f"Error executing tools: {e}"
@@ -267,6 +396,9 @@ class AsyncAgent(Agent):
                         success = True  # Mark as successful to exit the retry loop
 
                     except Exception as e:
+                        if speculation is not None:
+                            await speculation.cancel()
+                            speculation = None
                         if self.autosave is True:
                             self.save()
 
@@ -327,7 +459,7 @@ class AsyncAgent(Agent):
                     logger.info(
                         f"Sleeping for {self.loop_interval} seconds"
                     )
-                    time.sleep(self.loop_interval)
+                    await asyncio.sleep(self.loop_interval)
 
             if self.autosave is True:
 
@@ -360,10 +492,8 @@ class AsyncAgent(Agent):
             self.agent_output.full_history = (
                 self.short_memory.get_str()
             )
-            self.agent_output.total_tokens = (
-                self.tokenizer.count_tokens(
-                    self.short_memory.get_str()
-                )
+            self.agent_output.total_tokens = self.prompt_buffer.token_count(
+                self.short_memory.conversation_history
             )
 
             # Handle artifacts
@@ -409,18 +539,91 @@ class AsyncAgent(Agent):
                     f"Invalid output type: {self.output_type}"
                 )
 
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away: stop the tools still running and record what was saved
+            if speculation is not None:
+                await speculation.cancel()
+            self._record_cancellation(loop_count)
+            raise
+
         except Exception as error:
             self._handle_run_error(error)
 
         except KeyboardInterrupt as error:
             self._handle_run_error(error)
 
-    async def call_llm_in_stream(self, task: str, *args, **kwargs) -> AsyncIterator[str]:
+        finally:
+            self.context_manager.cancel()
+
+    def clone(self) -> "AsyncAgent":
+        """
+        Cheap copy for a new run, sharing the immutable setup (LLM client, tools, schema) and
+        starting from a snapshot of the current short-term memory.
+
+        Returns:
+            AsyncAgent: The copy
+        """
+        clone = copy.copy(self)
+        clone.short_memory = copy.copy(self.short_memory)
+        clone.short_memory.conversation_history = list(self.short_memory.conversation_history)
+        clone.agent_output = self.agent_output.model_copy(deep=True)
+        clone.prompt_buffer = self.prompt_buffer.copy()
+        clone.context_manager = self.context_manager.copy()
+        return clone
+
+    def snapshot(self) -> None:
+        """
+        Remember the current short-term memory and run state, e.g. right after init, for `reset`.
+        """
+        self._snapshot = (
+            list(self.short_memory.conversation_history),
+            self.agent_output.model_copy(deep=True),
+            self.prompt_buffer.copy(),
+        )
+
+    def reset(self) -> None:
+        """
+        Restore the short-term memory and run state saved by `snapshot`, so the agent can run again.
+        """
+        history, agent_output, prompt_buffer = self._snapshot
+        self.short_memory.conversation_history = list(history)
+        self.agent_output = agent_output.model_copy(deep=True)
+        self.prompt_buffer = prompt_buffer.copy()
+        self.context_manager.cancel()
+        self.context_manager = self.context_manager.copy()
+
+    def _record_cancellation(self, loop_count: int) -> None:
+        """Count a cancelled run and estimate the prompt tokens its remaining loops would have used."""
+        metrics.incr("agent.cancelled")
+        if self.max_loops == "auto":
+            return
+        loops_left = max(0, self.max_loops - loop_count)
+        metrics.observe("agent.loops_saved", loops_left)
+        if loops_left:
+            # Every loop sends at least the current prompt again
+            metrics.observe("agent.tokens_saved", loops_left * self.prompt_buffer.token_count())
+
+    async def _summarize(self, prompt: str) -> str:
+        """Summarize a part of the conversation with the agent's LLM, for the context manager."""
+        response = await self.llm.ainvoke(prompt)
+        return getattr(response, "content", response)
+
+    def _stream_stopped(self, stop_matcher: Optional[StopWordMatcher], chunk: str, response: str) -> bool:
+        """Whether the stream reached a stop word, feeding the matcher only the new chunk."""
+        if stop_matcher is not None:
+            return stop_matcher.feed(chunk)
+        return self.stopping_condition is not None and self._check_stopping_condition(response)
+
+    async def call_llm_in_stream(
+            self, task: str, *args, tool_calls: Optional[ToolCallAccumulator] = None, **kwargs
+    ) -> AsyncIterator[str]:
         """
         Calls the appropriate method on the `llm` object based on the given task.
 
         Args:
             task (str): The task to be performed by the `llm` object.
+            tool_calls (ToolCallAccumulator): Collects the native tool calls of the response. When given,
+                the tool schemas are sent with the request.
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
 
@@ -441,11 +644,16 @@ class AsyncAgent(Agent):
         if self.llm is None:
             raise TypeError("LLM object cannot be None")
 
+        if tool_calls is not None and self.tool_schemas:
+            kwargs["tools"] = self.tool_schemas
+
         try:
             async for out in self.llm.astream(task, *args, **kwargs):
                 if isinstance(out, str):
                     yield out
                 elif isinstance(out, BaseMessageChunk):
+                    if tool_calls is not None:
+                        tool_calls.feed(out.additional_kwargs.get("tool_calls"))
                     yield out.content
         except AttributeError as e:
             logger.error(
@@ -458,15 +666,18 @@ class AsyncAgent(Agent):
             direct_output = kwargs.get("direct_output", True)
             # try to Execute the tool and return a string
             whole_output = ""
-            async for data in async_execute(
+            async for tool_name, _, data in async_execute(
                 functions=self.async_tools,
                 json_string=response,
-                parse_md=True,
-                *args,
-                **kwargs,
+                parse_md=kwargs.get("parse_md", True),
+                max_concurrency=self.max_tool_concurrency,
+                timeout=self.tool_timeout,
+                timeouts=self.tool_timeouts,
+                ordered=self.tool_output_ordered,
+                tagged=True,
             ):
                 if direct_output:
-                    yield data
+                    yield ToolOutput(data, tool_name=tool_name)
                 else:
                     whole_output += str(data)
 
@@ -483,6 +694,33 @@ class AsyncAgent(Agent):
             logger.error(f"Error executing tool: {error}")
             raise error
 
+    async def async_parse_and_execute_sync_tools(self, response: str, parse_md: bool = True):
+        """Execute the synchronous tools called in the response without blocking the event loop."""
+        self._add_tool_output(await self._execute_sync_tools(response, parse_md))
+
+    async def _execute_sync_tools(self, response: str, parse_md: bool = True) -> Optional[str]:
+        logger.info("Executing tool...")
+        return await async_execute_sync(
+            functions=self.tools,
+            json_string=response,
+            parse_md=parse_md,
+            coroutines=self.tool_coroutines,
+            max_concurrency=self.max_tool_concurrency,
+            timeout=self.tool_timeout,
+            timeouts=self.tool_timeouts,
+        )
+
+    def _add_tool_output(self, output: Optional[str]) -> None:
+        if output is None:
+            return
+
+        logger.info(f"Tool Output: {output}")
+        # Add the output to the memory
+        self.short_memory.add(
+            role="Tool Executor",
+            content=output,
+        )
+
     async def send_node_message(self, message: str) -> AsyncIterator[NodeMessage]:
         """Send a node message to the agent."""
         if self.should_send_node:
@@ -493,4 +731,180 @@ class AsyncAgent(Agent):
         self.short_memory.add(
             role="History data",
             content=f"user: {memory.input}\n\nassistant: {memory.output}",
-        )
\ No newline at end of file
+        )
+
+
+class _SpeculativeToolCall:
+    """Tool calls started as soon as their JSON block closed, while the LLM was still streaming."""
+
+    def __init__(self, async_outputs: Optional[Prefetch] = None, sync_task: Optional[asyncio.Task] = None):
+        self._async_outputs = async_outputs
+        self._sync_task = sync_task
+
+    @staticmethod
+    def start(agent: AsyncAgent, block: str, content: str) -> Optional["_SpeculativeToolCall"]:
+        """
+        Start the tools called in a fenced JSON block.
+
+        Args:
+            agent (AsyncAgent): The agent whose tools are called.
+            block (str): The block, fences included.
+            content (str): The JSON inside the fences.
+
+        Returns:
+            Optional[_SpeculativeToolCall]: The started calls, or None if the block calls no tool of the agent.
+        """
+        try:
+            names = {call.get("name") for call in parse_function_calls(content)}
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.info(f"Tool call block is not valid JSON, waiting for the full response: {e}")
+            return None
+
+        # Same precedence as after the stream: async tools answer the user directly
+        if names & {tool.__name__ for tool in agent.async_tools}:
+            logger.info(f"Started tool calls {names} before the end of the response")
+            return _SpeculativeToolCall(
+                async_outputs=Prefetch(agent.async_parse_and_execute_tools(block, direct_output=True))
+            )
+        if names & {tool.__name__ for tool in agent.tools}:
+            logger.info(f"Started tool calls {names} before the end of the response")
+            return _SpeculativeToolCall(sync_task=asyncio.create_task(agent._execute_sync_tools(block)))
+        return None
+
+    async def async_outputs(self) -> AsyncIterator:
+        """Output of the async tools, as `async_parse_and_execute_tools` would yield it."""
+        if self._async_outputs is not None:
+            async for output in self._async_outputs:
+                yield output
+
+    async def sync_output(self) -> Optional[str]:
+        """Output of the sync tools, as `async_execute_sync` would return it."""
+        if self._sync_task is None:
+            return None
+        return await self._sync_task
+
+    async def cancel(self) -> None:
+        """Cancel the calls; their output is discarded."""
+        if self._async_outputs is not None:
+            await self._async_outputs.aclose()
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+if __name__ == '__main__':
+    import json
+    import time
+
+    from langchain_core.messages import AIMessageChunk
+
+    from agents.agent.prompts.tool_prompts import tool_prompt
+    from agents.utils.token_limiter import TokenLimiter
+
+    # Scripted ReAct vs native tool calling on the same conversations, with a simulated model
+    # whose latency grows with the prompt (prefill) and the number of streamed chunks (decode)
+    PREFILL_SECONDS_PER_TOKEN = 0.00002
+    DECODE_SECONDS_PER_CHUNK = 0.002
+    count_tokens = TokenLimiter().count_tokens
+
+    def query_price_by_ids(symbols: str, vs_currencies: str) -> dict:
+        """
+        Query the current price of coins.
+
+        Args:
+            symbols (str): coin symbol or coin name, comma-separated if querying more than 1 coin.
+            vs_currencies (str): target currency of coins, comma-separated if querying more than 1 currency.
+        """
+        return {symbol: {vs_currencies: 1000.0} for symbol in symbols.split(",")}
+
+    def query_historical_data_by_ids(symbol: str, vs_currency: str, days: int) -> dict:
+        """
+        Query the historical market data of a coin.
+
+        Args:
+            symbol (str): coin symbol or coin name.
+            vs_currency (str): target currency of market data.
+            days (int): number of days to retrieve data for.
+        """
+        return {"prices": [[1700000000000 + i * 3600000, 1000.0 + i] for i in range(24 * days)]}
+
+    conversations = [
+        ("What are the prices of BTC and ETH?",
+         [[("query_price_by_ids", {"symbols": "bitcoin", "vs_currencies": "usd"}),
+           ("query_price_by_ids", {"symbols": "ethereum", "vs_currencies": "usd"})]],
+         "BTC is at 1000 USD and ETH is at 1000 USD."),
+        ("How did SOL do over the last week?",
+         [[("query_historical_data_by_ids", {"symbol": "solana", "vs_currency": "usd", "days": 7})]],
+         "SOL went up 168 USD over the last week."),
+        ("What is a blockchain?", [], "A blockchain is a shared, append-only ledger."),
+    ]
+
+    class ScriptedLLM:
+        def __init__(self, turns: list, function_calling: bool):
+            self.turns = list(turns)
+            self.function_calling = function_calling
+            self.prompt_tokens = 0
+            self.chunks = 0
+
+        async def astream(self, task: str, **kwargs):
+            prompt_tokens = count_tokens(task) + count_tokens(json.dumps(kwargs.get("tools", [])))
+            self.prompt_tokens += prompt_tokens
+            await asyncio.sleep(prompt_tokens * PREFILL_SECONDS_PER_TOKEN)
+            turn = self.turns.pop(0)
+            if isinstance(turn, str):
+                text = turn if self.function_calling else f"Final Answer: {turn}"
+                deltas = []
+            elif self.function_calling:
+                text = ""
+                deltas = [
+                    {"index": index, "id": f"call_{index}", "function": {"name": name, "arguments": json.dumps(parameters)}}
+                    for index, (name, parameters) in enumerate(turn)
+                ]
+            else:
+                calls = {"functions": [{"name": name, "parameters": parameters} for name, parameters in turn]}
+                text, deltas = f"```json\n{json.dumps(calls)}\n```", []
+            for start in range(0, len(text), 4):
+                self.chunks += 1
+                await asyncio.sleep(DECODE_SECONDS_PER_CHUNK)
+                yield AIMessageChunk(content=text[start:start + 4])
+            for delta in deltas:
+                # Arguments are streamed in fragments
+                arguments = delta["function"].pop("arguments")
+                for start in range(0, len(arguments), 4):
+                    self.chunks += 1
+                    await asyncio.sleep(DECODE_SECONDS_PER_CHUNK)
+                    fragment = dict(delta, function=dict(delta["function"], arguments=arguments[start:start + 4]))
+                    yield AIMessageChunk(content="", additional_kwargs={"tool_calls": [fragment]})
+
+    async def run(function_calling: bool) -> tuple[int, int, float]:
+        prompt_tokens, chunks, start = 0, 0, time.perf_counter()
+        for query, tool_turns, answer in conversations:
+            llm = ScriptedLLM(tool_turns + [answer], function_calling)
+            agent = AsyncAgent(
+                agent_name="Bench Agent",
+                llm=llm,
+                tool_system_prompt=None if function_calling else tool_prompt(),
+                tools=[query_price_by_ids, query_historical_data_by_ids],
+                max_loops=4,
+                output_type="list",
+                stop_words=["Final Answer:"],
+                function_calling=function_calling,
+                speculative_tool_dispatch=False,
+                system_prompt="You are a crypto market assistant.",
+            )
+            async for _ in agent.acompletion(query):
+                pass
+            assert not llm.turns, "the agent did not follow the script"
+            prompt_tokens += llm.prompt_tokens
+            chunks += llm.chunks
+        return prompt_tokens, chunks, time.perf_counter() - start
+
+    async def main():
+        for mode, function_calling in (("ReAct", False), ("call", True)):
+            prompt_tokens, chunks, seconds = await run(function_calling)
+            print(f"{mode:>5}: {prompt_tokens} prompt tokens, {chunks} streamed chunks, {seconds * 1000:.0f} ms")
+
+    asyncio.run(main())
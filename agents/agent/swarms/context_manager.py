@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Optional
+
+from agents.agent.swarms.prompt_buffer import PromptBuffer
+from agents.common.metrics import metrics
+from agents.utils.token_limiter import TokenLimiter, ELLIPSIS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_ROLE = "Context Summary"
+DIGEST_PREFIX = "[digest] "
+
+SUMMARY_PROMPT = """Summarize the following part of a conversation between a user, an assistant and its tools, \
+so the assistant can continue the task without it. Keep every figure, name, date, coin and conclusion the \
+assistant may still need, drop the rest. Answer with the summary only.
+
+{conversation}"""
+
+
+class ContextManager:
+    """
+    Keeps the prompt of an agent run within a token budget.
+
+    The history is split into the stable prefix (system, tool prompts and schema, set at init),
+    the pinned task, the most recent messages and the compactable messages in between: past
+    turns loaded from memory, older responses and tool outputs. Once the prompt exceeds the
+    budget, compactable messages are replaced, oldest first:
+
+    1. large messages by a structured digest, JSON truncated with its structure kept
+    2. a run of messages by one summary, written by the LLM in the background and swapped in on
+       a later loop when ready
+    3. while the summary is pending, messages are trimmed to a few tokens
+
+    Messages are only ever replaced, never moved, so the stable prefix and the render of every
+    message before the first compacted one stay cached.
+    """
+
+    def __init__(
+            self,
+            budget: int = 16000,
+            keep_recent: int = 4,
+            digest_tokens: int = 256,
+            trim_tokens: int = 32,
+            summarize: Optional[Callable[[str], Awaitable[str]]] = None,
+            limiter: Optional[TokenLimiter] = None,
+    ):
+        """
+        Initialize ContextManager
+
+        Args:
+            budget (int): Maximum number of prompt tokens, 0 to never compact
+            keep_recent (int): Number of latest messages kept as they are
+            digest_tokens (int): Size of the digest of a large message
+            trim_tokens (int): Size of a message trimmed while its summary is pending
+            summarize (Callable[[str], Awaitable[str]]): Summarizes a part of the conversation,
+                None to only digest and trim
+            limiter (TokenLimiter): Truncates JSON digests
+        """
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.digest_tokens = digest_tokens
+        self.trim_tokens = trim_tokens
+        self.summarize = summarize
+        self.limiter = limiter or TokenLimiter(recursive=True)
+        self.prefix_length = 0
+        self._pinned: set[int] = set()
+        # Span (start, end) of the history being summarized and its summary task
+        self._span: Optional[tuple[int, int]] = None
+        self._summary: Optional[asyncio.Task] = None
+
+    def pin(self, index: int) -> None:
+        """
+        Never compact a message, e.g. the task of the run
+
+        Args:
+            index (int): Index of the message in the history
+        """
+        self._pinned.add(index)
+
+    def compact(self, history: list[dict], prompt_buffer: PromptBuffer) -> int:
+        """
+        Compact the history in place until its prompt fits the budget, as far as possible
+
+        Args:
+            history (list[dict]): Conversation history, e.g. `Conversation.conversation_history`
+            prompt_buffer (PromptBuffer): Renders the history and counts its tokens
+
+        Returns:
+            int: Number of tokens of the prompt after compaction
+        """
+        self._apply_summary(history)
+        tokens = prompt_buffer.message_tokens(history)
+        total = sum(tokens)
+        if not self.budget or total <= self.budget:
+            return total
+
+        # Counted once, then kept up to date message by message; the next render reuses the counts
+        before = total
+        candidates = self._compactable(history)
+        for i in candidates:
+            if total <= self.budget:
+                break
+            if tokens[i] > self.digest_tokens and not _is_compacted(history[i]):
+                total += self._replace(history, tokens, i, self._digest(history[i], tokens[i]), prompt_buffer)
+
+        if total > self.budget and self.summarize is not None and self._summary is None:
+            self._start_summary(history, candidates)
+
+        if total > self.budget:
+            for i in candidates:
+                if total <= self.budget:
+                    break
+                if tokens[i] > self.trim_tokens and history[i]["role"] != SUMMARY_ROLE:
+                    content = _text(history[i]).removeprefix(DIGEST_PREFIX)
+                    total += self._replace(history, tokens, i, DIGEST_PREFIX + _cut(
+                        content, self.trim_tokens, tokens[i]), prompt_buffer)
+
+        if total > self.budget:
+            logger.warning(f"Prompt still has {total} tokens after compaction, budget is {self.budget}")
+        logger.info(f"Compacted the prompt from {before} to {total} tokens")
+        metrics.incr("context.compactions")
+        metrics.observe("context.tokens_saved", before - total)
+        return total
+
+    def cancel(self) -> None:
+        """Drop the pending summary, e.g. at the end of the run"""
+        if self._summary is not None:
+            self._summary.cancel()
+        self._summary = None
+        self._span = None
+
+    def copy(self) -> "ContextManager":
+        """
+        Copy the settings for a new run, e.g. for an agent cloned from a template
+
+        Returns:
+            ContextManager: Manager without run state
+        """
+        clone = ContextManager(self.budget, self.keep_recent, self.digest_tokens, self.trim_tokens,
+                               self.summarize, self.limiter)
+        clone.prefix_length = self.prefix_length
+        return clone
+
+    @staticmethod
+    def _replace(history: list[dict], tokens: list[int], i: int, content: str, prompt_buffer: PromptBuffer) -> int:
+        # Returns the change of the token count of the prompt
+        message = {"role": history[i]["role"], "content": content}
+        count = prompt_buffer.count(message)
+        change, history[i], tokens[i] = count - tokens[i], message, count
+        return change
+
+    def _compactable(self, history: list[dict]) -> list[int]:
+        end = max(self.prefix_length, len(history) - self.keep_recent)
+        return [i for i in range(self.prefix_length, end) if i not in self._pinned]
+
+    def _digest(self, message: dict, tokens: int) -> str:
+        content = message["content"]
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except ValueError:
+                return DIGEST_PREFIX + _cut(content, self.digest_tokens, tokens)
+        if isinstance(content, (dict, list)):
+            return DIGEST_PREFIX + json.dumps(
+                self.limiter.limit_tokens_recursive(content, self.digest_tokens), ensure_ascii=False)
+        return DIGEST_PREFIX + _cut(str(content), self.digest_tokens, tokens)
+
+    def _start_summary(self, history: list[dict], candidates: list[int]) -> None:
+        # The oldest run of at least two messages, summaries included so they fold together
+        runs, run = [], []
+        for i in candidates:
+            if run and i != run[-1] + 1:
+                runs.append(run)
+                run = []
+            run.append(i)
+        runs.append(run)
+        run = next((run for run in runs if len(run) > 1), None)
+        if run is None:
+            return
+
+        start, end = run[0], run[-1] + 1
+        conversation = "\n\n".join(f"{message['role']}: {_text(message)}" for message in history[start:end])
+        self._span = (start, end)
+        self._summary = asyncio.create_task(self.summarize(SUMMARY_PROMPT.format(conversation=conversation)))
+        logger.info(f"Summarizing messages {start} to {end} in the background")
+
+    def _apply_summary(self, history: list[dict]) -> None:
+        if self._summary is None or not self._summary.done():
+            return
+        task, (start, end) = self._summary, self._span
+        self._summary, self._span = None, None
+        if task.cancelled() or task.exception() is not None:
+            logger.error(f"Context summary failed: {None if task.cancelled() else task.exception()}")
+            return
+        if end > len(history):
+            return
+
+        history[start:end] = [{"role": SUMMARY_ROLE, "content": task.result()}]
+        removed = end - start - 1
+        self._pinned = {i - removed if i >= end else i for i in self._pinned}
+        metrics.incr("context.summaries")
+        logger.info(f"Replaced messages {start} to {end} by their summary")
+
+
+def _text(message: dict) -> str:
+    content = message["content"]
+    return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+
+
+def _is_compacted(message: dict) -> bool:
+    return message["role"] == SUMMARY_ROLE or _text(message).startswith(DIGEST_PREFIX)
+
+
+def _cut(text: str, max_tokens: int, tokens: int) -> str:
+    # Proportional to the token count, no need to encode again
+    return text[:max(1, len(text) * max_tokens // max(tokens, 1))] + ELLIPSIS
+
+
+if __name__ == '__main__':
+    import random
+
+    def count_tokens(text: str) -> int:
+        return len(text) // 4
+
+    async def summarize(prompt: str) -> str:
+        await asyncio.sleep(0.05)
+        return f"Summary of {count_tokens(prompt)} tokens: BTC and ETH prices, SOL chart."
+
+    async def run(budget: int) -> list[int]:
+        rng = random.Random(7)
+        history = [
+            {"role": "system", "content": "You are a crypto market assistant. " * 40},
+            {"role": "system", "content": "Tool usage instructions. " * 80},
+        ]
+        manager = ContextManager(budget=budget, summarize=summarize, limiter=TokenLimiter(recursive=True))
+        manager.prefix_length = len(history)
+        history += [{"role": "History data", "content": f"user: question {i}\n\nassistant: " + "answer " * 400}
+                    for i in range(10)]
+        history.append({"role": "User", "content": "Write a report on the last year of BTC, ETH and SOL"})
+        manager.pin(len(history) - 1)
+
+        buffer, sizes = PromptBuffer(count_tokens), []
+        for loop in range(6):
+            sizes.append(manager.compact(history, buffer))
+            history.append({"role": "Pulse Agent", "content": f"step {loop} " * 50})
+            chart = {"prices": [[1700000000000 + i * 86400000, rng.random() * 1e4] for i in range(365)]}
+            history.append({"role": "Tool Executor", "content": json.dumps({"result": chart})})
+            # The next LLM call takes a while, the summary runs meanwhile
+            await asyncio.sleep(0.1)
+        manager.cancel()
+        return sizes
+
+    async def main():
+        print(f"prompt tokens per loop without budget: {await run(0)}")
+        print(f"prompt tokens per loop with a 10000 token budget: {await run(10000)}")
+        print(metrics.snapshot())
+
+    asyncio.run(main())
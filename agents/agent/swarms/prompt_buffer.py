@@ -0,0 +1,204 @@
+import logging
+from typing import Callable, Optional
+
+from agents.utils.token_limiter import TokenLimiter
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "\n"
+
+
+class _Rendered:
+    __slots__ = ("message", "role", "content", "text", "tokens")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self.role = message["role"]
+        self.content = message["content"]
+        self.text = f"{self.role}: {self.content}\n\n"
+        self.tokens: Optional[int] = None
+
+    def matches(self, message: dict) -> bool:
+        # Compared by identity, so a copied list holding the same messages keeps the cache
+        return (message is self.message and message.get("role") is self.role
+                and message.get("content") is self.content)
+
+
+class PromptBuffer:
+    """
+    Incremental render of a conversation history into a prompt string.
+
+    Produces the same text as `Conversation.return_history_as_string` ("role: content" and a
+    blank line per message, joined by newlines), but every message is rendered and token-counted once. Renders are kept per
+    message, by identity and content: appending only renders the new messages, and replacing,
+    editing or removing messages only renders the changed ones and joins the text again.
+    """
+
+    def __init__(self, count_tokens: Optional[Callable[[str], int]] = None):
+        """
+        Initialize PromptBuffer
+
+        Args:
+            count_tokens (Callable[[str], int]): Token counter, defaults to TokenLimiter.count_tokens
+        """
+        self.count_tokens = count_tokens or TokenLimiter().count_tokens
+        self._history: Optional[list] = None
+        # Render of every message of the last rendered history, in order
+        self._rendered: list[_Rendered] = []
+        # Messages counted by `count` before being rendered, by id
+        self._counted: dict[int, _Rendered] = {}
+        self._text = ""
+
+    def render(self, history: list[dict]) -> str:
+        """
+        Render the history, reusing the renders of messages that did not change
+
+        Args:
+            history (list[dict]): Conversation history, e.g. `Conversation.conversation_history`
+
+        Returns:
+            str: The prompt
+        """
+        start = self._unchanged_prefix(history)
+        self._history = history
+        if start < len(self._rendered):
+            # Messages still in the history keep their render, wherever they moved
+            kept = {id(rendered.message): rendered for rendered in self._rendered[start:]}
+            kept.update(self._counted)
+            tail = [self._get_rendered(message, kept) for message in history[start:]]
+            self._rendered[start:] = tail
+            logger.debug(f"Prompt buffer re-joined from message {start}")
+            self._text = SEPARATOR.join(rendered.text for rendered in self._rendered)
+        elif len(history) > len(self._rendered):
+            tail = [self._get_rendered(message, self._counted) for message in history[len(self._rendered):]]
+            self._rendered.extend(tail)
+            text = SEPARATOR.join(rendered.text for rendered in tail)
+            self._text = f"{self._text}{SEPARATOR}{text}" if self._text else text
+        self._counted.clear()
+        return self._text
+
+    def count(self, message: dict) -> int:
+        """
+        Number of tokens of a message, e.g. one about to replace another, kept for its render
+
+        Args:
+            message (dict): The message
+
+        Returns:
+            int: Its token count
+        """
+        rendered = self._counted.get(id(message))
+        if rendered is None or not rendered.matches(message):
+            rendered = self._counted[id(message)] = _Rendered(message)
+        if rendered.tokens is None:
+            rendered.tokens = self.count_tokens(rendered.text)
+        return rendered.tokens
+
+    def token_count(self, history: Optional[list[dict]] = None) -> int:
+        """
+        Number of tokens of the rendered prompt, counting each message once
+
+        Args:
+            history (list[dict]): Render this history first, defaults to the last rendered one
+
+        Returns:
+            int: Sum of the token counts of the messages
+        """
+        return sum(self._message_tokens(history))
+
+    def message_tokens(self, history: list[dict]) -> list[int]:
+        """
+        Token counts of the rendered messages, counting each message once
+
+        Args:
+            history (list[dict]): Render this history first
+
+        Returns:
+            list[int]: Token count of each message of the history
+        """
+        return self._message_tokens(history)
+
+    def copy(self) -> "PromptBuffer":
+        """
+        Copy the buffer, e.g. for an agent cloned from a template, keeping the renders and token counts
+
+        Returns:
+            PromptBuffer: Independent buffer with the same state
+        """
+        clone = PromptBuffer(self.count_tokens)
+        clone._history = self._history
+        # Renders are never changed once counted, they can be shared
+        clone._rendered = list(self._rendered)
+        clone._text = self._text
+        return clone
+
+    def _message_tokens(self, history: Optional[list[dict]]) -> list[int]:
+        if history is not None:
+            self.render(history)
+        elif self._history is not None:
+            self.render(self._history)
+        for rendered in self._rendered:
+            if rendered.tokens is None:
+                rendered.tokens = self.count_tokens(rendered.text)
+        return [rendered.tokens for rendered in self._rendered]
+
+    @staticmethod
+    def _get_rendered(message: dict, renders: dict[int, _Rendered]) -> _Rendered:
+        rendered = renders.get(id(message))
+        if rendered is None or not rendered.matches(message):
+            rendered = _Rendered(message)
+        return rendered
+
+    def _unchanged_prefix(self, history: list[dict]) -> int:
+        for i, rendered in enumerate(self._rendered):
+            if i >= len(history) or not rendered.matches(history[i]):
+                return i
+        return len(self._rendered)
+
+
+if __name__ == '__main__':
+    import json
+    import random
+    import time
+
+    from swarms import Conversation
+
+    def count_tokens(text: str) -> int:
+        return len(text) // 4
+
+    rng = random.Random(7)
+    tool_schema = {"type": "function", "functions": [
+        {"name": f"query_{i}", "description": "x" * 400, "parameters": {"type": "object"}} for i in range(8)
+    ]}
+    base = [
+        {"role": "system", "content": "You are a crypto market assistant. " * 40},
+        {"role": "system", "content": "Tool usage instructions. " * 80},
+        {"role": "system", "content": tool_schema},
+    ] + [
+        {"role": "History data", "content": f"user: question {i}\n\nassistant: " + "answer " * 300} for i in range(10)
+    ] + [{"role": "User", "content": "Compare the last year of BTC and ETH prices"}]
+
+    tool_outputs = [
+        json.dumps([[1700000000000 + i, rng.random() * 1e4] for i in range(3000)]) for _ in range(6)
+    ]
+
+    def run(render: Callable[[Conversation], str], count: Callable[[Conversation], int]) -> tuple[float, list]:
+        conversation = Conversation()
+        conversation.conversation_history = list(base)
+        prompts = []
+        start = time.perf_counter()
+        for loop in range(6):
+            prompts.append(render(conversation))
+            count(conversation)
+            conversation.conversation_history.append({"role": "Tool Executor", "content": tool_outputs[loop]})
+            conversation.conversation_history.append({"role": "Coin Agent", "content": f"step {loop} " * 50})
+        return time.perf_counter() - start, prompts
+
+    full_time, full_prompts = run(lambda conversation: conversation.return_history_as_string(),
+                                  lambda conversation: count_tokens(conversation.return_history_as_string()))
+    buffer = PromptBuffer(count_tokens)
+    buffer_time, buffer_prompts = run(lambda conversation: buffer.render(conversation.conversation_history),
+                                      lambda conversation: buffer.token_count())
+    assert buffer_prompts == full_prompts, "prompt buffer renders another text than the Conversation"
+    print(f"6 loops: Conversation.return_history_as_string {full_time * 1000:.1f} ms, "
+          f"prompt buffer {buffer_time * 1000:.1f} ms")
@@ -31,5 +31,6 @@ async def ai_search(query: str):
                         yield line.decode("utf-8")
                 except asyncio.CancelledError:
                     logger.info("Request cancelled")
+                    raise
             else:
                 yield f"Request failed with status code: {response.status}"
\ No newline at end of file
@@ -0,0 +1,211 @@
+import logging
+from typing import Optional, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SubstringIndex:
+    """
+    N-gram postings index answering "first key (in insertion order) whose text contains the query".
+
+    Texts are indexed by every 1-, 2- and 3-gram. Short queries are answered directly from the
+    1/2-gram tables; longer queries scan the rarest trigram posting list in insertion order and
+    verify the substring, so lookups touch only a handful of candidates instead of every entry.
+    """
+
+    gram_size: int = 3
+
+    def __init__(self):
+        self._keys: list[str] = []
+        self._texts: list[str] = []
+        self._first: dict[str, int] = {}
+        self._postings: dict[str, list[int]] = {}
+
+    def add(self, key: str, text: str) -> None:
+        """
+        Index a text under the given key.
+
+        Args:
+            key (str): Value returned when the text matches.
+            text (str): Text to index, matched case-insensitively.
+        """
+        text = text.lower()
+        position = len(self._keys)
+        self._keys.append(key)
+        self._texts.append(text)
+
+        seen = set()
+        for size in range(1, self.gram_size + 1):
+            for i in range(len(text) - size + 1):
+                gram = text[i:i + size]
+                if gram in seen:
+                    continue
+                seen.add(gram)
+                if size < self.gram_size:
+                    self._first.setdefault(gram, position)
+                else:
+                    self._postings.setdefault(gram, []).append(position)
+
+    def find(self, query: str) -> Optional[str]:
+        """
+        Find the first indexed key whose text contains the query.
+
+        Args:
+            query (str): Lowercase substring to search for.
+
+        Returns:
+            Optional[str]: Matching key, or None if nothing matches.
+        """
+        if not query:
+            return self._keys[0] if self._keys else None
+
+        if len(query) < self.gram_size:
+            position = self._first.get(query)
+            return self._keys[position] if position is not None else None
+
+        candidates = None
+        for i in range(len(query) - self.gram_size + 1):
+            postings = self._postings.get(query[i:i + self.gram_size])
+            if postings is None:
+                return None
+            if candidates is None or len(postings) < len(candidates):
+                candidates = postings
+
+        for position in candidates:
+            if query in self._texts[position]:
+                return self._keys[position]
+        return None
+
+
+class CoinIndex:
+    """
+    Resolver index over the CoinGecko coin list, built once by `init_id_maps`.
+
+    Lookup order matches the historical linear scan: exact id, then exact symbol, then the
+    first coin whose name contains the query. Symbol collisions are broken by the lowest
+    `market_cap_rank` when the upstream provides one, otherwise by listing order.
+    """
+
+    def __init__(self, id_maps: dict[str, dict]):
+        self.ids = id_maps
+        self.symbols: dict[str, str] = {}
+        self.names = SubstringIndex()
+
+        ranks: dict[str, Tuple[float, int]] = {}
+        for order, (coin_id, item) in enumerate(id_maps.items()):
+            symbol = item.get('symbol')
+            if symbol:
+                symbol = symbol.lower()
+                rank = (item.get('market_cap_rank') or float('inf'), order)
+                if symbol not in ranks or rank < ranks[symbol]:
+                    ranks[symbol] = rank
+                    self.symbols[symbol] = coin_id
+            name = item.get('name')
+            if name:
+                self.names.add(coin_id, name)
+
+    def resolve(self, symbol: str, default: str = None) -> str:
+        """
+        Resolve a coin id, symbol or name to a CoinGecko coin id.
+
+        Args:
+            symbol (str): Coin id, symbol or (part of a) name.
+            default (str): Value returned when nothing matches.
+
+        Returns:
+            str: The resolved coin id, or the default.
+        """
+        symbol = symbol.lower().strip()
+        if symbol in self.ids:
+            return symbol
+        if symbol in self.symbols:
+            return self.symbols[symbol]
+        return self.names.find(symbol) or default
+
+
+class PlatformIndex:
+    """
+    Resolver index over the CoinGecko asset platform list.
+
+    Lookup order: exact platform id, exact platform name, then the first platform whose
+    `native_coin_id` contains the query.
+    """
+
+    def __init__(self, platform_maps: dict[str, dict]):
+        self.ids = platform_maps
+        self.names: dict[str, str] = {}
+        self.native_coins = SubstringIndex()
+
+        for platform_id, item in platform_maps.items():
+            name = item.get('name')
+            if name:
+                self.names.setdefault(name.lower(), platform_id)
+            native_coin_id = item.get('native_coin_id')
+            if native_coin_id:
+                self.native_coins.add(platform_id, native_coin_id)
+
+    def resolve(self, platform: str, default: str = None) -> str:
+        """
+        Resolve a platform id or name to a CoinGecko asset platform id.
+
+        Args:
+            platform (str): Platform id, name or native coin id.
+            default (str): Value returned when nothing matches.
+
+        Returns:
+            str: The resolved platform id, or the default.
+        """
+        platform = platform.lower().strip()
+        if platform in self.ids:
+            return platform
+        if platform in self.names:
+            return self.names[platform]
+        return self.native_coins.find(platform) or default
+
+
+def _linear_to_id(id_maps: dict[str, dict], symbol: str, default: str = None) -> str:
+    symbol = symbol.lower().strip()
+    if symbol in id_maps.keys():
+        return symbol
+    for k, v in id_maps.items():
+        if 'symbol' in v and v['symbol'].lower() == symbol:
+            return k
+    for k, v in id_maps.items():
+        if 'name' in v and symbol in v['name'].lower():
+            return k
+    return default
+
+
+def _synthetic_coins(count: int) -> Iterable[dict]:
+    import random
+    import string
+    rng = random.Random(42)
+    for i in range(count):
+        name = " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 3))
+        )
+        yield {"id": f"coin-{i}", "symbol": name[:rng.randint(2, 5)], "name": name.title()}
+
+
+if __name__ == '__main__':
+    import time
+
+    coins = {item['id']: item for item in _synthetic_coins(15000)}
+    queries = ["coin-42", "abc", "zzzz", "qu", "hello world", "btc", "eth", "sol", "doge", "pepe"] * 10
+
+    start = time.perf_counter()
+    index = CoinIndex(coins)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear = [_linear_to_id(coins, q, "bitcoin") for q in queries]
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [index.resolve(q, "bitcoin") for q in queries]
+    indexed_time = time.perf_counter() - start
+
+    assert linear == indexed, "index must resolve exactly like the linear scan"
+    print(f"build: {build_time * 1000:.1f} ms for {len(coins)} coins")
+    print(f"linear: {linear_time / len(queries) * 1e6:.1f} us/lookup")
+    print(f"indexed: {indexed_time / len(queries) * 1e6:.1f} us/lookup ({linear_time / indexed_time:.0f}x)")
@@ -1,8 +1,27 @@
+import asyncio
+import gzip
+import hashlib
+import json
 import logging
-
-import requests
-
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from functools import partial
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+from agents.agent.tools.coin_index import CoinIndex, PlatformIndex
+from agents.agent.tools.price_batcher import PriceBatcher
+from agents.agent.tools.tool_runner import tool_runner
 from agents.common.config import SETTINGS
+from agents.common.http_client import http_client, HttpStatusError
+from agents.common.metrics import metrics
+from agents.common.rate_limiter import RateLimiter, Priority
+from agents.common.redis_utils import redis_utils
+from agents.common.response_cache import ResponseCache
+from agents.utils.downsample import downsample_market_chart, points_for_budget
+from agents.utils.projection import Projection
 from agents.utils.token_limiter import TokenLimiter
 
 logger = logging.getLogger(__name__)
@@ -11,27 +30,199 @@ host = SETTINGS.COIN_HOST
 
 id_maps = {}
 platform_maps = {}
-tokenizer = TokenLimiter()
+coin_index = CoinIndex(id_maps)
+platform_index = PlatformIndex(platform_maps)
+id_maps_updated_at = 0.0
+snapshot_redis_key = "pulse.coin_maps"
+tokenizer = TokenLimiter(recursive=True)
+# Per-endpoint TTLs (seconds) for CoinGecko responses, matched against the URL path
+response_cache = ResponseCache(
+    name="coin_cache",
+    ttls={
+        '/api/v3/simple/price': SETTINGS.COIN_PRICE_CACHE_TTL,
+        '/api/v3/simple/token_price/': SETTINGS.COIN_PRICE_CACHE_TTL,
+        '/api/v3/coins/markets': SETTINGS.COIN_MARKETS_CACHE_TTL,
+        '/api/v3/coins/top_gainers_losers': SETTINGS.COIN_MARKETS_CACHE_TTL,
+        '/market_chart': SETTINGS.COIN_CHART_CACHE_TTL,
+    },
+    max_entries=SETTINGS.COIN_CACHE_MAX_ENTRIES,
+    use_redis=SETTINGS.COIN_CACHE_REDIS_ENABLED,
+)
+# Fields of each CoinGecko endpoint that are passed on to the agent
+markets_projection = Projection(include=[
+    'id', 'symbol', 'name', 'current_price', 'market_cap', 'market_cap_rank', 'fully_diluted_valuation',
+    'total_volume', 'high_24h', 'low_24h', 'price_change_percentage_24h', 'price_change_percentage_*_in_currency',
+    'market_cap_change_percentage_24h', 'circulating_supply', 'total_supply', 'max_supply',
+    'ath', 'ath_change_percentage', 'atl', 'atl_change_percentage',
+])
+top_gainers_losers_projection = Projection(exclude=['image'])
+# Token buckets per upstream host and API key, shared by every worker
+rate_limiter = RateLimiter(
+    name="coin_rate_limiter",
+    rate_per_minute=SETTINGS.COIN_RATE_LIMIT_PER_MINUTE,
+    burst=SETTINGS.COIN_RATE_LIMIT_BURST,
+    limits={
+        urlsplit(SETTINGS.COIN_HOST_V2).netloc: (SETTINGS.COIN_V2_RATE_LIMIT_PER_MINUTE,
+                                                 SETTINGS.COIN_RATE_LIMIT_BURST),
+    } if SETTINGS.COIN_HOST_V2 else None,
+)
+
+
+class CoinListNotLoadedError(Exception):
+    """Raised when resolving a coin before the coin list was ever loaded."""
+
+
+def init_id_maps(timeout: float = SETTINGS.COIN_MAPS_STARTUP_TIMEOUT):
+    """
+    Load the coin and platform maps from the local snapshot, or Redis if there is none.
 
+    Only without any snapshot, on a cold start, the maps are fetched from CoinGecko once,
+    waiting at most `timeout` seconds; if that fails they stay empty until
+    `refresh_id_maps_periodically` has fetched them, and coin lookups fail meanwhile.
 
-def init_id_maps():
-    url = host + '/api/v3/coins/list'
-    response = send_http_request('get', url, {}, {}, False)
-    if response:
-        for item in response:
-            id_maps[item['id']] = item
-    else:
-        raise Exception("Failed to fetch coin list from CoinGecko API.")
-    url = host + '/api/v3/asset_platforms'
-    response = send_http_request('get', url, {}, {}, False)
-    if response:
-        for item in response:
-            platform_maps[item['id']] = item
-    else:
-        raise Exception("Failed to fetch asset platform list from CoinGecko API.")
+    Args:
+        timeout (float): Seconds to wait for CoinGecko without a snapshot.
+    """
+    snapshot = _load_snapshot_file() or _load_snapshot_redis()
+    if snapshot is None:
+        logger.warning("No coin map snapshot found, fetching the coin list")
+        try:
+            refresh_id_maps(timeout)
+        except Exception as e:
+            logger.error(f"Failed to fetch coin maps, waiting for background refresh: {e}")
+        return
+    coins, platforms, updated_at = snapshot
+    _swap_id_maps(coins, platforms, CoinIndex(coins), PlatformIndex(platforms), updated_at)
+    logger.info(f"Loaded {len(coins)} coins and {len(platforms)} platforms from snapshot")
+
+
+async def refresh_id_maps_periodically(interval: int = SETTINGS.COIN_MAPS_REFRESH_INTERVAL):
+    """
+    Refresh the coin and platform maps from CoinGecko in the background, forever.
+
+    The first refresh runs as soon as the loaded snapshot is older than `interval`; failed
+    refreshes are retried after `COIN_MAPS_RETRY_INTERVAL` while the current maps keep serving.
 
+    Args:
+        interval (int): Seconds between successful refreshes.
+    """
+    while True:
+        await asyncio.sleep(max(0.0, id_maps_updated_at + interval - time.time()))
+        try:
+            await async_refresh_id_maps()
+        except Exception as e:
+            logger.error(f"Failed to refresh coin maps: {e}")
+            await asyncio.sleep(SETTINGS.COIN_MAPS_RETRY_INTERVAL)
 
 
+def refresh_id_maps(timeout: float = SETTINGS.COIN_MAPS_STARTUP_TIMEOUT):
+    """
+    Blocking counterpart of `async_refresh_id_maps`, e.g. on a cold start before serving.
+
+    Args:
+        timeout (float): Seconds to wait for the coin list, and then for the platform list.
+    """
+    deadline = time.monotonic() + timeout
+    headers = {'x-cg-pro-api-key': SETTINGS.COIN_API_KEY} if SETTINGS.COIN_API_KEY else {}
+    coins = _request('get', host + '/api/v3/coins/list', dict(headers), {}, timeout)
+    _check_list(coins, "coin")
+    platforms = _request('get', host + '/api/v3/asset_platforms', dict(headers), {},
+                         max(1.0, deadline - time.monotonic()))
+    _check_list(platforms, "asset platform")
+
+    new_id_maps = {item['id']: item for item in coins}
+    new_platform_maps = {item['id']: item for item in platforms}
+    updated_at = time.time()
+    _swap_id_maps(new_id_maps, new_platform_maps, CoinIndex(new_id_maps), PlatformIndex(new_platform_maps),
+                  updated_at)
+    logger.info(f"Fetched {len(new_id_maps)} coins and {len(new_platform_maps)} platforms")
+    _save_snapshot(coins, platforms, updated_at)
+
+
+async def async_refresh_id_maps():
+    """
+    Fetch the coin and platform lists, swap them in atomically and persist a new snapshot.
+    """
+    coins = await async_send_http_request('get', host + '/api/v3/coins/list', {}, {}, False,
+                                          priority=Priority.BACKGROUND)
+    _check_list(coins, "coin")
+    platforms = await async_send_http_request('get', host + '/api/v3/asset_platforms', {}, {}, False,
+                                              priority=Priority.BACKGROUND)
+    _check_list(platforms, "asset platform")
+
+    new_id_maps = {item['id']: item for item in coins}
+    new_platform_maps = {item['id']: item for item in platforms}
+    # Index building is CPU-bound, keep it off the event loop
+    new_coin_index = await asyncio.to_thread(CoinIndex, new_id_maps)
+    new_platform_index = await asyncio.to_thread(PlatformIndex, new_platform_maps)
+    updated_at = time.time()
+    _swap_id_maps(new_id_maps, new_platform_maps, new_coin_index, new_platform_index, updated_at)
+    logger.info(f"Refreshed {len(new_id_maps)} coins and {len(new_platform_maps)} platforms")
+
+    await asyncio.to_thread(_save_snapshot, coins, platforms, updated_at)
+
+
+def _check_list(items, name: str):
+    if not isinstance(items, list) or not items:
+        raise Exception(f"Failed to fetch {name} list from CoinGecko API.")
+
+
+def _swap_id_maps(new_id_maps: dict, new_platform_maps: dict,
+                  new_coin_index: CoinIndex, new_platform_index: PlatformIndex, updated_at: float):
+    """Rebind the maps and their indexes; lookups see either the old or the new set, never a mix."""
+    global id_maps, platform_maps, coin_index, platform_index, id_maps_updated_at
+    id_maps, platform_maps = new_id_maps, new_platform_maps
+    coin_index, platform_index = new_coin_index, new_platform_index
+    id_maps_updated_at = updated_at
+
+
+def _save_snapshot(coins: list, platforms: list, updated_at: float):
+    payload = json.dumps(
+        {"updated_at": updated_at, "coins": coins, "platforms": platforms},
+        separators=(',', ':'),
+    )
+    path = SETTINGS.COIN_MAPS_SNAPSHOT_PATH
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write coin map snapshot: {e}")
+    redis_utils.set_value(snapshot_redis_key, payload)
+
+
+def _load_snapshot_file():
+    path = SETTINGS.COIN_MAPS_SNAPSHOT_PATH
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return _parse_snapshot(f.read())
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Failed to read coin map snapshot {path}: {e}")
+        return None
+
+
+def _load_snapshot_redis():
+    payload = redis_utils.get_value(snapshot_redis_key)
+    if not payload:
+        return None
+    try:
+        return _parse_snapshot(payload)
+    except (ValueError, KeyError) as e:
+        logger.error(f"Failed to parse coin map snapshot from redis: {e}")
+        return None
+
+
+def _parse_snapshot(payload: str):
+    data = json.loads(payload)
+    coins = {item['id']: item for item in data['coins']}
+    platforms = {item['id']: item for item in data['platforms']}
+    return coins, platforms, data['updated_at']
+
 
 def query_price_by_ids(symbols: str, vs_currencies: str) -> dict:
     """
@@ -45,18 +236,72 @@ def query_price_by_ids(symbols: str, vs_currencies: str) -> dict:
         dict: price(s) of cryptocurrency.
     """
     logger.info(f'Querying price of {symbols} in {vs_currencies}')
+    return send_http_request('get', *_price_request(symbols, vs_currencies))
+
+async def async_query_price_by_ids(symbols: str, vs_currencies: str) -> dict:
+    logger.info(f'Querying price of {symbols} in {vs_currencies}')
+    if not SETTINGS.PRICE_BATCH_ENABLED:
+        return await async_send_http_request('get', *_price_request(symbols, vs_currencies))
+
+    ids = [to_id(symbol, "bitcoin") for symbol in symbols.split(',')]
+    data = await price_batcher.get(ids, _currencies(vs_currencies))
+    return await tool_runner.run("coin_tools.postprocess", _postprocess, data)
+
+async def _fetch_batched_prices(pairs: list[tuple[str, str]]) -> dict:
+    url = host + '/api/v3/simple/price'
+    ttl = response_cache.ttl_for(url)
+    # Cached per coin and currency, whatever else was batched: each entry is the response of a
+    # single coin and currency lookup, shared with the unbatched path
+    keys = {(coin_id, currency): response_cache.key('get', url, {'ids': coin_id, 'vs_currencies': currency})
+            for coin_id, currency in pairs}
+    cached = await response_cache.aget_many(list(keys.values())) if ttl else {}
+    missing = [pair for pair, key in keys.items() if key not in cached]
+    if not missing:
+        return _merge_prices(cached[key] for key in keys.values())
+
+    params = {
+        'ids': ",".join(sorted({coin_id for coin_id, _ in missing})),
+        'vs_currencies': ",".join(sorted({currency for _, currency in missing}))
+    }
+    headers = {
+        'accept': 'application/json',
+    }
+    data = await async_send_http_request('get', url, headers, params, limit_tokens=False, cache=False)
+    if not isinstance(data, dict) or not data or "error" in data:
+        return data
+    fetched = {}
+    for coin_id, currency in missing:
+        prices = data.get(coin_id)
+        fetched[keys[coin_id, currency]] = (
+            {coin_id: {currency: prices[currency]}} if isinstance(prices, dict) and currency in prices else {}
+        )
+    if ttl:
+        await response_cache.aset_many(fetched, ttl)
+    return _merge_prices({**cached, **fetched}[key] for key in keys.values())
+
+def _merge_prices(responses) -> dict:
+    data = {}
+    for response in responses:
+        for coin_id, prices in response.items():
+            data.setdefault(coin_id, {}).update(prices)
+    return data
+
+def _price_request(symbols: str, vs_currencies: str):
     ids = ",".join([to_id(symbol, "bitcoin") for symbol in symbols.split(',')])
 
     url = host + '/api/v3/simple/price'
     params = {
         'ids': ids,
-        'vs_currencies': vs_currencies
+        'vs_currencies': ",".join(_currencies(vs_currencies))
     }
     headers = {
         'accept': 'application/json',
     }
+    return url, headers, params
 
-    return send_http_request('get', url, headers, params)
+def _currencies(vs_currencies: str) -> list[str]:
+    # Normalized the same way batched or not, CoinGecko answers with lowercase currencies
+    return [currency.strip().lower() for currency in vs_currencies.split(',') if currency.strip()]
 
 def query_historical_data_by_ids(symbol: str,
                                  vs_currency: str,
@@ -72,6 +317,23 @@ def query_historical_data_by_ids(symbol: str,
         dict: historical data of cryptocurrency.
     """
     logger.info(f'Querying historical data of {symbol} in {vs_currency}')
+    return send_http_request('get', *_historical_data_request(symbol, vs_currency, days),
+                             transform=_compact_market_chart)
+
+async def async_query_historical_data_by_ids(symbol: str, vs_currency: str, days: int) -> dict:
+    logger.info(f'Querying historical data of {symbol} in {vs_currency}')
+    return await async_send_http_request('get', *_historical_data_request(symbol, vs_currency, days),
+                                         transform=_compact_market_chart)
+
+def _compact_market_chart(data):
+    """Downsample every series to what fits the token budget, so truncation never drops a series."""
+    max_points = points_for_budget(data, tokenizer.max_tokens, tokenizer.count_tokens)
+    if max_points is None:
+        return data
+    return downsample_market_chart(data, min(max_points, SETTINGS.COIN_CHART_MAX_POINTS),
+                                   SETTINGS.COIN_CHART_SUMMARY_ENABLED)
+
+def _historical_data_request(symbol: str, vs_currency: str, days: int):
     id = to_id(symbol, "bitcoin")
 
     url = host + '/api/v3/coins/{id}/market_chart'
@@ -83,9 +345,7 @@ def query_historical_data_by_ids(symbol: str,
     headers = {
         'accept': 'application/json',
     }
-
-    data = send_http_request('get', url, headers, params)
-    return data
+    return url, headers, params
 
 def query_markets_by_currency(vs_currency: str,
                               symbols: str=None,
@@ -101,6 +361,17 @@ def query_markets_by_currency(vs_currency: str,
         dict: markets where cryptocurrency is traded.
     """
     logger.info(f'Querying markets data of {vs_currency}')
+    return send_http_request('get', *_markets_request(vs_currency, symbols, price_change_percentage),
+                             transform=markets_projection)
+
+async def async_query_markets_by_currency(vs_currency: str,
+                                          symbols: str=None,
+                                          price_change_percentage: str="24h") -> dict:
+    logger.info(f'Querying markets data of {vs_currency}')
+    return await async_send_http_request('get', *_markets_request(vs_currency, symbols, price_change_percentage),
+                                         transform=markets_projection)
+
+def _markets_request(vs_currency: str, symbols: str, price_change_percentage: str):
     if symbols:
         ids = ",".join([to_id(symbol, "bitcoin") for symbol in symbols.split(',')])
     else:
@@ -114,8 +385,7 @@ def query_markets_by_currency(vs_currency: str,
     headers = {
         'accept': 'application/json',
     }
-
-    return send_http_request('get', url, headers, params)
+    return url, headers, params
 
 def query_token_price_by_id(platform: str, contract_addresses: str, vs_currencies: str):
     """
@@ -128,6 +398,12 @@ def query_token_price_by_id(platform: str, contract_addresses: str, vs_currencie
     Returns:
         dict: price(s) of tokens.
     """
+    return send_http_request('get', *_token_price_request(platform, contract_addresses, vs_currencies))
+
+async def async_query_token_price_by_id(platform: str, contract_addresses: str, vs_currencies: str):
+    return await async_send_http_request('get', *_token_price_request(platform, contract_addresses, vs_currencies))
+
+def _token_price_request(platform: str, contract_addresses: str, vs_currencies: str):
     url = host + '/api/v3/simple/token_price/{id}'
     id = platform_to_id(platform, None)
     url = url.format(id=id)
@@ -138,8 +414,7 @@ def query_token_price_by_id(platform: str, contract_addresses: str, vs_currencie
     headers = {
         'accept': 'application/json',
     }
-
-    return send_http_request('get', url, headers, params)
+    return url, headers, params
 
 def query_top_gainers_losers(vs_currency: str, duration='24h', top_coins=50):
     """
@@ -151,6 +426,14 @@ def query_top_gainers_losers(vs_currency: str, duration='24h', top_coins=50):
     Returns:
         dict: List top 30 gainers and losers.
     """
+    return send_http_request('get', *_top_gainers_losers_request(vs_currency, duration, top_coins),
+                             transform=top_gainers_losers_projection)
+
+async def async_query_top_gainers_losers(vs_currency: str, duration='24h', top_coins=50):
+    return await async_send_http_request('get', *_top_gainers_losers_request(vs_currency, duration, top_coins),
+                                         transform=top_gainers_losers_projection)
+
+def _top_gainers_losers_request(vs_currency: str, duration: str, top_coins: int):
     url = host + '/api/v3/coins/top_gainers_losers'
     params = {
         'vs_currency': vs_currency,
@@ -160,62 +443,144 @@ def query_top_gainers_losers(vs_currency: str, duration='24h', top_coins=50):
     headers = {
         'accept': 'application/json',
     }
-
-    return send_http_request('get', url, headers, params)
+    return url, headers, params
 
 
 def to_id(symbol: str, default: str=None) -> str:
     """
         Convert a symbol to an id.
     """
-    symbol = symbol.lower().strip()
-    if symbol in id_maps.keys():
-        return symbol
-    for k, v in id_maps.items():
-        if 'symbol' in v and v['symbol'].lower() == symbol:
-            return k
-    for k, v in id_maps.items():
-        if 'name' in v and symbol in v['name'].lower():
-            return k
-    return default
+    if not id_maps:
+        # Falling back to the default would silently answer with another coin
+        raise CoinListNotLoadedError("The coin list is not loaded yet, please try again shortly")
+    return coin_index.resolve(symbol, default)
 
 def platform_to_id(platform: str, default: str=None) -> str:
-    platform = platform.lower().strip()
-    if platform in platform_maps.keys():
-        return platform
-    for k, v in platform_maps.items():
-        if 'name' in v and v['name'].lower() == platform:
-            return k
-    for k, v in platform_maps.items():
-        if 'native_coin_id' in v and platform in v['native_coin_id'].lower():
-            return k
-    return default
+    return platform_index.resolve(platform, default)
 
 def send_http_request(method: str,
                       url: str,
                       headers: dict,
                       params: dict,
                       limit_tokens=True,
-                      api_key=SETTINGS.COIN_API_KEY) -> dict:
+                      api_key=SETTINGS.COIN_API_KEY,
+                      transform: Callable[[Any], Any] = None) -> dict:
     try:
         headers = headers or {}
         if api_key:
             headers['x-cg-pro-api-key'] = api_key
 
-        response = requests.request(method, url, headers=headers, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            if limit_tokens:
-                # Truncate response based on token count
-                return tokenizer.limit_tokens(data)
-            return data
+        fetch = partial(_request, method, url, headers, params)
+        ttl = response_cache.ttl_for(url)
+        if ttl:
+            data = response_cache.get_or_fetch(response_cache.key(method, url, params), ttl, fetch)
         else:
-            logger.error(f'Failed to query markets data: {response.status_code} {response.text}')
-            return {"error": "request error"}
+            data = fetch()
+        if transform:
+            data = transform(data)
+        if limit_tokens:
+            # Truncate response based on token count
+            return tokenizer.limit_tokens(data)
+        return data
+    except HttpStatusError as e:
+        logger.error(f'Failed to query markets data: {e.status} {e.text}')
+        return {"error": "request error"}
     except Exception as e:
         logger.error(f"Error sending HTTP request: {e}")
     return {}
 
+async def async_send_http_request(method: str,
+                                  url: str,
+                                  headers: dict,
+                                  params: dict,
+                                  limit_tokens=True,
+                                  api_key=SETTINGS.COIN_API_KEY,
+                                  priority: Priority = Priority.INTERACTIVE,
+                                  transform: Callable[[Any], Any] = None,
+                                  cache: bool = True) -> dict:
+    try:
+        headers = headers or {}
+        if api_key:
+            headers['x-cg-pro-api-key'] = api_key
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+
+        fetch = partial(_async_request, method, url, headers, params, priority)
+        ttl = response_cache.ttl_for(url) if cache else 0
+        if ttl:
+            data = await response_cache.aget_or_fetch(response_cache.key(method, url, params), ttl, fetch)
+        else:
+            data = await fetch()
+        # Downsampling, projection and tokenization of large responses would stall the event loop
+        return await tool_runner.run("coin_tools.postprocess", _postprocess, data, transform, limit_tokens)
+    except HttpStatusError as e:
+        logger.error(f'Failed to query markets data: {e.status} {e.text}')
+        return {"error": "request error"}
+    except Exception as e:
+        logger.error(f"Error sending HTTP request: {e}")
+    return {}
+
+def _postprocess(data, transform: Callable[[Any], Any] = None, limit_tokens=True):
+    if transform:
+        data = transform(data)
+    if limit_tokens:
+        # Truncate response based on token count
+        return tokenizer.limit_tokens(data)
+    return data
+
+def _request(method: str, url: str, headers: dict, params: dict, timeout: float = None):
+    bucket = _rate_limit_bucket(url, headers)
+    session = http_client.sync_session(url)
+    for attempt in range(SETTINGS.COIN_RATE_LIMIT_MAX_RETRIES + 1):
+        rate_limiter.acquire_sync(bucket)
+        response = session.request(method, url, headers=headers, params=params,
+                                   timeout=timeout or http_client.sync_timeout)
+        if response.status_code == 200:
+            return response.json()
+        error = HttpStatusError(response.status_code, response.text, dict(response.headers))
+        if response.status_code != 429 or attempt == SETTINGS.COIN_RATE_LIMIT_MAX_RETRIES:
+            raise error
+        delay = _throttle(bucket, error, attempt)
+        rate_limiter.block(bucket, delay)
+        time.sleep(random.uniform(0, delay * SETTINGS.COIN_RATE_LIMIT_JITTER))
+
+async def _async_request(method: str, url: str, headers: dict, params: dict,
+                         priority: Priority = Priority.INTERACTIVE):
+    bucket = _rate_limit_bucket(url, headers)
+    for attempt in range(SETTINGS.COIN_RATE_LIMIT_MAX_RETRIES + 1):
+        await rate_limiter.acquire(bucket, priority)
+        async with http_client.session(url).request(method, url, headers=headers, params=params) as response:
+            if response.status == 200:
+                return await response.json(content_type=None)
+            error = HttpStatusError(response.status, await response.text(), dict(response.headers))
+        if response.status != 429 or attempt == SETTINGS.COIN_RATE_LIMIT_MAX_RETRIES:
+            raise error
+        delay = _throttle(bucket, error, attempt)
+        await rate_limiter.ablock(bucket, delay)
+        await asyncio.sleep(random.uniform(0, delay * SETTINGS.COIN_RATE_LIMIT_JITTER))
+
+def _throttle(bucket: str, error: HttpStatusError, attempt: int) -> float:
+    """Seconds to pause the bucket after a 429: Retry-After if given, else exponential backoff."""
+    metrics.incr("coin_rate_limiter.throttled")
+    retry_after = error.headers.get('Retry-After') or error.headers.get('retry-after')
+    delay = None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+    if delay is None or delay <= 0:
+        delay = SETTINGS.COIN_RATE_LIMIT_BACKOFF * (2 ** attempt)
+    logger.warning(f"Upstream rate limited {bucket}, pausing for {delay:.1f}s")
+    return delay
+
+def _rate_limit_bucket(url: str, headers: dict) -> str:
+    """One bucket per upstream host and API key; the key itself is only stored hashed."""
+    api_key = headers.get('x-cg-pro-api-key') or headers.get('X-CMC_PRO_API_KEY') or ''
+    return f"{urlsplit(url).netloc}:{hashlib.sha1(api_key.encode()).hexdigest()[:8]}"
+
 def query_listings_historical(date: str):
     """
     Returns a ranked and sorted list of all cryptocurrencies for a historical UTC date.
@@ -226,7 +591,12 @@ def query_listings_historical(date: str):
     Returns:
         dict: A dictionary containing the listing information.
     """
+    return send_http_request('get', *_listings_historical_request(date), api_key=None)
+
+async def async_query_listings_historical(date: str):
+    return await async_send_http_request('get', *_listings_historical_request(date), api_key=None)
 
+def _listings_historical_request(date: str):
     url = SETTINGS.COIN_HOST_V2 + '/v1/cryptocurrency/listings/historical'
     params = {
         'date': date,
@@ -235,10 +605,15 @@ def query_listings_historical(date: str):
         'accept': 'application/json',
         'X-CMC_PRO_API_KEY': SETTINGS.COIN_API_KEY_V2
     }
-    return send_http_request('get', url, headers, params, api_key=None)
+    return url, headers, params
 
 def query_OHLCV_historical(symbol: str):
+    return send_http_request('get', *_ohlcv_historical_request(symbol), api_key=None)
 
+async def async_query_OHLCV_historical(symbol: str):
+    return await async_send_http_request('get', *_ohlcv_historical_request(symbol), api_key=None)
+
+def _ohlcv_historical_request(symbol: str):
     url = SETTINGS.COIN_HOST_V2 + '/v2/cryptocurrency/ohlcv/historical'
     params = {
         'symbol': symbol,
@@ -249,8 +624,26 @@ def query_OHLCV_historical(symbol: str):
         'accept': 'application/json',
         'X-CMC_PRO_API_KEY': SETTINGS.COIN_API_KEY_V2
     }
-    return send_http_request('get', url, headers, params, api_key=None)
-
+    return url, headers, params
+
+
+price_batcher = PriceBatcher(
+    fetch=_fetch_batched_prices,
+    window_ms=SETTINGS.PRICE_BATCH_WINDOW_MS,
+    max_batch_ids=SETTINGS.PRICE_BATCH_MAX_IDS,
+)
+
+# Non-blocking implementations of the sync tools, keyed by tool name, used by AsyncAgent
+# to execute sync tool calls without stalling the event loop.
+async_query_tools = {
+    query_price_by_ids.__name__: async_query_price_by_ids,
+    query_historical_data_by_ids.__name__: async_query_historical_data_by_ids,
+    query_markets_by_currency.__name__: async_query_markets_by_currency,
+    query_token_price_by_id.__name__: async_query_token_price_by_id,
+    query_top_gainers_losers.__name__: async_query_top_gainers_losers,
+    query_listings_historical.__name__: async_query_listings_historical,
+    query_OHLCV_historical.__name__: async_query_OHLCV_historical,
+}
 
 
 if __name__ == '__main__':
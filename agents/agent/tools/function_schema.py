@@ -0,0 +1,104 @@
+import enum
+import inspect
+import logging
+import typing
+from typing import Any, Callable, List
+
+import docstring_parser
+
+logger = logging.getLogger(__name__)
+
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    tuple: "array",
+    set: "array",
+    dict: "object",
+}
+
+
+def function_to_schema(function: Callable[..., Any]) -> dict:
+    """
+    Build the OpenAI tool schema of a function from its signature, type hints and docstring.
+
+    Args:
+        function (Callable): A documented tool function.
+
+    Returns:
+        dict: The schema, as passed in the `tools` parameter of a chat completion.
+    """
+    docstring = docstring_parser.parse(inspect.getdoc(function) or "")
+    descriptions = {param.arg_name: param.description for param in docstring.params}
+    try:
+        hints = typing.get_type_hints(function)
+    except (NameError, TypeError) as e:
+        logger.warning(f"Cannot resolve the type hints of {function.__name__}: {e}")
+        hints = {}
+
+    properties, required = {}, []
+    for name, parameter in inspect.signature(function).parameters.items():
+        if parameter.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+            continue
+        schema = _type_schema(hints.get(name, str))
+        if descriptions.get(name):
+            schema["description"] = descriptions[name]
+        if parameter.default is inspect.Parameter.empty:
+            required.append(name)
+        elif isinstance(parameter.default, (str, int, float, bool)):
+            schema["default"] = parameter.default
+        properties[name] = schema
+
+    description = "\n\n".join(
+        text for text in (docstring.short_description, docstring.long_description) if text
+    )
+    return {
+        "type": "function",
+        "function": {
+            "name": function.__name__,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": required,
+            },
+        },
+    }
+
+
+def functions_to_schemas(functions: List[Callable[..., Any]]) -> List[dict]:
+    """
+    Build the OpenAI tool schemas of functions.
+
+    Args:
+        functions (List[Callable]): Documented tool functions.
+
+    Returns:
+        List[dict]: The schemas, in the order of the functions.
+    """
+    return [function_to_schema(function) for function in functions]
+
+
+def _type_schema(hint: Any) -> dict:
+    origin, args = typing.get_origin(hint), typing.get_args(hint)
+
+    if origin is typing.Union:
+        # Optional[X] is X for the model, it may leave the parameter out
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) == 1:
+            return _type_schema(options[0])
+        return {"anyOf": [_type_schema(arg) for arg in options]}
+    if origin is typing.Literal:
+        return {"type": _JSON_TYPES.get(type(args[0]), "string"), "enum": list(args)}
+    if inspect.isclass(hint) and issubclass(hint, enum.Enum):
+        return {"type": "string", "enum": [str(member.value) for member in hint]}
+    if origin in (list, tuple, set):
+        schema = {"type": "array"}
+        if args and args[0] is not Ellipsis:
+            schema["items"] = _type_schema(args[0])
+        return schema
+    if origin is dict:
+        return {"type": "object"}
+    return {"type": _JSON_TYPES.get(hint, "string")}
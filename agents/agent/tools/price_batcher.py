@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Awaitable, Optional
+
+from agents.common.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _PriceRequest:
+    """One caller's share of a batch."""
+
+    def __init__(self, ids: list[str], vs_currencies: list[str], future: asyncio.Future):
+        self.ids = ids
+        self.vs_currencies = vs_currencies
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class PriceBatcher:
+    """
+    Micro-batching scheduler for CoinGecko `/simple/price` lookups.
+
+    Price requests arriving within `window_ms` of the first pending one, across every in-flight
+    conversation, are merged into a single fetch of the coin and currency pairs they asked for.
+    Each caller then receives only the ids and currencies it asked for.
+    """
+
+    def __init__(
+            self,
+            fetch: Callable[[list[tuple[str, str]]], Awaitable[dict]],
+            window_ms: float = 5,
+            max_batch_ids: int = 250,
+    ):
+        """
+        Initialize PriceBatcher
+
+        Args:
+            fetch (Callable): Coroutine function taking the sorted (id, vs_currency) pairs asked
+                for and returning a `/simple/price` response holding at least their prices.
+            window_ms (float): How long the first request of a batch waits for others to join.
+            max_batch_ids (int): Maximum number of distinct ids per upstream call; a batch is
+                flushed early once it would exceed this.
+        """
+        self.fetch = fetch
+        self.window_ms = window_ms
+        self.max_batch_ids = max_batch_ids
+        self._pending: list[_PriceRequest] = []
+        self._pending_ids: set[str] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get(self, ids: list[str], vs_currencies: list[str]) -> dict:
+        """
+        Get prices, sharing the upstream call with concurrent callers.
+
+        Args:
+            ids (list[str]): CoinGecko coin ids.
+            vs_currencies (list[str]): Target currencies.
+
+        Returns:
+            dict: `/simple/price` response restricted to the requested ids and currencies.
+        """
+        loop = asyncio.get_running_loop()
+        new_ids = set(ids) - self._pending_ids
+        if self._pending and len(self._pending_ids) + len(new_ids) > self.max_batch_ids:
+            self._flush()
+
+        request = _PriceRequest(ids, vs_currencies, loop.create_future())
+        self._pending.append(request)
+        self._pending_ids.update(ids)
+        metrics.incr("price_batcher.requests")
+
+        if len(self._pending_ids) >= self.max_batch_ids:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await request.future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_ids = self._pending, [], set()
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[_PriceRequest]) -> None:
+        pairs = sorted({(i, c) for request in batch for i in request.ids for c in request.vs_currencies})
+        ids = {i for i, _ in pairs}
+
+        now = time.monotonic()
+        metrics.incr("price_batcher.batches")
+        metrics.observe("price_batcher.batch_requests", len(batch))
+        metrics.observe("price_batcher.batch_ids", len(ids))
+        for request in batch:
+            metrics.observe("price_batcher.wait_seconds", now - request.enqueued_at)
+
+        try:
+            data = await self.fetch(pairs)
+        except Exception as e:
+            logger.error(f"Batched price request failed: {e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        for request in batch:
+            if not request.future.done():
+                request.future.set_result(self._split(data, request))
+
+    @staticmethod
+    def _split(data: dict, request: _PriceRequest) -> dict:
+        if not isinstance(data, dict) or "error" in data:
+            return data
+        result = {}
+        for coin_id in request.ids:
+            prices = data.get(coin_id)
+            if isinstance(prices, dict):
+                result[coin_id] = {c: prices[c] for c in request.vs_currencies if c in prices}
+        return result
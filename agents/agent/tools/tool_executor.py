@@ -1,9 +1,12 @@
+import asyncio
 import json
 import logging
-from typing import List, Any, Callable, AsyncIterator
+from typing import List, Any, Callable, AsyncIterator, Optional, Dict
 
 from swarms import extract_code_from_markdown
 
+from agents.agent.tools.tool_runner import tool_runner
+
 logger = logging.getLogger(__name__)
 
 
@@ -11,16 +14,31 @@ async def async_execute(
     functions: List[Callable[..., Any]],
     json_string: str,
     parse_md: bool = False,
+    max_concurrency: int = 1,
+    timeout: Optional[float] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+    ordered: bool = True,
+    tagged: bool = False,
     *args: Any,
     **kwargs: Any
 ) -> AsyncIterator:
     """
     Execute a list of functions with the given JSON string as input.
+
+    All calls are started at once, at most `max_concurrency` at a time, and their outputs are
+    merged into one stream. With `ordered` the output of each call is yielded after the output
+    of the calls before it, otherwise chunks are yielded as soon as any call produces them.
     Args:
-        functions (List[Callable[..., Any]]): A list of callables to execute.
+        functions (List[Callable[..., Any]]): A list of async generator functions to execute.
         json_string (str): The JSON string containing the arguments for each function.
+        parse_md (bool): Whether to extract the JSON from a markdown code block first.
+        max_concurrency (int): Maximum number of calls running at the same time; 1 runs them one after another.
+        timeout (float): Seconds each call may run for, None for no limit.
+        timeouts (Dict[str, float]): Per-function timeouts overriding `timeout`.
+        ordered (bool): Whether to keep the output of each call together, in call order.
+        tagged (bool): Whether to yield `(function_name, call_index, data)` tuples instead of the bare data.
     Returns:
-        dict: A dictionary containing the results from each function execution.
+        AsyncIterator: The data yielded by the functions.
     """
     if not functions or not json_string:
         return
@@ -32,50 +50,298 @@ async def async_execute(
         # Create function name to function mapping
         function_dict = {func.__name__: func for func in functions}
 
-        # Parse JSON data
-        data = json.loads(json_string)
-
-        # Handle both single function and function list formats
-        function_list = []
-        if "functions" in data:
-            function_list = data["functions"]
-        elif "function" in data:
-            function_list = [data["function"]]
-        else:
-            function_list = [
-                data
-            ]  # Assume entire object is single function
-
-        # Ensure function_list is a list and filter None values
-        if isinstance(function_list, dict):
-            function_list = [function_list]
-        function_list = [f for f in function_list if f]
-
-        for function_data in function_list:
-            function_name = function_data.get("name")
-            parameters = function_data.get("parameters", {})
-
-            if not function_name:
-                logger.warning("Function data missing name field")
+        function_list = parse_function_calls(json_string)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON format: {str(e)}")
+        return
+    except Exception as e:
+        logger.error(f"Error parsing and executing JSON: {str(e)}")
+        return
+
+    calls = []
+    for function_data in function_list:
+        function_name = function_data.get("name")
+        if not function_name:
+            logger.warning("Function data missing name field")
+            continue
+        if function_name in function_dict:
+            calls.append((function_name, function_data.get("parameters", {})))
+    if not calls:
+        return
+
+    timeouts = timeouts or {}
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [
+        asyncio.create_task(_stream_call(
+            index, function_name, function_dict[function_name], parameters,
+            queue, semaphore, timeouts.get(function_name, timeout),
+        ))
+        for index, (function_name, parameters) in enumerate(calls)
+    ]
+
+    buffers: Dict[int, list] = {index: [] for index in range(len(calls))}
+    finished = set()
+    current = 0
+    try:
+        while current < len(calls):
+            index, data = await queue.get()
+            if not ordered:
+                if data is not _CALL_DONE:
+                    yield (calls[index][0], index, data) if tagged else data
+                    continue
+                finished.add(index)
+                current = len(finished)
                 continue
 
-            if function_name not in function_dict:
+            if data is _CALL_DONE:
+                finished.add(index)
+            elif index == current:
+                yield (calls[index][0], index, data) if tagged else data
+                continue
+            else:
+                buffers[index].append(data)
                 continue
+            # The current call is done: flush the calls after it that already finished
+            while current in finished:
+                current += 1
+                for data in buffers.pop(current, []):
+                    yield (calls[current][0], current, data) if tagged else data
+    finally:
+        for task in tasks:
+            task.cancel()
 
-            try:
-                async for data in function_dict[function_name](**parameters):
-                    yield data
-            except Exception as e:
-                logger.error(
-                    f"Error executing {function_name}: {str(e)}"
-                )
-                yield f"{function_name} Error: {str(e)}"
 
-    except json.JSONDecodeError as e:
-        error = f"Invalid JSON format: {str(e)}"
-        logger.error(error)
-        # yield {"error": error}
+_CALL_DONE = object()
+
+
+async def _stream_call(
+    index: int,
+    function_name: str,
+    function: Callable[..., Any],
+    parameters: dict,
+    queue: asyncio.Queue,
+    semaphore: asyncio.Semaphore,
+    timeout: Optional[float],
+) -> None:
+    """Run one async generator tool call, forwarding its output to the queue as (index, data)."""
+    try:
+        async with semaphore:
+            async with asyncio.timeout(timeout):
+                async for data in function(**parameters):
+                    queue.put_nowait((index, data))
+    except TimeoutError:
+        logger.error(f"Timeout executing {function_name} after {timeout}s")
+        queue.put_nowait((index, f"{function_name} Error: timed out after {timeout}s"))
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        error = f"Error parsing and executing JSON: {str(e)}"
-        logger.error(error)
-        # yield {"error": error}
+        logger.error(
+            f"Error executing {function_name}: {str(e)}"
+        )
+        queue.put_nowait((index, f"{function_name} Error: {str(e)}"))
+    finally:
+        queue.put_nowait((index, _CALL_DONE))
+
+
+async def async_execute_sync(
+    functions: List[Callable[..., Any]],
+    json_string: str,
+    parse_md: bool = False,
+    coroutines: Optional[Dict[str, Callable[..., Any]]] = None,
+    max_concurrency: int = 1,
+    timeout: Optional[float] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Optional[str]:
+    """
+    Execute synchronous tools without blocking the event loop.
+    Args:
+        functions (List[Callable[..., Any]]): A list of sync callables to execute.
+        json_string (str): The JSON string containing the arguments for each function.
+        parse_md (bool): Whether to extract the JSON from a markdown code block first.
+        coroutines (Dict[str, Callable]): Async implementations keyed by function name. Functions
+            without one are run on the tool runner's thread pools.
+        max_concurrency (int): Maximum number of calls running at the same time; 1 runs them one after another.
+        timeout (float): Seconds each call may run for, None for no limit.
+        timeouts (Dict[str, float]): Per-function timeouts overriding `timeout`.
+    Returns:
+        str: The JSON-encoded results, or None if no function was called.
+    """
+    if not functions or not json_string:
+        return None
+
+    if parse_md:
+        json_string = extract_code_from_markdown(json_string)
+
+    coroutines = coroutines or {}
+    timeouts = timeouts or {}
+    function_dict = {func.__name__: func for func in functions}
+    try:
+        function_list = parse_function_calls(json_string)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON format: {str(e)}")
+        return None
+
+    calls = [
+        (function_data["name"], function_data.get("parameters", {}))
+        for function_data in function_list
+        if function_data.get("name") in function_dict
+    ]
+    if not calls:
+        return None
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(function_name: str, parameters: dict) -> str:
+        function_timeout = timeouts.get(function_name, timeout)
+        try:
+            async with semaphore:
+                if function_name in coroutines:
+                    call = coroutines[function_name](**parameters)
+                else:
+                    call = tool_runner.run(function_name, function_dict[function_name], **parameters)
+                return str(await asyncio.wait_for(call, function_timeout))
+        except TimeoutError:
+            logger.error(f"Timeout executing {function_name} after {function_timeout}s")
+            return f"Error: timed out after {function_timeout}s"
+        except Exception as e:
+            logger.error(f"Error executing {function_name}: {str(e)}")
+            return f"Error: {str(e)}"
+
+    outputs = await asyncio.gather(*(run(function_name, parameters) for function_name, parameters in calls))
+
+    # Repeated calls of the same function, e.g. one per coin, are numbered
+    results = {}
+    for (function_name, _), output in zip(calls, outputs):
+        key, count = function_name, 1
+        while key in results:
+            count += 1
+            key = f"{function_name} #{count}"
+        results[key] = output
+
+    if len(results) == 1:
+        return json.dumps({"result": next(iter(results.values()))})
+    return json.dumps({
+        "results": results,
+        "summary": "\n".join(f"{name}: {result}" for name, result in results.items()),
+    })
+
+
+class Prefetch:
+    """
+    Consumes an async iterator in a background task from the moment it is created, buffering
+    the items until they are read. Used to start tools before their output is needed.
+    """
+
+    def __init__(self, stream: AsyncIterator):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._pump(stream))
+
+    async def _pump(self, stream: AsyncIterator) -> None:
+        try:
+            async for item in stream:
+                self._queue.put_nowait((item, None))
+        except Exception as e:
+            self._queue.put_nowait((_CALL_DONE, e))
+            return
+        self._queue.put_nowait((_CALL_DONE, None))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item, error = await self._queue.get()
+        if error is not None:
+            raise error
+        if item is _CALL_DONE:
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self) -> None:
+        """Stop consuming the iterator, discarding what was not read."""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def parse_function_calls(json_string: str) -> List[dict]:
+    """
+    Parse a tool call JSON string into a list of function call dicts.
+    Args:
+        json_string (str): The JSON string containing one or more function calls.
+    Returns:
+        List[dict]: Function calls, each with a "name" and optional "parameters".
+    Raises:
+        json.JSONDecodeError: If the string is not valid JSON.
+    """
+    data = json.loads(json_string)
+
+    # Handle both single function and function list formats
+    function_list = []
+    if "functions" in data:
+        function_list = data["functions"]
+    elif "function" in data:
+        function_list = [data["function"]]
+    else:
+        function_list = [
+            data
+        ]  # Assume entire object is single function
+
+    # Ensure function_list is a list and filter None values
+    if isinstance(function_list, dict):
+        function_list = [function_list]
+    return [f for f in function_list if f]
+
+
+class ToolCallAccumulator:
+    """
+    Assembles native tool calls from the `tool_calls` deltas of a streamed chat completion.
+
+    Each delta carries the index of its call and a piece of it: the id and name come first,
+    the JSON arguments are streamed in fragments. Several calls may be streamed in one response.
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, dict] = {}
+
+    def feed(self, deltas: Optional[List[dict]]) -> None:
+        """
+        Add the tool call deltas of a stream chunk
+        Args:
+            deltas (List[dict]): `tool_calls` of the chunk's delta, e.g. from `additional_kwargs`.
+        """
+        for delta in deltas or []:
+            call = self._calls.setdefault(delta.get("index", len(self._calls)), {"id": None, "name": "", "arguments": []})
+            if delta.get("id"):
+                call["id"] = delta["id"]
+            function = delta.get("function") or {}
+            if function.get("name"):
+                call["name"] += function["name"]
+            if function.get("arguments"):
+                call["arguments"].append(function["arguments"])
+
+    def __bool__(self) -> bool:
+        return bool(self._calls)
+
+    def function_calls(self) -> List[dict]:
+        """
+        The calls streamed so far, in the format of `parse_function_calls`
+        Returns:
+            List[dict]: Function calls, each with a "name" and "parameters".
+        """
+        function_calls = []
+        for _, call in sorted(self._calls.items()):
+            arguments = "".join(call["arguments"])
+            try:
+                parameters = json.loads(arguments) if arguments else {}
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid arguments for tool call {call['name']}: {str(e)}")
+                continue
+            function_calls.append({"name": call["name"], "parameters": parameters})
+        return function_calls
+
+    def to_json(self) -> str:
+        """The calls as a JSON string accepted by `async_execute` and `async_execute_sync`."""
+        return json.dumps({"functions": self.function_calls()}, ensure_ascii=False)
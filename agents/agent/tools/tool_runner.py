@@ -0,0 +1,151 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ToolRunner:
+    """
+    Runs blocking tool work (synchronous HTTP calls, JSON encoding, tokenization) on bounded
+    thread pools so it never stalls the event loop.
+
+    Tools share a default pool unless a dedicated pool size is configured for them, which keeps
+    one slow upstream from using up every worker. Cancelling the awaiting task drops work that
+    has not started yet; work already running in a thread finishes and its result is discarded.
+    """
+
+    def __init__(self, name: str = "tool_runner", max_workers: int = 16, pools: Optional[dict[str, int]] = None):
+        """
+        Initialize ToolRunner
+
+        Args:
+            name (str): Runner name, used as metric prefix and thread name prefix.
+            max_workers (int): Size of the default pool.
+            pools (dict[str, int]): Dedicated pool sizes keyed by tool name.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.pools = pools or {}
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+        self._queued: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def run(self, tool_name: str, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking function on the tool's pool and wait for its result.
+
+        Args:
+            tool_name (str): Tool name, selects the pool and labels the metrics.
+            function (Callable): Blocking function to run.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            Any: The function's result.
+        """
+        pool = tool_name if tool_name in self.pools else "default"
+        executor = self._executor(pool)
+        context = contextvars.copy_context()
+        enqueued_at = time.monotonic()
+        self._update_queue(pool, 1)
+
+        def call():
+            self._update_queue(pool, -1)
+            started_at = time.monotonic()
+            metrics.observe(f"{self.name}.queue_seconds.{pool}", started_at - enqueued_at)
+            try:
+                return context.run(function, *args, **kwargs)
+            finally:
+                metrics.observe(f"{self.name}.run_seconds.{tool_name}", time.monotonic() - started_at)
+
+        future = executor.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancel():
+                self._update_queue(pool, -1)
+            metrics.incr(f"{self.name}.cancelled.{tool_name}")
+            raise
+        except Exception:
+            metrics.incr(f"{self.name}.errors.{tool_name}")
+            raise
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Shut the pools down, dropping queued work.
+
+        Args:
+            wait (bool): Whether to wait for running work to finish.
+        """
+        with self._lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _executor(self, pool: str) -> ThreadPoolExecutor:
+        executor = self._executors.get(pool)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(pool)
+                if executor is None:
+                    executor = self._executors[pool] = ThreadPoolExecutor(
+                        max_workers=self.pools.get(pool, self.max_workers),
+                        thread_name_prefix=f"{self.name}-{pool}",
+                    )
+        return executor
+
+    def _update_queue(self, pool: str, delta: int) -> None:
+        with self._lock:
+            depth = self._queued[pool] = self._queued.get(pool, 0) + delta
+        metrics.set_gauge(f"{self.name}.queue_depth.{pool}", depth)
+
+
+tool_runner = ToolRunner(max_workers=SETTINGS.TOOL_THREAD_POOL_SIZE, pools=SETTINGS.TOOL_THREAD_POOLS)
+
+
+if __name__ == '__main__':
+    # Event loop lag check: blocking tools must not delay a concurrent ticker
+    def blocking_tool(seconds: float) -> float:
+        time.sleep(seconds)
+        return seconds
+
+    async def measure_lag(run_tools: Callable[[], Any]) -> float:
+        lag = 0.0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal lag
+            while not done.is_set():
+                start = time.monotonic()
+                await asyncio.sleep(0.01)
+                lag = max(lag, time.monotonic() - start - 0.01)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0.02)
+        await run_tools()
+        done.set()
+        await task
+        return lag
+
+    async def main():
+        async def inline():
+            for _ in range(4):
+                blocking_tool(0.1)
+
+        async def offloaded():
+            await asyncio.gather(*(tool_runner.run("blocking_tool", blocking_tool, 0.1) for _ in range(4)))
+
+        print(f"max loop lag inline: {await measure_lag(inline) * 1000:.1f} ms")
+        print(f"max loop lag with ToolRunner: {await measure_lag(offloaded) * 1000:.1f} ms")
+        print(metrics.snapshot())
+        tool_runner.shutdown()
+
+    asyncio.run(main())
@@ -2,9 +2,11 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, AsyncIterator
 
+from starlette.requests import Request
 from starlette.responses import StreamingResponse
 
 from agents.common.response import RestResponse
+from agents.common.streaming import cancel_on_disconnect
 from agents.models.db import get_db
 from agents.protocol.schemas import AgentCreate, AgentUpdate, DialogueResponse, DialogueRequest, AgentStatus, PaginationParams
 from agents.services import agent_service
@@ -90,7 +92,7 @@ async def delete_agent(agent_id: int, session: AsyncSession = Depends(get_db)):
     return RestResponse(data="ok")
 
 @router.post("/agents/{agent_id}/dialogue", response_model=DialogueResponse)
-async def dialogue(agent_id: int, request: DialogueRequest,
+async def dialogue(agent_id: int, request: DialogueRequest, http_request: Request,
              session: AsyncSession = Depends(get_db)):
     """
     Handle a dialogue between a user and an agent.
@@ -100,5 +102,5 @@ async def dialogue(agent_id: int, request: DialogueRequest,
     - **message**: Message from the user
     """
     # Placeholder logic for generating a response
-    resp = agent_service.dialogue(agent_id, request, session)
+    resp = cancel_on_disconnect(http_request, agent_service.dialogue(agent_id, request, session))
     return StreamingResponse(content=resp, media_type="text/event-stream")
@@ -2,10 +2,13 @@ import logging
 import uuid
 
 from fastapi import Query, APIRouter
+from starlette.requests import Request
 from starlette.responses import StreamingResponse
 
 from agents.agent.core.ai_search_agent import ai_search_agent
-from agents.agent.core.coins_agent import CoinAgent
+from agents.agent.core.coins_agent import coin_agent_pool
+from agents.common.metrics import metrics
+from agents.common.streaming import cancel_on_disconnect
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +18,15 @@ router = APIRouter()
 async def health():
     return {"status": "ok"}
 
+@router.get("/api/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 @router.get("/api/chat/completion")
-async def completion(query: str = Query(default=""), conversationId: str = Query(default=str(uuid.uuid4()))):
+async def completion(request: Request, query: str = Query(default=""),
+                     conversationId: str = Query(default=str(uuid.uuid4()))):
     logger.info(f"query: {query}, conversationId: {conversationId}")
-    agent = CoinAgent()
-    resp = agent.arun(query, conversationId)
+    resp = cancel_on_disconnect(request, coin_agent_pool.arun(query, conversationId))
     return StreamingResponse(content=resp, media_type="text/event-stream")
 
 @router.get("/api/pulse/ai/search")
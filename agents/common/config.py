@@ -27,12 +27,72 @@ class Settings(BaseSettings):
     COIN_API_KEY: str = ""
     COIN_API_KEY_V2: str = ""
     API_KEY: str = ""
+    COIN_PRICE_CACHE_TTL: int = 5
+    COIN_MARKETS_CACHE_TTL: int = 30
+    COIN_CHART_CACHE_TTL: int = 300
+    COIN_CACHE_MAX_ENTRIES: int = 1024
+    COIN_CACHE_REDIS_ENABLED: bool = True
+    COIN_MAPS_SNAPSHOT_PATH: str = "data/coin_maps.json.gz"
+    COIN_MAPS_REFRESH_INTERVAL: int = 6 * 60 * 60
+    COIN_MAPS_RETRY_INTERVAL: int = 60
+    COIN_MAPS_STARTUP_TIMEOUT: float = 30
+    COIN_RATE_LIMIT_PER_MINUTE: float = 500
+    COIN_V2_RATE_LIMIT_PER_MINUTE: float = 30
+    COIN_RATE_LIMIT_BURST: int = 20
+    COIN_RATE_LIMIT_MAX_RETRIES: int = 3
+    COIN_RATE_LIMIT_BACKOFF: float = 1
+    COIN_RATE_LIMIT_JITTER: float = 0.2
+    COIN_CHART_MAX_POINTS: int = 500
+    COIN_CHART_SUMMARY_ENABLED: bool = True
+    PRICE_BATCH_ENABLED: bool = True
+    PRICE_BATCH_WINDOW_MS: float = 5
+    PRICE_BATCH_MAX_IDS: int = 250
     AI_SEARCH_HOST: str = ""
     AI_SEARCH_KEY: str = ""
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_POOL_LIMIT_PER_HOST: int = 20
+    HTTP_TIMEOUT: float = 30
+    HTTP_CONNECT_TIMEOUT: float = 5
+    HTTP_KEEPALIVE_TIMEOUT: float = 30
+    TOOL_MAX_CONCURRENCY: int = 4
+    TOOL_TIMEOUT: float = 120
+    TOOL_OUTPUT_ORDERED: bool = True
+    TOOL_THREAD_POOL_SIZE: int = 16
+    TOOL_THREAD_POOLS: dict[str, int] = {}
+    TOOL_SPECULATIVE_DISPATCH: bool = True
+    TOOL_CALL_STOP_GENERATION: bool = True
+    STREAM_DISCONNECT_POLL_INTERVAL: float = 0.5
+    CHAT_AGENT_TEMPLATE_CACHE_SIZE: int = 128
+    COIN_AGENT_POOL_SIZE: int = 8
+    COIN_AGENT_POOL_WAIT_TIMEOUT: float = 1
+    COIN_AGENT_MODE: str = "ReAct"
+    CONTEXT_TOKEN_BUDGET: int = 16000
+    CONTEXT_KEEP_RECENT: int = 4
+    CONTEXT_DIGEST_TOKENS: int = 256
+    CONTEXT_SUMMARY_ENABLED: bool = True
     REDIS_HOST:str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str = None
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5
+    MEMORY_WRITE_BEHIND_ENABLED: bool = True
+    MEMORY_FLUSH_INTERVAL: float = 0.05
+    MEMORY_FLUSH_BATCH_SIZE: int = 200
+    MEMORY_MAX_PENDING: int = 10000
+    MEMORY_PUT_TIMEOUT: float = 1
+    MEMORY_FLUSH_MAX_BACKOFF: float = 5
+    MEMORY_CODEC: str = "msgpack"
+    MEMORY_COMPRESSION: str = "zlib"
+    MEMORY_COMPRESS_THRESHOLD: int = 1024
+    LOCAL_MEMORY_MAX_CONVERSATIONS: int = 10000
+    LOCAL_MEMORY_TTL: float = 3600
+    LOCAL_MEMORY_MAX_BYTES: int = 0
+    MEMORY_L1_ENABLED: bool = True
+    MEMORY_L1_MAX_CONVERSATIONS: int = 10000
+    MEMORY_L1_TTL: float = 300
+    MEMORY_L1_VERIFY: bool = False
+    MEMORY_INVALIDATION_CHANNEL: str = "pulse.memory.invalidate"
     LOG_LEVEL: str = "INFO"
     MYSQL_USER: str = "root"
     MYSQL_PASSWORD: str = "password"
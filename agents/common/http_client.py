@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from agents.common.config import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+class HttpStatusError(Exception):
+    """Raised when an upstream responds with a non-200 status."""
+
+    def __init__(self, status: int, text: str = "", headers: dict = None):
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+        super().__init__(f"{status} {text}")
+
+
+class HttpClient:
+    """
+    Pooled keep-alive HTTP sessions, one per upstream host.
+
+    Async callers get an `aiohttp.ClientSession` bound to the running event loop; sync callers
+    get a `requests.Session` with a sized connection pool. Both reuse TLS connections across
+    requests instead of opening a new one per call. Async sessions are closed when their event
+    loop shuts down, e.g. at the end of `asyncio.run`, or when replaced by a session of another loop.
+    """
+
+    def __init__(
+            self,
+            limit: int = 100,
+            limit_per_host: int = 20,
+            timeout: float = 30,
+            connect_timeout: float = 5,
+            keepalive_timeout: float = 30,
+    ):
+        """
+        Initialize HttpClient
+
+        Args:
+            limit (int): Maximum number of open connections across all hosts.
+            limit_per_host (int): Maximum number of open connections per host.
+            timeout (float): Total request timeout in seconds.
+            connect_timeout (float): Connection timeout in seconds.
+            keepalive_timeout (float): Seconds an idle connection is kept open for reuse.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive_timeout = keepalive_timeout
+        # Session of each host, with the event loop it is bound to
+        self._sessions: dict[str, tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+        self._sync_sessions: dict[str, requests.Session] = {}
+        self._sync_lock = threading.Lock()
+        # Tasks closing the async sessions on loop shutdown, the loop itself only keeps weak references
+        self._closers: set[asyncio.Task] = set()
+
+    def session(self, url: str) -> aiohttp.ClientSession:
+        """
+        Get the pooled async session for the host of the given URL.
+
+        Args:
+            url (str): Request URL.
+
+        Returns:
+            aiohttp.ClientSession: A keep-alive session bound to the running event loop.
+        """
+        host = self._host(url)
+        loop = asyncio.get_running_loop()
+        session_loop, session = self._sessions.get(host, (None, None))
+        if session is None or session.closed or session_loop is not loop:
+            if session is not None:
+                self._discard(session_loop, session)
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+            )
+            self._sessions[host] = loop, session
+            closer = loop.create_task(self._close_on_shutdown(session))
+            self._closers.add(closer)
+            closer.add_done_callback(self._closers.discard)
+        return session
+
+    def sync_session(self, url: str) -> requests.Session:
+        """
+        Get the pooled sync session for the host of the given URL.
+
+        Args:
+            url (str): Request URL.
+
+        Returns:
+            requests.Session: A keep-alive session with a sized connection pool.
+        """
+        host = self._host(url)
+        session = self._sync_sessions.get(host)
+        if session is None:
+            # Tools run in threads: only one of them creates the session of a host
+            with self._sync_lock:
+                session = self._sync_sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.limit_per_host)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._sync_sessions[host] = session
+        return session
+
+    @property
+    def sync_timeout(self) -> tuple[float, float]:
+        """(connect, read) timeout tuple for `requests`."""
+        return self.connect_timeout, self.timeout
+
+    async def close(self) -> None:
+        """Close every pooled session."""
+        sessions, self._sessions = self._sessions, {}
+        loop = asyncio.get_running_loop()
+        for session_loop, session in sessions.values():
+            if session_loop is loop:
+                if not session.closed:
+                    await session.close()
+            else:
+                self._discard(session_loop, session)
+        with self._sync_lock:
+            sync_sessions, self._sync_sessions = self._sync_sessions, {}
+        for session in sync_sessions.values():
+            session.close()
+
+    @staticmethod
+    async def _close_on_shutdown(session: aiohttp.ClientSession) -> None:
+        # Cancelled with every other task when the loop shuts down, while it can still close the session
+        try:
+            await asyncio.Event().wait()
+        finally:
+            if not session.closed:
+                await session.close()
+
+    @staticmethod
+    def _discard(loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession) -> None:
+        """Close a session of another event loop, so its connector and sockets are not leaked."""
+        if session.closed:
+            return
+        if loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        # Nothing will await its close anymore: close the transports right away
+        try:
+            session.connector.close()
+        except RuntimeError as e:
+            logger.debug(f"Closed a session of a closed event loop: {e}")
+
+    @staticmethod
+    def _host(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+
+http_client = HttpClient(
+    limit=SETTINGS.HTTP_POOL_LIMIT,
+    limit_per_host=SETTINGS.HTTP_POOL_LIMIT_PER_HOST,
+    timeout=SETTINGS.HTTP_TIMEOUT,
+    connect_timeout=SETTINGS.HTTP_CONNECT_TIMEOUT,
+    keepalive_timeout=SETTINGS.HTTP_KEEPALIVE_TIMEOUT,
+)
+
+
+if __name__ == '__main__':
+    import time
+
+    from aiohttp import web
+
+    from agents.agent.tools import coin_tools
+    from agents.common.rate_limiter import RateLimiter
+    from agents.common.response_cache import ResponseCache
+
+    # Throughput of concurrent conversations against a local stub of CoinGecko answering after a delay
+    CONVERSATIONS = 100
+    TURNS = 3
+    LATENCY = 0.05
+
+    async def markets(request: web.Request) -> web.Response:
+        await asyncio.sleep(LATENCY)
+        return web.json_response([{"id": request.query.get("ids", "bitcoin"), "symbol": "btc", "name": "Bitcoin",
+                                   "current_price": 97000.0, "market_cap": 1.9e12, "image": "https://example.com"}])
+
+    def serve(ready: threading.Event, port: list):
+        async def main():
+            app = web.Application()
+            app.router.add_get("/api/v3/coins/markets", markets)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port.append(site._server.sockets[0].getsockname()[1])
+            ready.set()
+            await asyncio.Event().wait()
+
+        asyncio.run(main())
+
+    ready, port = threading.Event(), []
+    threading.Thread(target=serve, args=(ready, port), daemon=True).start()
+    ready.wait()
+
+    # Every call reaches the stub: no caching, no rate limit
+    coin_tools.host = f"http://127.0.0.1:{port[0]}"
+    coin_tools.response_cache = ResponseCache(name="http_client.bench", ttls={}, use_redis=False)
+    coin_tools.rate_limiter = RateLimiter(name="http_client.bench", rate_per_minute=1e9, burst=10 ** 6,
+                                          use_redis=False)
+    coins = {f"coin-{i}": {"id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}"} for i in range(CONVERSATIONS)}
+    coin_tools._swap_id_maps(coins, {}, coin_tools.CoinIndex(coins), coin_tools.PlatformIndex({}), time.time())
+
+    async def pooled(i: int):
+        for _ in range(TURNS):
+            await coin_tools.async_query_markets_by_currency("usd", f"coin-{i}")
+
+    async def per_call(i: int):
+        # What the sync tool did before: a new connection per call, on the event loop
+        for _ in range(TURNS):
+            url, headers, params = coin_tools._markets_request("usd", f"coin-{i}", "24h")
+            response = requests.request("get", url, headers=headers, params=params)
+            coin_tools._postprocess(response.json(), coin_tools.markets_projection)
+
+    async def main():
+        for name, conversation in (("per-call requests.request", per_call), ("pooled HttpClient", pooled)):
+            start = time.monotonic()
+            await asyncio.gather(*(conversation(i) for i in range(CONVERSATIONS)))
+            elapsed = time.monotonic() - start
+            print(f"{name:<28}{CONVERSATIONS * TURNS / elapsed:>8.1f} calls/s  "
+                  f"{CONVERSATIONS / elapsed:>6.1f} conversations/s")
+        await coin_tools.http_client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    In-process counters, gauges and timing summaries.
+
+    Components record into the shared `metrics` instance; `snapshot` is served by the
+    `/api/metrics` endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._summaries: dict[str, dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name (str): Counter name.
+            value (float): Amount to add, defaults to 1.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Set a gauge to its current value.
+
+        Args:
+            name (str): Gauge name.
+            value (float): Current value.
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record one observation (e.g. a latency in seconds) into a count/sum/max summary.
+
+        Args:
+            name (str): Summary name.
+            value (float): Observed value.
+        """
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = {"count": 0, "sum": 0.0, "max": value}
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def snapshot(self) -> dict:
+        """
+        Get a copy of every recorded metric.
+
+        Returns:
+            dict: Counters, gauges and summaries keyed by name.
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": {name: dict(summary) for name, summary in self._summaries.items()},
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,263 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from enum import IntEnum
+from typing import Optional
+
+import redis
+
+from agents.common.metrics import metrics
+from agents.common.redis_utils import redis_utils, async_redis_utils
+
+logger = logging.getLogger(__name__)
+
+# Atomically refill and take one token. Returns the seconds to wait before retrying, 0 if granted.
+TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+local blocked_until = tonumber(state[3]) or 0
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+# Block a bucket for ARGV[1] seconds, e.g. after a 429 with Retry-After.
+BLOCK_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local blocked_until = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+if blocked_until > current then
+    redis.call('HSET', KEYS[1], 'blocked_until', tostring(blocked_until))
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[1])) + 60)
+return 1
+"""
+
+
+class Priority(IntEnum):
+    """Request priority; lower values are served first."""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class _Waiters:
+    """Per-bucket priority queue of waiting requests and the task draining it."""
+
+    def __init__(self):
+        self.queue: list[tuple[int, int, float, asyncio.Future]] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for upstream APIs, shared across workers through Redis.
+
+    Each bucket (typically one per upstream host and API key) refills at `rate_per_minute`
+    up to `burst` tokens. Within a process, waiting requests are granted in priority order so
+    interactive tool calls go before background refreshes. A bucket can be blocked for a
+    while, e.g. when the upstream answers 429 with `Retry-After`. If Redis is unreachable the
+    limiter falls back to an in-process bucket.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            rate_per_minute: float,
+            burst: int,
+            limits: Optional[dict[str, tuple[float, int]]] = None,
+            use_redis: bool = True,
+    ):
+        """
+        Initialize RateLimiter
+
+        Args:
+            name (str): Limiter name, used as Redis key prefix and metric prefix.
+            rate_per_minute (float): Default refill rate per bucket, above 0.
+            burst (int): Default bucket capacity.
+            limits (dict[str, tuple[float, int]]): (rate_per_minute, burst) overrides keyed by
+                bucket prefix, e.g. an upstream host.
+            use_redis (bool): Whether to share buckets across workers through Redis.
+        """
+        for prefix, (limit_rate, limit_burst) in {"": (rate_per_minute, burst), **(limits or {})}.items():
+            if limit_rate <= 0 or limit_burst < 1:
+                # A bucket that never refills would make its callers wait forever
+                raise ValueError(f"Rate limit of {name} {prefix or 'default'} must be positive, "
+                                 f"got {limit_rate}/min with a burst of {limit_burst}")
+        self.name = name
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.limits = limits or {}
+        self.use_redis = use_redis
+        self._take_script = redis_utils.client.register_script(TAKE_SCRIPT)
+        self._block_script = redis_utils.client.register_script(BLOCK_SCRIPT)
+        self._async_take_script = async_redis_utils.client.register_script(TAKE_SCRIPT)
+        self._async_block_script = async_redis_utils.client.register_script(BLOCK_SCRIPT)
+        self._waiters: dict[str, _Waiters] = {}
+        self._sequence = itertools.count()
+        self._local: dict[str, list[float]] = {}
+        self._local_lock = threading.Lock()
+
+    async def acquire(self, bucket: str, priority: Priority = Priority.INTERACTIVE) -> None:
+        """
+        Wait until a request may be sent on the bucket.
+
+        Args:
+            bucket (str): Bucket name.
+            priority (Priority): Request priority.
+        """
+        waiters = self._waiters.get(bucket)
+        if waiters is None:
+            waiters = self._waiters[bucket] = _Waiters()
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(waiters.queue, (priority, next(self._sequence), time.monotonic(), future))
+        metrics.set_gauge(f"{self.name}.queue_depth.{bucket}", len(waiters.queue))
+        if waiters.task is None or waiters.task.done():
+            waiters.task = asyncio.create_task(self._drain(bucket, waiters))
+        await future
+
+    def acquire_sync(self, bucket: str) -> None:
+        """
+        Blocking counterpart of `acquire` for threads; not ordered against async waiters.
+
+        Args:
+            bucket (str): Bucket name.
+        """
+        start = time.monotonic()
+        while (wait := self._take(bucket)) > 0:
+            time.sleep(wait)
+        metrics.observe(f"{self.name}.wait_seconds", time.monotonic() - start)
+
+    def block(self, bucket: str, seconds: float) -> None:
+        """
+        Block the bucket for every worker, e.g. after a 429 response.
+
+        Args:
+            bucket (str): Bucket name.
+            seconds (float): How long to block for.
+        """
+        metrics.incr(f"{self.name}.blocked")
+        if self.use_redis:
+            try:
+                self._block_script(keys=[self._redis_key(bucket)], args=[seconds])
+                return
+            except redis.RedisError as e:
+                logger.warning(f"Rate limiter falling back to local bucket: {e}")
+        self._block_local(bucket, seconds)
+
+    async def ablock(self, bucket: str, seconds: float) -> None:
+        """
+        Async counterpart of `block`.
+
+        Args:
+            bucket (str): Bucket name.
+            seconds (float): How long to block for.
+        """
+        metrics.incr(f"{self.name}.blocked")
+        if self.use_redis:
+            try:
+                await self._async_block_script(keys=[self._redis_key(bucket)], args=[seconds])
+                return
+            except redis.RedisError as e:
+                logger.warning(f"Rate limiter falling back to local bucket: {e}")
+        self._block_local(bucket, seconds)
+
+    async def _drain(self, bucket: str, waiters: _Waiters) -> None:
+        while waiters.queue:
+            if waiters.queue[0][3].done():
+                # Cancelled while waiting
+                heapq.heappop(waiters.queue)
+                continue
+            try:
+                wait = await self._async_take(bucket)
+            except Exception as e:
+                # Fail open rather than stalling every waiter on the bucket
+                logger.error(f"Rate limiter error on {bucket}: {e}")
+                wait = 0
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            # Grant the token to whoever heads the queue now; a higher priority request may
+            # have arrived while the token was being taken
+            while waiters.queue:
+                _, _, enqueued_at, future = heapq.heappop(waiters.queue)
+                if not future.done():
+                    future.set_result(None)
+                    metrics.observe(f"{self.name}.wait_seconds", time.monotonic() - enqueued_at)
+                    break
+            metrics.set_gauge(f"{self.name}.queue_depth.{bucket}", len(waiters.queue))
+
+    def _take(self, bucket: str) -> float:
+        rate_per_minute, burst = self._limit(bucket)
+        rate = rate_per_minute / 60
+        if self.use_redis:
+            try:
+                return float(self._take_script(keys=[self._redis_key(bucket)], args=[rate, burst]))
+            except redis.RedisError as e:
+                logger.warning(f"Rate limiter falling back to local bucket: {e}")
+        return self._take_local(bucket, rate, burst)
+
+    async def _async_take(self, bucket: str) -> float:
+        rate_per_minute, burst = self._limit(bucket)
+        rate = rate_per_minute / 60
+        if self.use_redis:
+            try:
+                return float(await self._async_take_script(keys=[self._redis_key(bucket)], args=[rate, burst]))
+            except redis.RedisError as e:
+                logger.warning(f"Rate limiter falling back to local bucket: {e}")
+        return self._take_local(bucket, rate, burst)
+
+    def _take_local(self, bucket: str, rate: float, burst: int) -> float:
+        with self._local_lock:
+            now = time.time()
+            state = self._local_state(bucket, burst, now)
+            tokens, ts, blocked_until = state
+            if blocked_until > now:
+                return blocked_until - now
+            tokens = min(burst, tokens + (now - ts) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            state[0], state[1] = tokens, now
+            return wait
+
+    def _block_local(self, bucket: str, seconds: float) -> None:
+        with self._local_lock:
+            state = self._local_state(bucket)
+            state[2] = max(state[2], time.time() + seconds)
+
+    def _local_state(self, bucket: str, burst: int = None, now: float = None) -> list[float]:
+        state = self._local.get(bucket)
+        if state is None:
+            state = self._local[bucket] = [burst or self.burst, now or time.time(), 0.0]
+        return state
+
+    def _limit(self, bucket: str) -> tuple[float, int]:
+        for prefix, limit in self.limits.items():
+            if bucket.startswith(prefix):
+                return limit
+        return self.rate_per_minute, self.burst
+
+    def _redis_key(self, bucket: str) -> str:
+        return f"pulse.{self.name}.{bucket}"
@@ -1,13 +1,15 @@
 import json
-from typing import Any, Optional, List, Dict
+from typing import Any, AsyncIterator, Callable, Optional, List, Dict
 
 import redis
+import redis.asyncio
 
 from agents.common.config import SETTINGS
 
 
 class RedisUtils:
-    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, password: Optional[str] = None):
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 max_connections: Optional[int] = None):
         """
         Initialize the Redis connection.
 
@@ -15,13 +17,28 @@ class RedisUtils:
         :param port: Redis server port.
         :param db: Redis database index.
         :param password: Redis password (if required).
+        :param max_connections: Size of the connection pool (optional, unbounded by default).
         """
         self.client = redis.StrictRedis(
-            host=host,
-            port=port,
-            db=db,
-            password=password,
-            decode_responses=True
+            connection_pool=redis.ConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                password=password,
+                decode_responses=True,
+                max_connections=max_connections,
+            )
+        )
+        # Reads binary values as they are, its connections are only opened when used
+        self.binary_client = redis.StrictRedis(
+            connection_pool=redis.ConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                password=password,
+                decode_responses=False,
+                max_connections=max_connections,
+            )
         )
 
     def set_value(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
@@ -65,7 +82,8 @@ class RedisUtils:
             print(f"Error deleting key: {e}")
             return 0
 
-    def push_to_list(self, key: str, value: Any, max_length: Optional[int] = None, ttl: int=None) -> None:
+    def push_to_list(self, key: str, value: Any, max_length: Optional[int] = None, ttl: int=None,
+                     raw: bool = False) -> None:
         """
         Push a serialized value to a list in Redis.
 
@@ -73,9 +91,10 @@ class RedisUtils:
         :param value: Value to push (can be a structure).
         :param max_length: Maximum length of the list (optional).
         :param ttl: Time to live in seconds (default 5 days).
+        :param raw: Push the value as it is, already serialized to str or bytes.
         """
         try:
-            serialized_value = json.dumps(value)  # Serialize to JSON
+            serialized_value = value if raw else json.dumps(value)  # Serialize to JSON
             pipe = self.client.pipeline()
             pipe.rpush(key, serialized_value)
             if ttl:
@@ -105,6 +124,21 @@ class RedisUtils:
             print(f"Error decoding JSON: {e}")
             return []
 
+    def get_raw_list(self, key: str, start: int = 0, end: int = -1) -> List[bytes]:
+        """
+        Get a range of elements from a list in Redis as stored, e.g. binary values pushed raw.
+
+        :param key: Key name.
+        :param start: Start index (inclusive).
+        :param end: End index (inclusive).
+        :return: List of elements as bytes.
+        """
+        try:
+            return self.binary_client.lrange(key, start, end)
+        except redis.RedisError as e:
+            print(f"Error getting list: {e}")
+            return []
+
     def set_hash(self, key: str, mapping: Dict[str, Any]) -> bool:
         """
         Set multiple fields in a Redis hash.
@@ -159,9 +193,420 @@ class RedisUtils:
             print(f"Error getting set members: {e}")
             return None
 
+
+class AsyncRedisUtils:
+    """
+    Non-blocking counterpart of RedisUtils for async code, built on `redis.asyncio`.
+
+    Every method matches the RedisUtils method of the same name. All callers share one sized
+    connection pool; when every connection is busy, commands wait for a free one instead of
+    opening more.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 max_connections: int = 50, pool_timeout: Optional[float] = 5):
+        """
+        Initialize the Redis connection pool.
+
+        :param host: Redis server host.
+        :param port: Redis server port.
+        :param db: Redis database index.
+        :param password: Redis password (if required).
+        :param max_connections: Size of the connection pool.
+        :param pool_timeout: Seconds to wait for a free connection before failing (None to wait forever).
+        """
+        self.client = redis.asyncio.Redis(
+            connection_pool=redis.asyncio.BlockingConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                password=password,
+                decode_responses=True,
+                max_connections=max_connections,
+                timeout=pool_timeout,
+            )
+        )
+        # Reads binary values as they are, its connections are only opened when used
+        self.binary_client = redis.asyncio.Redis(
+            connection_pool=redis.asyncio.BlockingConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                password=password,
+                decode_responses=False,
+                max_connections=max_connections,
+                timeout=pool_timeout,
+            )
+        )
+
+    async def set_value(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        """
+        Set a value in Redis.
+
+        :param key: Key name.
+        :param value: Value to set.
+        :param ex: Expiration time in seconds (optional).
+        :return: True if successful, False otherwise.
+        """
+        try:
+            return await self.client.set(key, value, ex=ex)
+        except redis.RedisError as e:
+            print(f"Error setting value: {e}")
+            return False
+
+    async def get_value(self, key: str) -> Optional[Any]:
+        """
+        Get a value from Redis.
+
+        :param key: Key name.
+        :return: Value if the key exists, None otherwise.
+        """
+        try:
+            return await self.client.get(key)
+        except redis.RedisError as e:
+            print(f"Error getting value: {e}")
+            return None
+
+    async def set_values(self, values: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        """
+        Set several values in one pipeline, one round trip for all of them.
+
+        :param values: Values to set, keyed by key name.
+        :param ex: Expiration time in seconds (optional).
+        :return: True if successful, False otherwise.
+        """
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(key, value, ex=ex)
+                await pipe.execute()
+            return True
+        except redis.RedisError as e:
+            print(f"Error setting values: {e}")
+            return False
+
+    async def get_values(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Get several values in one round trip.
+
+        :param keys: Key names.
+        :return: Value of each key, None for the keys that do not exist.
+        """
+        try:
+            return await self.client.mget(keys)
+        except redis.RedisError as e:
+            print(f"Error getting values: {e}")
+            return [None] * len(keys)
+
+    async def delete_key(self, key: str) -> int:
+        """
+        Delete a key from Redis.
+
+        :param key: Key name.
+        :return: Number of keys removed.
+        """
+        try:
+            return await self.client.delete(key)
+        except redis.RedisError as e:
+            print(f"Error deleting key: {e}")
+            return 0
+
+    async def push_to_list(self, key: str, value: Any, max_length: Optional[int] = None, ttl: int = None) -> None:
+        """
+        Push a serialized value to a list in Redis.
+
+        :param key: Key name.
+        :param value: Value to push (can be a structure).
+        :param max_length: Maximum length of the list (optional).
+        :param ttl: Time to live in seconds (default 5 days).
+        """
+        try:
+            serialized_value = json.dumps(value)  # Serialize to JSON
+            async with self.client.pipeline() as pipe:
+                pipe.rpush(key, serialized_value)
+                if ttl:
+                    pipe.expire(key, ttl)
+                if max_length is not None:
+                    pipe.ltrim(key, -max_length, -1)
+                await pipe.execute()
+        except redis.RedisError as e:
+            print(f"Error pushing to list: {e}")
+
+    async def push_to_lists(self, values: Dict[str, List[Any]], max_length: Optional[int] = None,
+                            ttl: int = None, on_push: Optional[Callable[[Any, str, int], None]] = None,
+                            raw: bool = False) -> bool:
+        """
+        Push serialized values to several lists in one pipeline, one round trip for all of them.
+
+        :param values: Values to push, keyed by list key.
+        :param max_length: Maximum length of the lists (optional).
+        :param ttl: Time to live in seconds (optional).
+        :param on_push: Adds commands to the pipeline after each list's push, called with the pipeline,
+            the list key and the number of values pushed (optional).
+        :param raw: Push the values as they are, already serialized to str or bytes.
+        :return: True if successful, False otherwise.
+        """
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, items in values.items():
+                    pipe.rpush(key, *(items if raw else [json.dumps(item) for item in items]))
+                    if ttl:
+                        pipe.expire(key, ttl)
+                    if max_length is not None:
+                        pipe.ltrim(key, -max_length, -1)
+                    if on_push is not None:
+                        on_push(pipe, key, len(items))
+                await pipe.execute()
+            return True
+        except redis.RedisError as e:
+            print(f"Error pushing to lists: {e}")
+            return False
+
+    async def get_list(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
+        """
+        Get a range of deserialized elements from a list in Redis.
+
+        :param key: Key name.
+        :param start: Start index (inclusive).
+        :param end: End index (inclusive).
+        :return: List of deserialized elements.
+        """
+        try:
+            raw_list = await self.client.lrange(key, start, end)
+            return [json.loads(item) for item in raw_list]  # Deserialize JSON
+        except redis.RedisError as e:
+            print(f"Error getting list: {e}")
+            return []
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON: {e}")
+            return []
+
+    async def get_raw_list(self, key: str, start: int = 0, end: int = -1) -> List[bytes]:
+        """
+        Get a range of elements from a list in Redis as stored, e.g. binary values pushed raw.
+
+        :param key: Key name.
+        :param start: Start index (inclusive).
+        :param end: End index (inclusive).
+        :return: List of elements as bytes.
+        """
+        try:
+            return await self.binary_client.lrange(key, start, end)
+        except redis.RedisError as e:
+            print(f"Error getting list: {e}")
+            return []
+
+    async def set_hash(self, key: str, mapping: Dict[str, Any]) -> bool:
+        """
+        Set multiple fields in a Redis hash.
+
+        :param key: Key name.
+        :param mapping: Dictionary of field-value pairs.
+        :return: True if successful, False otherwise.
+        """
+        try:
+            await self.client.hset(key, mapping=mapping)
+            return True
+        except redis.RedisError as e:
+            print(f"Error setting hash: {e}")
+            return False
+
+    async def get_hash(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get all fields and values from a Redis hash.
+
+        :param key: Key name.
+        :return: Dictionary of field-value pairs, or None if the hash does not exist.
+        """
+        try:
+            return await self.client.hgetall(key)
+        except redis.RedisError as e:
+            print(f"Error getting hash: {e}")
+            return None
+
+    async def add_to_set(self, key: str, *values: Any) -> int:
+        """
+        Add one or more members to a set.
+
+        :param key: Key name.
+        :param values: Values to add.
+        :return: Number of elements added to the set.
+        """
+        try:
+            return await self.client.sadd(key, *values)
+        except redis.RedisError as e:
+            print(f"Error adding to set: {e}")
+            return 0
+
+    async def get_set_members(self, key: str) -> Optional[set]:
+        """
+        Get all members of a set.
+
+        :param key: Key name.
+        :return: Set of members, or None if the key does not exist.
+        """
+        try:
+            return await self.client.smembers(key)
+        except redis.RedisError as e:
+            print(f"Error getting set members: {e}")
+            return None
+
+    async def listen(self, channel: str, on_subscribe: Optional[Callable[[], None]] = None) -> AsyncIterator[str]:
+        """
+        Subscribe to a channel and yield its messages, holding one connection of the pool.
+
+        :param channel: Channel name.
+        :param on_subscribe: Called once subscribed, before any message (optional).
+        :return: Iterator over the messages, raises redis.RedisError when the connection is lost.
+        """
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel)
+            if on_subscribe is not None:
+                on_subscribe()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        """
+        Close the connections of the pools.
+        """
+        await self.client.aclose(close_connection_pool=True)
+        await self.binary_client.aclose(close_connection_pool=True)
+
+
 redis_utils = RedisUtils(
     host=SETTINGS.REDIS_HOST,
     port=SETTINGS.REDIS_PORT,
     db=SETTINGS.REDIS_DB,
-    password=SETTINGS.REDIS_PASSWORD
+    password=SETTINGS.REDIS_PASSWORD,
+    max_connections=SETTINGS.REDIS_MAX_CONNECTIONS,
 )
+
+async_redis_utils = AsyncRedisUtils(
+    host=SETTINGS.REDIS_HOST,
+    port=SETTINGS.REDIS_PORT,
+    db=SETTINGS.REDIS_DB,
+    password=SETTINGS.REDIS_PASSWORD,
+    max_connections=SETTINGS.REDIS_MAX_CONNECTIONS,
+    pool_timeout=SETTINGS.REDIS_POOL_TIMEOUT,
+)
+
+
+if __name__ == '__main__':
+    import asyncio
+    import threading
+    import time
+
+    # Event loop lag check against a slow local Redis: a minimal RESP server answering after a delay
+    LATENCY = 0.02
+    TURNS = 20
+
+    def encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+        reply = reply.encode()
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+    def serve(ready: threading.Event, port: list):
+        lists: dict[str, list[str]] = {}
+
+        def execute(command: list[str]):
+            name, args = command[0].upper(), command[1:]
+            if name == "RPUSH":
+                lists.setdefault(args[0], []).extend(args[1:])
+                return len(lists[args[0]])
+            if name == "LRANGE":
+                items = lists.get(args[0], [])
+                end = int(args[2])
+                return items[int(args[1]):None if end == -1 else end + 1]
+            if name == "LTRIM":
+                lists[args[0]] = lists.get(args[0], [])[int(args[1]):]
+                return "OK"
+            if name == "EXPIRE":
+                return 1
+            return "OK"
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            queued = None
+            while line := await reader.readline():
+                command = []
+                for _ in range(int(line[1:])):
+                    size = int((await reader.readline())[1:])
+                    command.append((await reader.readexactly(size + 2))[:-2].decode())
+                await asyncio.sleep(LATENCY)
+                if command[0].upper() == "MULTI":
+                    queued, reply = [], b"+OK\r\n"
+                elif command[0].upper() == "EXEC":
+                    reply, queued = encode([execute(queued_command) for queued_command in queued]), None
+                elif queued is not None:
+                    queued.append(command)
+                    reply = b"+QUEUED\r\n"
+                else:
+                    result = execute(command)
+                    reply = b"+OK\r\n" if result == "OK" else encode(result)
+                writer.write(reply)
+                await writer.drain()
+
+        async def main():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port.append(server.sockets[0].getsockname()[1])
+            ready.set()
+            await server.serve_forever()
+
+        asyncio.run(main())
+
+    ready, port = threading.Event(), []
+    threading.Thread(target=serve, args=(ready, port), daemon=True).start()
+    ready.wait()
+
+    sync_utils = RedisUtils(port=port[0])
+    async_utils = AsyncRedisUtils(port=port[0], max_connections=8)
+
+    async def measure_lag(turns) -> tuple[float, float]:
+        lag = 0.0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal lag
+            while not done.is_set():
+                start = time.monotonic()
+                await asyncio.sleep(0.005)
+                lag = max(lag, time.monotonic() - start - 0.005)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        start = time.monotonic()
+        await turns()
+        elapsed = time.monotonic() - start
+        done.set()
+        await task
+        return lag, elapsed
+
+    async def sync_turns():
+        # A conversation turn: load the memory, then save the new exchange
+        for i in range(TURNS):
+            sync_utils.get_list(f"pulse.memory.{i}")
+            sync_utils.push_to_list(f"pulse.memory.{i}", {"input": "q", "output": "a"}, 10, 3600)
+
+    async def async_turns():
+        async def turn(i: int):
+            await async_utils.get_list(f"pulse.memory.{i}")
+            await async_utils.push_to_list(f"pulse.memory.{i}", {"input": "q", "output": "a"}, 10, 3600)
+
+        await asyncio.gather(*(turn(i) for i in range(TURNS)))
+
+    async def main():
+        for label, turns in (("sync client", sync_turns), ("async client", async_turns)):
+            lag, elapsed = await measure_lag(turns)
+            print(f"{TURNS} turns with {label}: max loop lag {lag * 1000:.0f} ms, total {elapsed * 1000:.0f} ms")
+        await async_utils.close()
+
+    asyncio.run(main())
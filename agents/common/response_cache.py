@@ -0,0 +1,338 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Callable, Awaitable
+from urllib.parse import urlsplit
+
+from agents.common.metrics import metrics
+from agents.common.redis_utils import redis_utils, async_redis_utils
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _Call:
+    """An in-flight sync fetch that concurrent callers wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    TTL response cache for upstream HTTP calls.
+
+    Lookups go through an in-process LRU, then Redis. Concurrent misses for the same key are
+    coalesced so that only one caller fetches from the upstream (single-flight). Only
+    successful responses are cached; a fetch that raises is never stored.
+
+    Values are kept serialized and every caller, coalesced ones included, gets its own decoded
+    copy: a caller projecting or truncating a response in place never changes it for the others.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            ttls: dict[str, int],
+            max_entries: int = 1024,
+            use_redis: bool = True,
+    ):
+        """
+        Initialize ResponseCache
+
+        Args:
+            name (str): Cache name, used as Redis key prefix and metric prefix.
+            ttls (dict[str, int]): TTL in seconds per URL path fragment. The first fragment found
+                in a URL's path wins; URLs matching no fragment are not cached.
+            max_entries (int): Maximum number of entries kept in the in-process LRU.
+            use_redis (bool): Whether to share entries across workers through Redis.
+        """
+        self.name = name
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+        # Expiry and JSON of each entry
+        self._local: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self._async_calls: dict[str, asyncio.Task] = {}
+
+    def ttl_for(self, url: str) -> int:
+        """
+        Get the TTL configured for a URL.
+
+        Args:
+            url (str): Request URL.
+
+        Returns:
+            int: TTL in seconds, 0 if the URL is not cacheable.
+        """
+        path = urlsplit(url).path
+        for fragment, ttl in self.ttls.items():
+            if fragment in path:
+                return ttl
+        return 0
+
+    def key(self, method: str, url: str, params: Optional[dict]) -> str:
+        """
+        Build a cache key from the method, URL and params, independent of param order.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            params (dict): Query parameters; None values are ignored.
+
+        Returns:
+            str: The cache key.
+        """
+        normalized = sorted(
+            (k, str(v).strip()) for k, v in (params or {}).items() if v is not None
+        )
+        query = "&".join(f"{k}={v}" for k, v in normalized)
+        return f"{self.name}:{method.upper()}:{url}?{query}"
+
+    def get(self, key: str) -> Any:
+        """
+        Look a key up in the local LRU, then Redis.
+
+        Returns:
+            Any: A copy of the cached value, or `_MISSING`.
+        """
+        data = self._get_local(key)
+        if data is not _MISSING:
+            return json.loads(data)
+        if not self.use_redis:
+            return _MISSING
+        raw = redis_utils.get_value(key)
+        if raw is None:
+            return _MISSING
+        return self._promote(key, raw)
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        """
+        Store a value locally and in Redis.
+
+        Args:
+            key (str): Cache key.
+            value (Any): JSON-serializable value.
+            ttl (int): TTL in seconds.
+        """
+        self._set_local(key, json.dumps(value), ttl)
+        if self.use_redis:
+            redis_utils.set_value(key, self._dumps(value, ttl), ex=ttl)
+
+    def get_or_fetch(self, key: str, ttl: int, fetch: Callable[[], Any]) -> Any:
+        """
+        Get a cached value, or fetch it once for all concurrent callers in this process.
+
+        Args:
+            key (str): Cache key.
+            ttl (int): TTL in seconds for a freshly fetched value.
+            fetch (Callable): Blocking upstream fetch.
+
+        Returns:
+            Any: The cached or fetched value, a copy for every caller.
+        """
+        value = self.get(key)
+        if value is not _MISSING:
+            metrics.incr(f"{self.name}.hit")
+            return value
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr(f"{self.name}.coalesced")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return json.loads(call.value)
+
+        metrics.incr(f"{self.name}.miss")
+        try:
+            value = fetch()
+            # The fetched value stays the leader's own, followers decode the stored copy
+            call.value = json.dumps(value)
+            self._set_local(key, call.value, ttl)
+            if self.use_redis:
+                redis_utils.set_value(key, self._dumps(value, ttl), ex=ttl)
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def aget_or_fetch(self, key: str, ttl: int, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of `get_or_fetch`; concurrent callers await one fetch.
+
+        The fetch runs in a task owned by the cache, so a cancelled caller, e.g. on a client
+        disconnect or a tool timeout, never cancels it for the others.
+
+        Args:
+            key (str): Cache key.
+            ttl (int): TTL in seconds for a freshly fetched value.
+            fetch (Callable): Coroutine function performing the upstream fetch.
+
+        Returns:
+            Any: The cached or fetched value, a copy for every caller.
+        """
+        data = self._get_local(key)
+        if data is not _MISSING:
+            metrics.incr(f"{self.name}.hit")
+            return json.loads(data)
+        if self.use_redis:
+            raw = await async_redis_utils.get_value(key)
+            value = self._promote(key, raw) if raw is not None else _MISSING
+            if value is not _MISSING:
+                metrics.incr(f"{self.name}.hit")
+                return value
+
+        task = self._async_calls.get(key)
+        if task is not None:
+            metrics.incr(f"{self.name}.coalesced")
+        else:
+            metrics.incr(f"{self.name}.miss")
+            task = self._async_calls[key] = asyncio.create_task(self._afetch(key, ttl, fetch))
+            task.add_done_callback(lambda done: self._fetched(key, done))
+        return json.loads(await asyncio.shield(task))
+
+    async def aget_many(self, keys: list[str]) -> dict[str, Any]:
+        """
+        Look several keys up at once, in the local LRU, then Redis in one round trip.
+
+        Args:
+            keys (list[str]): Cache keys.
+
+        Returns:
+            dict[str, Any]: A copy of the value of every key found.
+        """
+        found, missing = {}, []
+        for key in keys:
+            data = self._get_local(key)
+            if data is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = json.loads(data)
+        if missing and self.use_redis:
+            for key, raw in zip(missing, await async_redis_utils.get_values(missing)):
+                value = self._promote(key, raw) if raw is not None else _MISSING
+                if value is not _MISSING:
+                    found[key] = value
+        metrics.incr(f"{self.name}.hit", len(found))
+        metrics.incr(f"{self.name}.miss", len(keys) - len(found))
+        return found
+
+    async def aset_many(self, values: dict[str, Any], ttl: int) -> None:
+        """
+        Store several values locally and in Redis, in one round trip.
+
+        Args:
+            values (dict[str, Any]): JSON-serializable values, keyed by cache key.
+            ttl (int): TTL in seconds.
+        """
+        for key, value in values.items():
+            self._set_local(key, json.dumps(value), ttl)
+        if self.use_redis and values:
+            await async_redis_utils.set_values({key: self._dumps(value, ttl) for key, value in values.items()},
+                                               ex=ttl)
+
+    async def _afetch(self, key: str, ttl: int, fetch: Callable[[], Awaitable[Any]]) -> str:
+        value = await fetch()
+        data = json.dumps(value)
+        self._set_local(key, data, ttl)
+        if self.use_redis:
+            await async_redis_utils.set_value(key, self._dumps(value, ttl), ex=ttl)
+        return data
+
+    def _fetched(self, key: str, task: asyncio.Task) -> None:
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        # Mark retrieved so a failure nobody awaited anymore is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def _get_local(self, key: str) -> Any:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, data = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+            return data
+
+    def _set_local(self, key: str, data: str, ttl: float) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, data)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _promote(self, key: str, raw: str) -> Any:
+        """Copy a Redis hit into the local LRU for the rest of its remaining TTL."""
+        try:
+            entry = json.loads(raw)
+            expires_at, value = entry["expires_at"], entry["value"]
+        except (json.JSONDecodeError, TypeError, KeyError):
+            return _MISSING
+        metrics.incr(f"{self.name}.redis_hit")
+        remaining = expires_at - time.time()
+        if remaining > 0:
+            self._set_local(key, json.dumps(value), remaining)
+        return value
+
+    @staticmethod
+    def _dumps(value: Any, ttl: int) -> str:
+        return json.dumps({"expires_at": time.time() + ttl, "value": value})
+
+
+if __name__ == '__main__':
+    # Regression check: a cancelled caller must not cancel the fetch for the callers waiting on it
+    async def main():
+        cache = ResponseCache("check_cache", {}, use_redis=False)
+        fetches = 0
+
+        async def fetch():
+            nonlocal fetches
+            fetches += 1
+            await asyncio.sleep(0.05)
+            return {"price": 1}
+
+        leader = asyncio.create_task(cache.aget_or_fetch("key", 60, fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(cache.aget_or_fetch("key", 60, fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await asyncio.gather(*followers) == [{"price": 1}] * 2
+        assert leader.cancelled()
+        assert fetches == 1
+        assert await cache.aget_or_fetch("key", 60, fetch) == {"price": 1} and fetches == 1
+        print(f"Followers got the value after the leader was cancelled, {fetches} fetch")
+
+        # Callers changing what they got, e.g. truncating it, must not change it for the others
+        first, second = await asyncio.gather(cache.aget_or_fetch("other", 60, fetch),
+                                             cache.aget_or_fetch("other", 60, fetch))
+        first["price"] = 2
+        assert second == {"price": 1} and await cache.aget_or_fetch("other", 60, fetch) == {"price": 1}
+        value = cache.get_or_fetch("sync", 60, lambda: {"price": 1})
+        value["price"] = 2
+        assert cache.get_or_fetch("sync", 60, lambda: {"price": 3}) == {"price": 1}
+        print("Cached values are copied for every caller")
+
+    asyncio.run(main())
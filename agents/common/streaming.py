@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+import anyio
+from starlette.requests import Request
+
+from agents.common.config import SETTINGS
+from agents.common.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+async def cancel_on_disconnect(
+        request: Request,
+        stream: AsyncIterator[str],
+        poll_interval: float = SETTINGS.STREAM_DISCONNECT_POLL_INTERVAL,
+        cleanup_timeout: float = 5,
+) -> AsyncIterator[str]:
+    """
+    Relay a streaming response, cancelling the stream as soon as the client disconnects.
+
+    The stream is advanced in its own task while the connection is polled, so a disconnect is
+    noticed even while the agent is waiting on the LLM or a tool. The cancellation is raised
+    inside the stream at the point it is waiting, which closes upstream LLM and HTTP streams
+    and runs its `finally` blocks, e.g. to save the partial answer to memory.
+
+    Args:
+        request (Request): The streaming request.
+        stream (AsyncIterator[str]): The response stream, e.g. `agent.arun(...)`.
+        poll_interval (float): Seconds between disconnect checks.
+        cleanup_timeout (float): Seconds to wait for the stream to unwind once cancelled.
+
+    Returns:
+        AsyncIterator[str]: The items of the stream.
+    """
+    disconnected = asyncio.create_task(_wait_for_disconnect(request, poll_interval))
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(stream.__anext__())
+            await asyncio.wait({pending, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not pending.done():
+                logger.info(f"Client disconnected from {request.url.path}, cancelling the stream")
+                metrics.incr("stream.disconnected")
+                return
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield item
+    finally:
+        disconnected.cancel()
+        # The server may be cancelling this response too; let the stream unwind regardless
+        with anyio.move_on_after(cleanup_timeout, shield=True):
+            if pending is not None and not pending.done():
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            else:
+                await stream.aclose()
+
+
+async def _wait_for_disconnect(request: Request, poll_interval: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
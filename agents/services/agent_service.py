@@ -5,7 +5,7 @@ from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from agents.agent.core.chat_agent import ChatAgent
+from agents.agent.core.chat_agent import chat_agent_templates
 from agents.exceptions import CustomAgentException
 from agents.models.db import get_db
 from agents.models.models import App, Tool
@@ -19,7 +19,7 @@ async def dialogue(agent_id: int, request: DialogueRequest, session: AsyncSessio
         -> AsyncIterator[str]:
     result = await session.execute(select(App).where(App.id == agent_id))
     agent = result.scalar_one_or_none()
-    agent = ChatAgent(agent)
+    agent = chat_agent_templates.get(agent)
     async for response in agent.arun(request.query, request.conversation_id):
         yield response
 
@@ -150,6 +150,7 @@ async def update_agent(
             # If tools list is empty, delete all existing tools
             for tool in existing_tools:
                 await session.delete(tool)
+    chat_agent_templates.invalidate(agent_id)
     return await get_agent(agent_id, session)
 
 async def delete_agent(agent_id: int, session: AsyncSession = Depends(get_db)):
@@ -157,4 +158,5 @@ async def delete_agent(agent_id: int, session: AsyncSession = Depends(get_db)):
         .values(is_deleted=True)\
         .execution_options(synchronize_session="fetch")
     await session.execute(stmt)
-    await session.commit()
\ No newline at end of file
+    await session.commit()
+    chat_agent_templates.invalidate(agent_id)
\ No newline at end of file
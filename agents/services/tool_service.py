@@ -2,6 +2,7 @@ from fastapi import Depends
 from sqlalchemy import update, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from agents.agent.core.chat_agent import chat_agent_templates
 from agents.exceptions import CustomAgentException, ErrorCode
 from agents.models.db import get_db
 from agents.models.models import Tool
@@ -15,6 +16,7 @@ async def create_tool(app_id: int, name: str, type: ToolType, content: str, sess
     await check_oepnapi_validity(type, name, content)
     session.add(new_tool)
     await session.commit()
+    chat_agent_templates.invalidate(app_id)
     return ToolModel(
         id=new_tool.id,
         app_id=new_tool.app_id,
@@ -40,14 +42,18 @@ async def update_tool(tool_id: int, name: str, type: ToolType = None, content: s
             .execution_options(synchronize_session="fetch")
         await session.execute(stmt)
         await session.commit()
-    return get_tool(tool_id, session)
+    tool = await get_tool(tool_id, session)
+    chat_agent_templates.invalidate(tool.app_id)
+    return tool
 
 async def delete_tool(tool_id: int, session: AsyncSession = Depends(get_db)):
+    tool = await get_tool(tool_id, session)
     stmt = update(Tool).where(Tool.id == tool_id)\
         .values(is_deleted=True)\
         .execution_options(synchronize_session="fetch")
     await session.execute(stmt)
     await session.commit()
+    chat_agent_templates.invalidate(tool.app_id)
 
 async def get_tool(tool_id: int, session: AsyncSession = Depends(get_db)):
     result = await session.execute(select(Tool).where(Tool.id == tool_id))
@@ -0,0 +1,158 @@
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+
+from agents.utils.projection import compact_number
+
+logger = logging.getLogger(__name__)
+
+MARKET_CHART_SERIES = ("prices", "market_caps", "total_volumes")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Select the points to keep with Largest-Triangle-Three-Buckets downsampling
+
+    Args:
+        x (np.ndarray): Monotonic x values (e.g. timestamps)
+        y (np.ndarray): y values
+        threshold (int): Number of points to keep, including the first and last one
+
+    Returns:
+        np.ndarray: Sorted indices of the selected points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket i spans [edges[i], edges[i + 1]); the first and last points are always kept
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    bounds = np.append(edges, n)
+    # Prefix sums give every bucket average in O(1)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[bounds[2:]] - cum_x[bounds[1:-1]]) / (bounds[2:] - bounds[1:-1])
+    avg_y = (cum_y[bounds[2:]] - cum_y[bounds[1:-1]]) / (bounds[2:] - bounds[1:-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y[i] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def summarize(values: np.ndarray, with_returns: bool = False) -> dict:
+    """
+    Summary statistics of a series
+
+    Args:
+        values (np.ndarray): Series values in time order
+        with_returns (bool): Whether to add change and volatility of period-over-period returns
+
+    Returns:
+        dict: min, max, mean and last value, plus change_pct and volatility_pct if requested
+    """
+    if len(values) == 0:
+        return {}
+    summary = {
+        "min": compact_number(values.min()),
+        "max": compact_number(values.max()),
+        "mean": compact_number(values.mean()),
+        "last": compact_number(values[-1]),
+    }
+    if with_returns and len(values) > 1 and values[0]:
+        returns = np.diff(values) / np.where(values[:-1] == 0, np.nan, values[:-1])
+        summary["change_pct"] = compact_number((values[-1] / values[0] - 1) * 100)
+        summary["volatility_pct"] = compact_number(np.nanstd(returns) * 100)
+    return summary
+
+
+def downsample_market_chart(data: dict, max_points: int, with_summary: bool = True) -> dict:
+    """
+    Reduce a CoinGecko market_chart response to at most `max_points` timestamps per series.
+
+    Points are selected by LTTB on the price series and the same timestamps are kept for
+    market caps and volumes, so the series stay aligned. Summary statistics are computed on the
+    full-resolution data and placed first so token truncation never drops them.
+
+    Args:
+        data (dict): market_chart response with `[timestamp, value]` series
+        max_points (int): Maximum number of points kept per series
+        with_summary (bool): Whether to add a `summary` entry
+
+    Returns:
+        dict: Downsampled response, or the input unchanged if it is not a market_chart payload
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("prices"), list) or not data["prices"]:
+        return data
+
+    try:
+        series = {
+            key: np.asarray(data[key], dtype=np.float64).reshape(-1, 2)
+            for key in MARKET_CHART_SERIES if isinstance(data.get(key), list) and data[key]
+        }
+    except ValueError as e:
+        logger.warning(f"Unexpected market_chart shape, skipping downsampling: {e}")
+        return data
+
+    prices = series["prices"]
+    indices = lttb_indices(prices[:, 0], prices[:, 1], max_points)
+
+    result = {}
+    if with_summary:
+        result["summary"] = {
+            key: summarize(values[:, 1], with_returns=key == "prices")
+            for key, values in series.items()
+        }
+        result["summary"]["points"] = {"original": len(prices), "kept": len(indices)}
+    for key in data:
+        values = series.get(key)
+        if values is not None and len(values) == len(prices):
+            result[key] = values[indices].tolist()
+        elif values is not None:
+            result[key] = values[lttb_indices(values[:, 0], values[:, 1], max_points)].tolist()
+        else:
+            result[key] = data[key]
+    for key in series:
+        for row in result[key]:
+            row[0], row[1] = int(row[0]), compact_number(row[1])
+    return result
+
+
+def points_for_budget(data: dict, max_tokens: int, count_tokens, reserve: int = 300,
+                      sample_size: int = 20) -> Optional[int]:
+    """
+    Estimate how many timestamps of a market_chart response fit in a token budget
+
+    Args:
+        data (dict): market_chart response
+        max_tokens (int): Token budget for the whole response
+        count_tokens (Callable[[str], int]): Token counter
+        reserve (int): Tokens kept aside for the summary and JSON structure
+        sample_size (int): Number of points sampled from each series to estimate cost per point
+
+    Returns:
+        Optional[int]: Number of points per series, or None if the data is not a market_chart payload
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("prices"), list):
+        return None
+    per_timestamp = 0.0
+    for key in MARKET_CHART_SERIES:
+        values = data.get(key)
+        if isinstance(values, list) and values:
+            sample = values[:sample_size]
+            per_timestamp += count_tokens(json.dumps(sample)) / len(sample)
+    if not per_timestamp:
+        return None
+    return max(3, int((max_tokens - reserve) / per_timestamp))
+
@@ -0,0 +1,69 @@
+from typing import Optional
+
+FENCE = "```"
+
+
+class FencedBlockDetector:
+    """
+    Detects fenced markdown blocks (e.g. ```json ... ```) in a streamed text, chunk by chunk.
+
+    Each chunk is scanned once, with a tail of the previous chunk as long as a fence, so fences
+    split across chunks are found and a whole stream costs O(total chars).
+    """
+
+    def __init__(self, language: str = "json"):
+        """
+        Initialize FencedBlockDetector
+
+        Args:
+            language (str): Language tag of the opening fence
+        """
+        self.opening = FENCE + language
+        self.blocks = 0
+        self._pending = ""
+        self._block: Optional[list[str]] = None
+        self._close_tail = ""
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add a chunk of the stream
+
+        Args:
+            chunk (str): Next chunk
+
+        Returns:
+            Optional[str]: The first block completed by this chunk, fences included, or None
+        """
+        completed = None
+        text = self._pending + chunk
+        self._pending = ""
+        while text:
+            if self._block is None:
+                start = text.find(self.opening)
+                if start < 0:
+                    self._pending = text[-(len(self.opening) - 1):]
+                    break
+                self._block = [self.opening]
+                self._close_tail = ""
+                text = text[start + len(self.opening):]
+                continue
+
+            search = self._close_tail + text
+            close = search.find(FENCE)
+            if close < 0:
+                self._block.append(text)
+                self._close_tail = search[-(len(FENCE) - 1):]
+                break
+            end = close - len(self._close_tail) + len(FENCE)
+            self._block.append(text[:end])
+            block, self._block = "".join(self._block), None
+            self.blocks += 1
+            if completed is None:
+                completed = block
+            text = text[end:]
+        return completed
+
+    @property
+    def in_block(self) -> bool:
+        """Whether the stream is inside an unclosed block"""
+        return self._block is not None
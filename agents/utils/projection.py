@@ -0,0 +1,108 @@
+import math
+from fnmatch import fnmatchcase
+from typing import Iterable, Iterator, Any
+
+
+def compact_number(value: Any, digits: int = 6) -> Any:
+    """
+    Round floats to significant digits and drop a trailing `.0`, leaving other values untouched
+
+    Args:
+        value (Any): Value to compact
+        digits (int): Number of significant digits kept
+
+    Returns:
+        Any: The compacted value, None for NaN/inf
+    """
+    if isinstance(value, bool) or not isinstance(value, float):
+        return value
+    if not math.isfinite(value):
+        return None
+    value = float(f"{value:.{digits}g}")
+    return int(value) if value.is_integer() else value
+
+
+class Projection:
+    """
+    Declarative projection of API records onto the fields the agent needs.
+
+    Fields are selected by glob patterns (e.g. `price_change_percentage_*`), null fields are
+    dropped and floats are compacted. Records are transformed one at a time, so a list
+    response is streamed through without building intermediate copies of dropped fields.
+    """
+
+    def __init__(self, include: Iterable[str] = ("*",), exclude: Iterable[str] = (), digits: int = 6):
+        """
+        Initialize Projection
+
+        Args:
+            include (Iterable[str]): Glob patterns of the fields to keep, in output order
+            exclude (Iterable[str]): Glob patterns of fields to drop even if included
+            digits (int): Significant digits kept for floats
+        """
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.digits = digits
+        self._rank: dict[str, Any] = {}
+
+    def __call__(self, data: Any) -> Any:
+        """
+        Project a response: a list of records, or a dict whose list values are lists of records
+
+        Args:
+            data (Any): Decoded JSON response
+
+        Returns:
+            Any: The projected response; other shapes are returned unchanged
+        """
+        if isinstance(data, list):
+            return list(self.stream(data))
+        if isinstance(data, dict):
+            return {
+                key: list(self.stream(value)) if isinstance(value, list) else value
+                for key, value in data.items()
+            }
+        return data
+
+    def stream(self, records: Iterable[Any]) -> Iterator[Any]:
+        """
+        Project records lazily
+
+        Args:
+            records (Iterable[Any]): Records to project; non-dict items pass through
+
+        Yields:
+            Any: Projected records
+        """
+        for record in records:
+            yield self.project(record) if isinstance(record, dict) else record
+
+    def project(self, record: dict) -> dict:
+        """
+        Project one record
+
+        Args:
+            record (dict): Record to project
+
+        Returns:
+            dict: Record with only the selected, non-null fields
+        """
+        kept = []
+        for key, value in record.items():
+            if value is None:
+                continue
+            rank = self._field_rank(key)
+            if rank is not None:
+                kept.append((rank, key, compact_number(value, self.digits)))
+        kept.sort(key=lambda item: item[0])
+        return {key: value for _, key, value in kept}
+
+    def _field_rank(self, key: str):
+        """Position of the first include pattern matching the key, None if dropped; memoized per key."""
+        if key in self._rank:
+            return self._rank[key]
+        rank = None
+        if not any(fnmatchcase(key, pattern) for pattern in self.exclude):
+            rank = next((i for i, pattern in enumerate(self.include) if fnmatchcase(key, pattern)), None)
+        self._rank[key] = rank
+        return rank
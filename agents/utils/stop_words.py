@@ -0,0 +1,137 @@
+from typing import Iterable
+
+
+class StopWordMatcher:
+    """
+    Detects stop words in a streamed text, chunk by chunk.
+
+    Only the new chunk plus a tail of the previous text as long as the longest stop word is
+    searched, so a whole stream costs O(total chars) and stop words split across chunks are
+    still found.
+    """
+
+    def __init__(self, stop_words: Iterable[str]):
+        """
+        Initialize StopWordMatcher
+
+        Args:
+            stop_words (Iterable[str]): Stop words to look for
+        """
+        self.stop_words = [word for word in stop_words if word]
+        self.window = max((len(word) for word in self.stop_words), default=1) - 1
+        self.matched = False
+        self._tail = ""
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add a chunk of the stream
+
+        Args:
+            chunk (str): Next chunk
+
+        Returns:
+            bool: Whether a stop word has been seen so far
+        """
+        if self.matched or not chunk:
+            return self.matched
+        text = self._tail + chunk
+        self.matched = any(word in text for word in self.stop_words)
+        self._tail = text[-self.window:] if self.window else ""
+        return self.matched
+
+    def reset(self) -> None:
+        """Start a new stream"""
+        self.matched = False
+        self._tail = ""
+
+
+class StopWordFilter:
+    """
+    Removes stop words from a streamed text, chunk by chunk.
+
+    Text that could be the start of a stop word is held back until the next chunk shows whether
+    it is one, so stop words split across chunks are removed too. Call `flush` at the end of the
+    stream to get the text still held back.
+    """
+
+    def __init__(self, stop_words: Iterable[str]):
+        """
+        Initialize StopWordFilter
+
+        Args:
+            stop_words (Iterable[str]): Stop words to remove
+        """
+        self.stop_words = [word for word in stop_words if word]
+        self.prefixes = {word[:i] for word in self.stop_words for i in range(1, len(word))}
+        self.window = max((len(word) for word in self.stop_words), default=1) - 1
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of the stream
+
+        Args:
+            chunk (str): Next chunk
+
+        Returns:
+            str: Text that is safe to emit, with stop words removed
+        """
+        text = self._pending + chunk
+        for word in self.stop_words:
+            if word in text:
+                text = text.replace(word, "")
+        for size in range(min(self.window, len(text)), 0, -1):
+            if text[-size:] in self.prefixes:
+                self._pending = text[-size:]
+                return text[:-size]
+        self._pending = ""
+        return text
+
+    def flush(self) -> str:
+        """
+        End the stream
+
+        Returns:
+            str: Text held back, which turned out not to be a stop word
+        """
+        text, self._pending = self._pending, ""
+        return text
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    stop_words = ["Final Answer:", "Tool Clarify: "]
+    rng = random.Random(7)
+    answer = "Thought: the user asks about BTC. " * 20 + "Final Answer: " + "Bitcoin is trading at 67,000 USD. " * 2000
+    chunks = []
+    position = 0
+    while position < len(answer):
+        size = rng.randint(1, 8)
+        chunks.append(answer[position:position + size])
+        position += size
+
+    start = time.perf_counter()
+    response, stopped_at = "", None
+    for i, chunk in enumerate(chunks):
+        response += chunk
+        if stopped_at is None and any(word in response for word in stop_words):
+            stopped_at = i
+        # The stopping condition kept being evaluated on the whole response
+        any(word in response for word in stop_words)
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher, stop_filter, emitted, matched_at = StopWordMatcher(stop_words), StopWordFilter(stop_words), [], None
+    for i, chunk in enumerate(chunks):
+        if not matcher.matched and matcher.feed(chunk):
+            matched_at = i
+        emitted.append(stop_filter.feed(chunk))
+    emitted.append(stop_filter.flush())
+    streaming_time = time.perf_counter() - start
+
+    assert matched_at == stopped_at
+    assert "".join(emitted) == answer.replace("Final Answer:", "")
+    print(f"{len(chunks)} chunks ({len(answer)} chars): whole-buffer scan {naive_time * 1000:.1f} ms, "
+          f"streaming matcher + filter {streaming_time * 1000:.1f} ms")
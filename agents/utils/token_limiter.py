@@ -1,74 +1,134 @@
+import functools
+import hashlib
+import itertools
 import json
 import logging
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any
 
 import tiktoken
 
 logger = logging.getLogger(__name__)
 
+ELLIPSIS = "..."
+_DROPPED = object()
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder(gpt_encoder: str) -> tiktoken.Encoding:
+    """
+    Get a tiktoken encoder, loaded once per process
+
+    Args:
+        gpt_encoder (str): Name of the encoder
+
+    Returns:
+        tiktoken.Encoding: The shared encoder
+    """
+    return tiktoken.get_encoding(gpt_encoder)
+
 
 class TokenLimiter:
     """A utility class for limiting and counting tokens in text"""
 
-    def __init__(self, max_tokens=10000, gpt_encoder="cl100k_base"):
+    def __init__(self, max_tokens=10000, gpt_encoder="cl100k_base", cache_size=4096, cache_min_length=64,
+                 recursive=False, min_share=16):
         """
         Initialize TokenLimiter
 
         Args:
             max_tokens (int): Maximum allowed tokens, defaults to 10000
             gpt_encoder (str): Name of the encoder to use, defaults to "cl100k_base"
+            cache_size (int): Number of token counts kept in the content-hash LRU, 0 to disable
+            cache_min_length (int): Strings shorter than this are counted without the cache
+            recursive (bool): Whether limit_tokens truncates nested structures by default
+            min_share (int): In recursive mode, values costing at most this many tokens are kept whole
         """
         self.max_tokens = max_tokens
         self.gpt_encoder = gpt_encoder
+        self.recursive = recursive
+        self.min_share = min_share
+        self.cache_size = cache_size
+        self.cache_min_length = cache_min_length
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._cache_lock = threading.Lock()
 
-    def limit_tokens(self, data, max_tokens=None):
+    def limit_tokens(self, data, max_tokens=None, recursive=None):
         """
         Truncate a dictionary or list of dictionaries to fit within a maximum token limit
 
         Args:
             data (dict or list): Dictionary or list of dictionaries to be truncated
             max_tokens (int): Maximum allowed number of tokens
+            recursive (bool): Use limit_tokens_recursive, defaults to the limiter setting
 
         Returns:
             dict or list: Truncated data structure
         """
         if not max_tokens:
             max_tokens = self.max_tokens
+        if recursive is None:
+            recursive = self.recursive
 
-        json_str = json.dumps(data)
-        if self.count_tokens(json_str) <= max_tokens:
+        # json.dumps escapes to ASCII and every token covers at least one character, so short
+        # payloads never need encoding
+        if len(json.dumps(data)) <= max_tokens:
             return data
 
-        if isinstance(data, dict):
-            truncated_data = {}
-            current_tokens = self.count_tokens("{}")  # Initial tokens
+        if recursive and isinstance(data, (dict, list)):
+            return self.limit_tokens_recursive(data, max_tokens)
 
-            for key, value in data.items():
-                value_str = json.dumps(value)
-                tokens_to_add = self.count_tokens(f'"{key}":{value_str},')
+        if isinstance(data, dict):
+            items = list(data.items())
+            costs = self.count_tokens_batch([f'"{key}":{json.dumps(value)},' for key, value in items])
+            keep = self._fit(costs, max_tokens - self.count_tokens("{}"))
+            if keep == len(items):
+                return data
+            return dict(items[:keep])
 
-                if current_tokens + tokens_to_add > max_tokens:
-                    break
+        elif isinstance(data, list):
+            costs = self.count_tokens_batch([json.dumps(item) + "," for item in data])
+            keep = self._fit(costs, max_tokens - self.count_tokens("[]"))
+            if keep == len(data):
+                return data
+            return data[:keep]
 
-                truncated_data[key] = value
-                current_tokens += tokens_to_add
-            return truncated_data
+        return data
 
-        elif isinstance(data, list):
-            truncated_data = []
-            current_tokens = self.count_tokens("[]")  # Initial tokens
+    def limit_tokens_recursive(self, data, max_tokens=None):
+        """
+        Truncate a nested structure to fit within a maximum token limit, spreading the budget
+        across nested keys and arrays in proportion to their size.
 
-            for item in data:
-                item_str = json.dumps(item)
-                tokens_to_add = self.count_tokens(item_str + ",")
+        Small values are kept whole, long arrays keep their head and tail around an elision
+        marker and long strings are cut. The result is checked against the budget once and
+        truncated again with a tighter budget if the estimate was short.
 
-                if current_tokens + tokens_to_add > max_tokens:
-                    break
+        Args:
+            data (dict or list): Structure to be truncated
+            max_tokens (int): Maximum allowed number of tokens
 
-                truncated_data.append(item)
-                current_tokens += tokens_to_add
-            return truncated_data
+        Returns:
+            dict or list: Truncated data structure
+        """
+        if not max_tokens:
+            max_tokens = self.max_tokens
 
-        return data
+        truncator = _Truncator(self, self.min_share)
+        truncator.measure(data)
+        budget = max_tokens
+        for _ in range(3):
+            result, _ = truncator.truncate(data, budget)
+            if result is _DROPPED:
+                return type(data)()
+            overshoot = self.count_tokens(json.dumps(result)) - max_tokens
+            if overshoot <= 0:
+                return result
+            budget -= overshoot + max(8, budget // 50)
+        logger.warning(f"Recursive truncation did not fit {max_tokens} tokens, truncating top level only")
+        return self.limit_tokens(data, max_tokens, recursive=False)
 
     def count_tokens(self, text: str) -> int:
         """
@@ -80,9 +140,283 @@ class TokenLimiter:
         Returns:
             int: Number of tokens in the text
         """
+        return self.count_tokens_batch([text])[0]
+
+    def count_tokens_batch(self, texts: list[str]) -> list[int]:
+        """
+        Calculate the number of tokens of several strings with one batched encoder call
+
+        Args:
+            texts (list[str]): Texts to count tokens for
+
+        Returns:
+            list[int]: Number of tokens of each text
+        """
+        counts: list = [None] * len(texts)
+        keys: dict[int, bytes] = {}
+        if self.cache_size:
+            with self._cache_lock:
+                for i, text in enumerate(texts):
+                    if len(text) < self.cache_min_length:
+                        continue
+                    key = keys[i] = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+                    cached = self._cache.get(key)
+                    if cached is not None:
+                        self._cache.move_to_end(key)
+                        counts[i] = cached
+
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if not missing:
+            return counts
+
         try:
-            encoding = tiktoken.get_encoding(self.gpt_encoder)
-            return len(encoding.encode(text))
+            encoder = get_encoder(self.gpt_encoder)
+            # The batch API hands every text to a thread pool, which costs more than encoding short texts
+            long = [i for i in missing if len(texts[i]) >= 1024]
+            for i, tokens in zip(long, encoder.encode_ordinary_batch([texts[i] for i in long])):
+                counts[i] = len(tokens)
+            for i in missing:
+                if counts[i] is None:
+                    counts[i] = len(encoder.encode_ordinary(texts[i]))
         except Exception as e:
             logger.error(f"Error counting tokens: {e}")
-            return len(text) // 4  # Rough estimate, assuming 4 chars per token
\ No newline at end of file
+            for i in missing:
+                counts[i] = len(texts[i]) // 4  # Rough estimate, assuming 4 chars per token
+            return counts
+
+        if keys:
+            with self._cache_lock:
+                for i in missing:
+                    if i in keys:
+                        self._cache[keys[i]] = counts[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return counts
+
+    @staticmethod
+    def _fit(costs: list[int], budget: int) -> int:
+        """
+        Number of leading items whose total cost fits the budget, by binary search over prefix sums
+
+        Args:
+            costs (list[int]): Token cost of each item
+            budget (int): Tokens available for the items
+
+        Returns:
+            int: How many leading items fit
+        """
+        return bisect_right(list(itertools.accumulate(costs)), budget)
+
+
+def _key_text(key) -> str:
+    # json.dumps converts non-string keys the same way
+    return json.dumps(key if isinstance(key, str) else json.dumps(key)) + ": "
+
+
+def _elision(count: int) -> str:
+    return f"{ELLIPSIS} {count} items omitted {ELLIPSIS}"
+
+
+class _Truncator:
+    """One recursive truncation pass over a payload, with token counts cached per subtree"""
+
+    def __init__(self, limiter: TokenLimiter, min_share: int):
+        self.limiter = limiter
+        self.min_share = min_share
+        self.costs: dict[int, int] = {}
+        self.counts: dict[str, int] = {}
+
+    def measure(self, data) -> int:
+        """
+        Estimate the token cost of every subtree, counting all distinct leaves and keys in one batch
+
+        Args:
+            data (Any): Structure to measure
+
+        Returns:
+            int: Estimated cost of the whole structure
+        """
+        texts = {}
+        order = []
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                order.append((node, None))
+                for key, value in node.items():
+                    texts.setdefault(_key_text(key), None)
+                    stack.append(value)
+            elif isinstance(node, list):
+                order.append((node, None))
+                stack.extend(node)
+            else:
+                text = json.dumps(node)
+                texts.setdefault(text, None)
+                order.append((node, text))
+        self.counts = dict(zip(texts, self.limiter.count_tokens_batch(list(texts))))
+
+        # Children come after their parent in pre-order, so reversed order visits them first
+        costs = self.costs
+        for node, text in reversed(order):
+            if text is not None:
+                costs[id(node)] = self.counts[text]
+            elif isinstance(node, dict):
+                costs[id(node)] = 2 + sum(self.counts[_key_text(key)] + costs[id(value)] + 1
+                                          for key, value in node.items())
+            else:
+                costs[id(node)] = 2 + sum(costs[id(item)] + 1 for item in node)
+        return costs[id(data)]
+
+    def truncate(self, node, budget: int) -> tuple[Any, int]:
+        """
+        Fit a measured subtree into a budget
+
+        Args:
+            node (Any): Subtree to truncate
+            budget (int): Tokens available for the subtree
+
+        Returns:
+            tuple[Any, int]: Truncated subtree, or _DROPPED if nothing fits, and its estimated cost
+        """
+        cost = self.costs[id(node)]
+        if cost <= budget:
+            return node, cost
+        if budget <= 0:
+            return _DROPPED, 0
+        if isinstance(node, dict):
+            return self._truncate_dict(node, budget)
+        if isinstance(node, list):
+            return self._truncate_list(node, budget)
+        if isinstance(node, str):
+            return self._truncate_str(node, budget, cost)
+        return _DROPPED, 0
+
+    def _truncate_dict(self, node: dict, budget: int) -> tuple[dict, int]:
+        remaining = budget - 2
+        kept = {}
+        large = []
+        # Small values are kept whole, in order, while they fit
+        for key, value in node.items():
+            overhead = self.counts[_key_text(key)] + 1
+            cost = self.costs[id(value)] + overhead
+            if cost <= self.min_share:
+                if cost <= remaining:
+                    kept[key] = value
+                    remaining -= cost
+            else:
+                large.append((key, value, overhead, cost))
+
+        # Large values share what is left in proportion to their size; what one of them does not
+        # use goes to the next
+        total = sum(entry[3] for entry in large)
+        for key, value, overhead, cost in large:
+            share = int(remaining * cost / total)
+            total -= cost
+            result, used = self.truncate(value, share - overhead)
+            if result is not _DROPPED:
+                kept[key] = result
+                remaining -= used + overhead
+        return {key: kept[key] for key in node if key in kept}, budget - remaining
+
+    def _truncate_list(self, node: list, budget: int) -> tuple[Any, int]:
+        n = len(node)
+        marker_cost = self.limiter.count_tokens(json.dumps(_elision(n))) + 1
+        available = budget - 2 - marker_cost
+        if available <= 0:
+            return _DROPPED, 0
+
+        item_costs = [self.costs[id(item)] + 1 for item in node]
+        head_sums = list(itertools.accumulate(item_costs))
+        head_count = bisect_right(head_sums, available // 2)
+        used = head_sums[head_count - 1] if head_count else 0
+        head = node[:head_count]
+        if not head_count:
+            # Items are larger than half the budget; keep a truncated first item instead
+            first, first_cost = self.truncate(node[0], available // 2 - 1)
+            if first is not _DROPPED:
+                head, head_count, used = [first], 1, first_cost + 1
+
+        rest = item_costs[head_count:]
+        tail_sums = list(itertools.accumulate(reversed(rest)))
+        tail_count = bisect_right(tail_sums, available - used)
+        used += tail_sums[tail_count - 1] if tail_count else 0
+        tail = node[n - tail_count:] if tail_count else []
+        if not tail_count and len(rest) > 1:
+            last, last_cost = self.truncate(node[-1], available - used - 1)
+            if last is not _DROPPED:
+                tail, tail_count, used = [last], 1, used + last_cost + 1
+
+        omitted = n - head_count - tail_count
+        if not omitted:
+            return head + tail, used + 2
+        return head + [_elision(omitted)] + tail, used + 2 + marker_cost
+
+    def _truncate_str(self, text: str, budget: int, cost: int) -> tuple[Any, int]:
+        if budget < self.min_share:
+            return _DROPPED, 0
+        keep = len(text) * (budget - 2) // cost
+        for _ in range(3):
+            result = text[:keep] + ELLIPSIS
+            used = self.limiter.count_tokens(json.dumps(result))
+            if used <= budget:
+                return result, used
+            keep = keep * budget // used
+        return _DROPPED, 0
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    def naive_limit_tokens(data, max_tokens):
+        encoding = tiktoken.get_encoding("cl100k_base")
+        count = lambda text: len(encoding.encode(text))
+        if count(json.dumps(data)) <= max_tokens:
+            return data
+        truncated, current = [], count("[]")
+        for item in data:
+            tokens = count(json.dumps(item) + ",")
+            if current + tokens > max_tokens:
+                break
+            truncated.append(item)
+            current += tokens
+        return truncated
+
+    rng = random.Random(7)
+    markets = [
+        {
+            "id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}",
+            "image": f"https://assets.coingecko.com/coins/images/{i}/large/coin.png",
+            "current_price": rng.random() * 1000, "market_cap": rng.randint(10 ** 6, 10 ** 12),
+            "total_volume": rng.random() * 1e9, "price_change_percentage_24h": rng.uniform(-20, 20),
+            "ath_date": "2024-03-14T07:10:36.635Z", "roi": None,
+        }
+        for i in range(2500)
+    ]
+    limiter = TokenLimiter()
+
+    start = time.perf_counter()
+    expected = naive_limit_tokens(markets, limiter.max_tokens)
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = limiter.limit_tokens(markets)
+    cold_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    limiter.limit_tokens(markets)
+    warm_time = time.perf_counter() - start
+
+    print(f"items kept: naive={len(expected)} engine={len(result)}")
+    print(f"naive: {naive_time * 1000:.1f} ms, engine cold: {cold_time * 1000:.1f} ms, "
+          f"engine warm (cached): {warm_time * 1000:.1f} ms")
+
+    chart = {
+        key: [[1700000000000 + i * 3600000, rng.random() * scale] for i in range(8760)]
+        for key, scale in (("prices", 1e4), ("market_caps", 1e12), ("total_volumes", 1e9))
+    }
+    start = time.perf_counter()
+    result = TokenLimiter(recursive=True).limit_tokens(chart)
+    print(f"recursive market_chart ({len(json.dumps(chart)) // 1024} KB): "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms, points kept per series: "
+          f"{[len(series) - 1 for series in result.values()]}")
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 import fastapi
@@ -6,9 +7,15 @@ from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 
-from agents.agent.tools.coin_tools import init_id_maps
+from agents.agent.core.coins_agent import coin_agent_pool
+from agents.agent.memory.tiered_memory import tiered_memory
+from agents.agent.memory.write_behind import memory_writer
+from agents.agent.tools.coin_tools import init_id_maps, refresh_id_maps_periodically
+from agents.agent.tools.tool_runner import tool_runner
 from agents.api import agent_router, api_router, file_router, tool_router, prompt_router
 from agents.common.config import SETTINGS
+from agents.common.http_client import http_client
+from agents.common.redis_utils import async_redis_utils
 from agents.common.log import Log
 from agents.common.otel import Otel, OtelFastAPI
 from lib.gobal import exception_handler
@@ -29,8 +36,22 @@ app.include_router(tool_router.router, prefix="/api")
 app.include_router(prompt_router.router, prefix="/api")
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
 
+@app.on_event("startup")
+async def startup():
+    app.state.id_maps_refresher = asyncio.create_task(refresh_id_maps_periodically())
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.id_maps_refresher.cancel()
+    await http_client.close()
+    await tiered_memory.close()
+    await memory_writer.close()
+    await async_redis_utils.close()
+    tool_runner.shutdown()
+
 def init_app():
     init_id_maps()
+    coin_agent_pool.warm()
 
 if __name__ == '__main__':
     Log.init()